@@ -0,0 +1,135 @@
+"""
+资源缓存模块 - Discord头像和自定义表情只上传到Kook一次，之后复用Kook资源URL
+"""
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from pathlib import Path
+from astrbot.api import logger
+from .persistence import DebouncedPersister, atomic_write_text
+
+
+class KookAssetCache:
+    """Discord资源（头像哈希、表情ID）到Kook资源URL的LRU缓存
+
+    首次使用某个头像或表情时下载并上传到Kook，之后的卡片消息直接引用缓存的URL；
+    同一资源的并发请求只上传一次（其余请求等待同一个结果）。缓存按最近使用顺序淘汰，
+    并写回到插件目录下的JSON文件，重启后无需重新上传。上传失败的资源在一段时间内不再重试
+    （失败记录到期后清除，条数同样不超过缓存容量）。
+    """
+
+    # 上传失败后的重试间隔（秒）
+    RETRY_AFTER = 300
+
+    def __init__(self, path: Path, capacity: int = 1000):
+        self.path = Path(path)
+        self.capacity = capacity
+        self._entries = OrderedDict()
+        self._inflight = {}
+        # 资源 -> 上传失败时间，按失败时间排列
+        self._failed = OrderedDict()
+        self.persister = DebouncedPersister("Kook资源缓存", lambda text: atomic_write_text(self.path, text), delay=5.0)
+        self.stats = {"hits": 0, "misses": 0, "shared": 0, "uploads": 0, "failures": 0, "evictions": 0}
+
+    def load(self):
+        """从缓存文件加载（文件不存在或损坏时从空缓存开始）"""
+        if not self.path.exists():
+            return
+        try:
+            text = self.path.read_text(encoding='utf-8')
+            entries = json.loads(text)
+            if isinstance(entries, dict):
+                self._entries = OrderedDict((str(k), str(v)) for k, v in entries.items() if v)
+                self._evict()
+                self.persister.mark_saved(text)
+                logger.info(f"🎨 已加载 {len(self._entries)} 个Kook资源缓存")
+        except Exception as e:
+            logger.warning(f"⚠️ 读取Kook资源缓存失败，将重新上传: {e}")
+
+    def update_config(self, config: dict):
+        self.capacity = max(1, int(config.get("asset_cache_size", 1000) or 1000))
+        if self._evict():
+            self._save()
+        while len(self._failed) > self.capacity:
+            self._failed.popitem(last=False)
+
+    def _evict(self) -> bool:
+        evicted = False
+        while len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+            self.stats["evictions"] += 1
+            evicted = True
+        return evicted
+
+    def _save(self):
+        self.persister.submit(json.dumps(self._entries, ensure_ascii=False, indent=2))
+
+    async def get(self, key: str, source_url: str, uploader) -> str:
+        """获取资源的Kook URL，未缓存时调用 uploader(source_url) 上传
+
+        Returns:
+            str: Kook资源URL，上传失败时返回None
+        """
+        url = self._entries.get(key)
+        if url:
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return url
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.stats["shared"] += 1
+            return await asyncio.shield(pending)
+
+        self._expire_failures()
+        if key in self._failed:
+            return None
+
+        self.stats["misses"] += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        url = None
+        try:
+            url = await uploader(source_url)
+        except Exception as e:
+            logger.warning(f"⚠️ 上传资源失败: {key} - {e}")
+        finally:
+            self._inflight.pop(key, None)
+            if not future.done():
+                future.set_result(url)
+
+        if url:
+            self.stats["uploads"] += 1
+            self._failed.pop(key, None)
+            self._entries[key] = url
+            self._evict()
+            self._save()
+        else:
+            self.stats["failures"] += 1
+            self._failed[key] = time.monotonic()
+            self._failed.move_to_end(key)
+            while len(self._failed) > self.capacity:
+                self._failed.popitem(last=False)
+        return url
+
+    def _expire_failures(self):
+        """清除已超过重试间隔的失败记录"""
+        deadline = time.monotonic() - self.RETRY_AFTER
+        while self._failed:
+            key, failed_at = next(iter(self._failed.items()))
+            if failed_at >= deadline:
+                break
+            del self._failed[key]
+
+    def get_stats(self) -> dict:
+        lookups = self.stats["hits"] + self.stats["misses"] + self.stats["shared"]
+        return {
+            **self.stats,
+            "size": len(self._entries),
+            "capacity": self.capacity,
+            "hit_rate": round(self.stats["hits"] * 100 / lookups, 1) if lookups else None,
+        }
+
+    async def flush(self):
+        await self.persister.flush()
@@ -0,0 +1,3 @@
+"""
+基准测试 - 转发流程中CPU密集部分的微基准（不访问网络）
+"""
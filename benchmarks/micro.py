@@ -0,0 +1,289 @@
+"""
+微基准测试 - 测量每条消息在转发流程中CPU密集部分的耗时，并与保存的基线比较
+
+所有用例使用构造的消息事件和配置，不访问网络，也不写入插件的config.json。
+结果以JSON保存在 benchmarks/baselines/<名称>.json，比较时按每次操作的中位耗时计算变化。
+
+运行（在AstrBot根目录下运行，使插件包可以被导入）：
+    python -m data.plugins.<插件目录>.benchmarks.micro                    # 运行并输出结果
+    python -m data.plugins.<插件目录>.benchmarks.micro --save baseline    # 保存为基线
+    python -m data.plugins.<插件目录>.benchmarks.micro --compare baseline # 与基线比较，退化时返回码为1
+"""
+import asyncio
+import json
+import logging
+import platform
+import statistics
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from astrbot.api import logger
+
+BASELINE_DIR = Path(__file__).parent / "baselines"
+SCHEMA_FILE = Path(__file__).parent.parent / "_conf_schema.json"
+# 每轮测量的最短时间（秒），迭代次数按此自动确定
+MIN_ROUND_TIME = 0.2
+# 默认的测量轮数（取中位数）
+DEFAULT_REPEAT = 5
+# 比较时认为退化的变化比例
+DEFAULT_THRESHOLD = 0.15
+
+
+class BenchWebUIConfig(dict):
+    """按 _conf_schema.json 默认值构造的分组配置对象（save为空操作）"""
+
+    @classmethod
+    def from_schema(cls, overrides: dict = None) -> "BenchWebUIConfig":
+        schema = json.loads(SCHEMA_FILE.read_text(encoding='utf-8'))
+        config = cls({
+            group: {key: item.get("default") for key, item in spec.get("items", {}).items()}
+            for group, spec in schema.items()
+        })
+        for dotted_key, value in (overrides or {}).items():
+            group, key = dotted_key.split('.', 1)
+            config[group][key] = value
+        return config
+
+    def save(self):
+        pass
+
+
+def mapping_lines(count: int, offset: int = 0) -> str:
+    """生成count行频道映射文本"""
+    return "\n".join(
+        f"{1416029491796381806 + offset + i} {3467992097213849 + offset + i}" for i in range(count)
+    )
+
+
+def make_event(channel_id: str, text_parts: int = 4, mentions: int = 2, images: int = 1):
+    """构造Discord消息事件（与AstrBot事件的接口一致，raw_message带频道和提及信息）"""
+    from astrbot.api.message_components import Plain, At, Image
+
+    components = []
+    for i in range(text_parts):
+        components.append(Plain(text=f"benchmark message part {i}: the quick brown fox jumps over the lazy dog"))
+        if i < mentions:
+            components.append(At(qq=str(900000000000000000 + i), name=f"member{i}"))
+    for i in range(images):
+        components.append(Image(file=f"https://cdn.discordapp.com/attachments/1/2/image_{i}.png"))
+
+    raw_message = SimpleNamespace(
+        attachments=[SimpleNamespace(size=123456, url=f"https://cdn.discordapp.com/attachments/1/2/image_{i}.png",
+                                     proxy_url=None, filename=f"image_{i}.png") for i in range(images)],
+        mentions=[],
+        channel=SimpleNamespace(id=int(channel_id), parent_id=None),
+    )
+    message_obj = SimpleNamespace(
+        group_id=channel_id,
+        self_id="bench-bot",
+        sender=SimpleNamespace(user_id="bench-user"),
+        raw_message=raw_message,
+    )
+    return SimpleNamespace(
+        message_obj=message_obj,
+        session_id=channel_id,
+        message_str="benchmark",
+        get_messages=lambda: components,
+        get_sender_name=lambda: "bench-user",
+        get_platform_name=lambda: "discord",
+    )
+
+
+def make_plugin(mapping_count: int = 10000):
+    """构造不连接任何平台的插件实例，配置写回被替换为空操作"""
+    from ..main import DiscordToKookForwarder
+    from ..persistence import DebouncedPersister
+
+    plugin = DiscordToKookForwarder(SimpleNamespace(get_all_stars=lambda: []))
+    plugin.config_persister = DebouncedPersister("基准测试", lambda _: None, in_thread=False)
+    plugin.webui_persister = DebouncedPersister("基准测试", lambda _: None, in_thread=False)
+    plugin.config.update({
+        "enabled": True,
+        "forward_all_channels": False,
+        "default_discord_channel": "",
+        "default_kook_channel": "",
+        "include_bot_messages": False,
+        "enable_translation": False,
+    })
+    plugin.route_table.apply_text("webui", mapping_lines(mapping_count))
+    return plugin
+
+
+def build_cases(mapping_count: int) -> dict:
+    """用例名称 -> (说明, 可调用对象, 是否为协程函数)"""
+    from ..jobs import ForwardJob
+    from ..routing import RouteTable
+    from ..translator import TencentTranslator, BaiduTranslator
+
+    plugin = make_plugin(mapping_count)
+    # 映射表中间位置的频道，以及一个没有映射的子区（按父频道路由）
+    mapped_channel = str(1416029491796381806 + mapping_count // 2)
+    thread_channel = "1500000000000000001"
+    plugin.thread_index.observe(thread_channel, mapped_channel)
+
+    event = make_event(mapped_channel)
+    job = ForwardJob.from_event(event, plugin._collect_attachment_sizes(event))
+    for mention in job.mentions:
+        plugin.member_names.observe(mention.user_id, mention.name)
+    thread_job = ForwardJob.from_event(make_event(thread_channel), {})
+
+    mappings_text = mapping_lines(10000)
+    # 两份只相差10行的映射文本，交替应用到同一个路由表，测量增量对比
+    changed_text = "\n".join([mapping_lines(9990), mapping_lines(10, offset=20000)])
+    diff_table = RouteTable()
+    diff_texts = [mappings_text, changed_text]
+    webui_config = BenchWebUIConfig.from_schema({
+        "forwarding.channel_mappings": mapping_lines(200),
+        # 不在测量期间启动事件循环延迟监控
+        "diagnostics.loop_lag_threshold_ms": 0,
+    })
+
+    tencent = TencentTranslator({"tencent_secret_id": "bench-id", "tencent_secret_key": "bench-key"})
+    baidu = BaiduTranslator({"baidu_app_id": "bench-app", "baidu_secret_key": "bench-key"})
+    payload = json.dumps({"SourceText": "the quick brown fox jumps over the lazy dog " * 4,
+                          "Source": "auto", "Target": "zh", "ProjectId": 0})
+    timestamp = int(time.time())
+
+    async def route(target_job):
+        target_job.route_channel_id = await plugin._resolve_route_channel(target_job)
+        await plugin._should_forward_message(target_job)
+        return await plugin._get_target_kook_channel(target_job)
+
+    def apply_diff():
+        diff_texts.reverse()
+        return diff_table.apply_text("webui", diff_texts[0])
+
+    # WebUI同步会替换WebUI来源的映射，使用单独的实例，不影响路由用例
+    sync_plugin = make_plugin(0)
+    sync_plugin.plugin_config = webui_config
+
+    return {
+        "build_job": ("从消息事件构建转发任务", lambda: ForwardJob.from_event(event, plugin._collect_attachment_sizes(event)), False),
+        "convert_message": ("转换消息格式（文本、已缓存的@提及、图片）", lambda: plugin._convert_message_for_kook(job), True),
+        "route_mapped": (f"转发检查和目标频道查找（{mapping_count}条映射）", lambda: route(job), True),
+        "route_thread": ("子区按父频道路由", lambda: route(thread_job), True),
+        "mappings_10k_cold": ("新路由表加载10000行映射", lambda: RouteTable().apply_text("webui", mappings_text), False),
+        "mappings_10k_diff": ("10000行映射中10行变化的增量更新", apply_diff, False),
+        "sync_webui_config": ("同步WebUI配置（200行映射，无变化）", sync_plugin._sync_webui_config, True),
+        "tencent_sign": ("腾讯翻译TC3签名", lambda: tencent._get_authorization(payload, timestamp), False),
+        "baidu_sign": ("百度翻译签名", lambda: baidu._generate_sign("the quick brown fox", "1435660288"), False),
+    }
+
+
+async def measure(fn, is_async: bool, repeat: int) -> dict:
+    """自动确定迭代次数后测量repeat轮，返回每次操作的耗时（微秒）"""
+
+    async def run(iterations: int) -> float:
+        started = time.perf_counter()
+        if is_async:
+            for _ in range(iterations):
+                await fn()
+        else:
+            for _ in range(iterations):
+                fn()
+        return time.perf_counter() - started
+
+    # 预热并确定迭代次数
+    iterations = 1
+    while True:
+        elapsed = await run(iterations)
+        if elapsed >= MIN_ROUND_TIME:
+            break
+        iterations *= 2 if elapsed <= 0 else max(2, min(10, int(MIN_ROUND_TIME / elapsed) + 1))
+
+    rounds = [await run(iterations) / iterations * 1e6 for _ in range(repeat)]
+    return {
+        "iterations": iterations,
+        "median_us": round(statistics.median(rounds), 3),
+        "best_us": round(min(rounds), 3),
+        "stdev_us": round(statistics.stdev(rounds), 3) if len(rounds) > 1 else 0.0,
+    }
+
+
+async def run_benchmarks(selected: list = None, repeat: int = DEFAULT_REPEAT, mapping_count: int = 10000) -> dict:
+    cases = build_cases(mapping_count)
+    results = {}
+    for name, (description, fn, is_async) in cases.items():
+        if selected and not any(pattern in name for pattern in selected):
+            continue
+        result = await measure(fn, is_async, repeat)
+        result["description"] = description
+        results[name] = result
+        print(f"{name:<22} {result['median_us']:>12.2f} us  (最佳 {result['best_us']:.2f} us, {result['iterations']} 次/轮)  {description}")
+    return {
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "repeat": repeat,
+        "mapping_count": mapping_count,
+        "results": results,
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float = DEFAULT_THRESHOLD) -> tuple:
+    """比较两次结果的中位耗时
+
+    Returns:
+        tuple: (报告文本, 是否有退化)
+    """
+    lines = [f"与基线比较（基线 {baseline.get('created')}，Python {baseline.get('python')}，阈值 ±{threshold:.0%}）:"]
+    regressed = False
+    for name, result in current["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if not base:
+            lines.append(f"  {name:<22} {result['median_us']:>12.2f} us  （基线中没有此用例）")
+            continue
+        change = result["median_us"] / base["median_us"] - 1 if base["median_us"] else 0.0
+        if change > threshold:
+            marker = "❌ 退化"
+            regressed = True
+        elif change < -threshold:
+            marker = "✅ 提升"
+        else:
+            marker = "持平"
+        lines.append(f"  {name:<22} {base['median_us']:>10.2f} -> {result['median_us']:>10.2f} us  {change:+7.1%}  {marker}")
+    missing = set(baseline.get("results", {})) - set(current["results"])
+    if missing:
+        lines.append(f"  本次未运行的基线用例: {', '.join(sorted(missing))}")
+    return "\n".join(lines), regressed
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="转发流程的微基准测试")
+    parser.add_argument("--save", metavar="NAME", help="把结果保存为基线")
+    parser.add_argument("--compare", metavar="NAME", help="与保存的基线比较")
+    parser.add_argument("--filter", nargs="*", help="只运行名称包含这些字符串的用例")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="测量轮数")
+    parser.add_argument("--mappings", type=int, default=10000, help="路由用例中的映射数量")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="判定退化的变化比例")
+    parser.add_argument("--verbose", action="store_true", help="保留插件的INFO日志（默认只输出警告）")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        # 日志格式化仍在测量范围内，只是不输出
+        logger.setLevel(logging.WARNING)
+
+    current = asyncio.run(run_benchmarks(args.filter, max(2, args.repeat), args.mappings))
+
+    if args.save:
+        BASELINE_DIR.mkdir(parents=True, exist_ok=True)
+        path = BASELINE_DIR / f"{args.save}.json"
+        path.write_text(json.dumps(current, ensure_ascii=False, indent=2) + "\n", encoding='utf-8')
+        print(f"💾 基线已保存: {path}")
+
+    if args.compare:
+        path = BASELINE_DIR / f"{args.compare}.json"
+        if not path.exists():
+            print(f"❌ 基线不存在: {path}")
+            sys.exit(2)
+        report, regressed = compare(current, json.loads(path.read_text(encoding='utf-8')), args.threshold)
+        print(report)
+        if regressed:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,315 @@
+"""
+诊断模块 - 事件循环延迟监控、CPU采样分析和内存分析
+"""
+import asyncio
+import sys
+import threading
+import time
+import traceback
+import tracemalloc
+from collections import deque
+from pathlib import Path
+from astrbot.api import logger
+
+PLUGIN_DIR = str(Path(__file__).parent)
+
+
+class LoopLagMonitor:
+    """事件循环延迟监控
+
+    事件循环中的任务定时记录心跳并测量实际唤醒时间与预期时间的差值（延迟）；
+    独立的看门狗线程发现心跳停止超过阈值时，通过 sys._current_frames 抓取事件循环线程
+    当前的调用栈，即正在阻塞事件循环的代码，按位置汇总为阻塞排行。
+    """
+
+    # 心跳间隔（秒）
+    INTERVAL = 0.5
+    # 保留的延迟样本数（用于计算p99）
+    MAX_SAMPLES = 1200
+    # 保留的阻塞位置数
+    MAX_OFFENDERS = 50
+
+    def __init__(self):
+        self.threshold = 0.0
+        self._task = None
+        self._thread = None
+        self._stop_event = threading.Event()
+        self._loop_thread_id = None
+        self._heartbeat = 0.0
+        self._captured_beat = None
+        self._pending_capture = None
+        self._lock = threading.Lock()
+        self.samples = deque(maxlen=self.MAX_SAMPLES)
+        self.max_lag = 0.0
+        self.stalls = 0
+        self.offenders = {}
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def update_config(self, config: dict):
+        """按配置调整阈值，阈值为0时停止监控（需在事件循环中调用）"""
+        threshold_ms = max(0, int(config.get("loop_lag_threshold_ms", 200) or 0))
+        self.threshold = threshold_ms / 1000
+        if self.threshold > 0 and not self.running:
+            self.start()
+        elif self.threshold <= 0 and self.running:
+            self.stop()
+
+    def start(self):
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stop_event = threading.Event()
+        self._task = asyncio.get_running_loop().create_task(self._tick())
+        self._thread = threading.Thread(target=self._watch, args=(self._stop_event,), name="loop-lag-watchdog", daemon=True)
+        self._thread.start()
+        logger.info(f"🩺 事件循环延迟监控已启动，阈值 {self.threshold * 1000:.0f} ms")
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        self._stop_event.set()
+        self._thread = None
+
+    async def _tick(self):
+        """事件循环侧：定时心跳并测量延迟"""
+        while True:
+            expected = time.monotonic() + self.INTERVAL
+            await asyncio.sleep(self.INTERVAL)
+            now = time.monotonic()
+            with self._lock:
+                self._heartbeat = now
+                capture, self._pending_capture = self._pending_capture, None
+            self._record(max(0.0, now - expected), capture)
+
+    def _record(self, lag: float, capture):
+        self.samples.append(lag)
+        self.max_lag = max(self.max_lag, lag)
+        if lag < self.threshold:
+            return
+
+        self.stalls += 1
+        if capture is None:
+            # 阻塞结束得太快，看门狗来不及抓取调用栈
+            location, stack_text = "未捕获（阻塞时间短于检查间隔）", ""
+        else:
+            location, stack_text = capture
+        offender = self.offenders.get(location)
+        if offender is None:
+            if len(self.offenders) >= self.MAX_OFFENDERS:
+                # 丢弃累计阻塞时间最短的位置
+                del self.offenders[min(self.offenders, key=lambda k: self.offenders[k]["total"])]
+            offender = self.offenders[location] = {"count": 0, "total": 0.0, "max": 0.0, "stack": ""}
+        offender["count"] += 1
+        offender["total"] += lag
+        offender["max"] = max(offender["max"], lag)
+        if stack_text:
+            offender["stack"] = stack_text
+        logger.warning(f"⚠️ 事件循环阻塞 {lag * 1000:.0f} ms: {location}")
+
+    def _watch(self, stop_event: threading.Event):
+        """看门狗线程：心跳停止超过阈值时抓取事件循环线程的调用栈"""
+        while not stop_event.wait(min(max(self.threshold / 2, 0.02), 0.5)):
+            with self._lock:
+                beat = self._heartbeat
+                stalled = time.monotonic() - beat > self.INTERVAL + self.threshold
+                if not stalled or self._captured_beat == beat:
+                    continue
+            capture = self._capture_stack()
+            with self._lock:
+                # 抓取期间心跳已恢复说明阻塞已结束，栈不再可信
+                if self._heartbeat == beat and capture:
+                    self._pending_capture = capture
+                    self._captured_beat = beat
+
+    def _capture_stack(self):
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return None
+        stack = traceback.extract_stack(frame)
+        del frame
+        if not stack:
+            return None
+        innermost = stack[-1]
+        location = f"{Path(innermost.filename).name}:{innermost.lineno} {innermost.name}"
+        # 同时标出插件内最近的调用位置，便于定位是哪段插件代码触发了阻塞
+        for entry in reversed(stack):
+            if entry.filename.startswith(PLUGIN_DIR):
+                if entry is not innermost:
+                    location = f"{Path(entry.filename).name}:{entry.lineno} {entry.name} → {location}"
+                break
+        return location, "".join(traceback.format_list(stack[-12:]))
+
+    def get_stats(self, top: int = 5) -> dict:
+        samples = sorted(self.samples)
+        p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))] if samples else None
+        offenders = sorted(self.offenders.items(), key=lambda item: item[1]["total"], reverse=True)[:top]
+        return {
+            "running": self.running,
+            "threshold_ms": round(self.threshold * 1000),
+            "samples": len(samples),
+            "p99_ms": round(p99 * 1000, 1) if p99 is not None else None,
+            "max_ms": round(self.max_lag * 1000, 1),
+            "stalls": self.stalls,
+            "offenders": [
+                {"location": location, "count": data["count"], "total_ms": round(data["total"] * 1000),
+                 "max_ms": round(data["max"] * 1000), "stack": data["stack"]}
+                for location, data in offenders
+            ],
+        }
+
+    def reset(self):
+        """清空统计数据"""
+        self.samples.clear()
+        self.max_lag = 0.0
+        self.stalls = 0
+        self.offenders.clear()
+
+
+class SamplingProfiler:
+    """采样式CPU分析器
+
+    在独立线程中按固定间隔采样事件循环线程的调用栈，统计每个函数出现在栈顶（自身耗时）
+    和出现在栈中（累计耗时）的次数。只在执行 profile 命令期间采样，空闲时没有任何开销。
+    """
+
+    INTERVAL = 0.005
+    MAX_SECONDS = 60
+
+    def __init__(self):
+        self.running = False
+
+    @staticmethod
+    def _label(code) -> str:
+        return f"{Path(code.co_filename).name}:{code.co_firstlineno} {code.co_name}"
+
+    def _sample(self, thread_id: int, seconds: float) -> dict:
+        cumulative = {}
+        own = {}
+        samples = idle = 0
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            frame = sys._current_frames().get(thread_id)
+            if frame is not None:
+                samples += 1
+                code = frame.f_code
+                if code.co_name in ("select", "poll", "epoll") or code.co_filename.endswith("selectors.py"):
+                    # 事件循环在等待IO，记为空闲
+                    idle += 1
+                else:
+                    own[code] = own.get(code, 0) + 1
+                    seen = set()
+                    while frame is not None:
+                        if frame.f_code not in seen:
+                            seen.add(frame.f_code)
+                            cumulative[frame.f_code] = cumulative.get(frame.f_code, 0) + 1
+                        frame = frame.f_back
+            frame = None
+            time.sleep(self.INTERVAL)
+        return {"samples": samples, "idle": idle, "cumulative": cumulative, "own": own}
+
+    async def run(self, seconds: float, top: int = 10) -> dict:
+        """采样指定时长的事件循环线程，返回按累计耗时排序的插件函数和按自身耗时排序的全部函数"""
+        if self.running:
+            raise RuntimeError("已有分析任务正在运行")
+        seconds = min(max(seconds, 1), self.MAX_SECONDS)
+        self.running = True
+        try:
+            raw = await asyncio.to_thread(self._sample, threading.get_ident(), seconds)
+        finally:
+            self.running = False
+
+        samples = raw["samples"] or 1
+        busy = raw["samples"] - raw["idle"]
+
+        def rank(counter: dict, only_plugin: bool) -> list:
+            items = [(code, count) for code, count in counter.items()
+                     if not only_plugin or code.co_filename.startswith(PLUGIN_DIR)]
+            items.sort(key=lambda item: item[1], reverse=True)
+            return [{"function": self._label(code), "samples": count, "percent": round(count * 100 / samples, 1)}
+                    for code, count in items[:top]]
+
+        return {
+            "seconds": seconds,
+            "samples": raw["samples"],
+            "busy_percent": round(busy * 100 / samples, 1),
+            "plugin_cumulative": rank(raw["cumulative"], True),
+            "top_self": rank(raw["own"], False),
+        }
+
+
+class MemoryProfiler:
+    """基于tracemalloc的内存分析
+
+    第一次执行时开始跟踪内存分配（之后才有分配开销），每次执行都拍摄快照，
+    报告当前占用最多的分配位置以及相比上一次快照增长最多的位置。
+    其他组件或宿主已经开启的跟踪直接使用，停止时不会关闭。
+    """
+
+    FRAMES = 10
+
+    def __init__(self):
+        self._last_snapshot = None
+        # 跟踪是否由本插件开启
+        self._started_tracing = False
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def _take_snapshot(self):
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+
+    async def snapshot(self, top: int = 10) -> dict:
+        """拍摄快照并与上一次快照比较；尚未开始跟踪时开始跟踪并记录基线"""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.FRAMES)
+            self._started_tracing = True
+            self._last_snapshot = await asyncio.to_thread(self._take_snapshot)
+            return {"started": True}
+
+        snapshot = await asyncio.to_thread(self._take_snapshot)
+        current, peak = tracemalloc.get_traced_memory()
+        top_sites = [
+            {"location": self._location(stat.traceback), "size_kb": round(stat.size / 1024, 1), "count": stat.count}
+            for stat in snapshot.statistics("lineno")[:top]
+        ]
+        growth = []
+        if self._last_snapshot is not None:
+            for stat in snapshot.compare_to(self._last_snapshot, "lineno")[:top]:
+                if stat.size_diff <= 0:
+                    continue
+                growth.append({"location": self._location(stat.traceback),
+                               "diff_kb": round(stat.size_diff / 1024, 1), "count_diff": stat.count_diff})
+        self._last_snapshot = snapshot
+        return {
+            "started": False,
+            "current_mb": round(current / (1024 * 1024), 2),
+            "peak_mb": round(peak / (1024 * 1024), 2),
+            "top": top_sites,
+            "growth": growth,
+        }
+
+    @staticmethod
+    def _location(trace) -> str:
+        frame = trace[0]
+        return f"{Path(frame.filename).name}:{frame.lineno}"
+
+    def stop(self) -> bool:
+        """丢弃快照，跟踪由本插件开启时停止跟踪
+
+        Returns:
+            bool: 是否停止了跟踪
+        """
+        self._last_snapshot = None
+        if not self._started_tracing:
+            return False
+        self._started_tracing = False
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        return True
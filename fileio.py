@@ -0,0 +1,163 @@
+"""
+文件IO模块 - 在有界线程池中执行媒体路径上的文件系统操作，事件循环不直接访问磁盘
+"""
+import asyncio
+import functools
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from pathlib import Path
+from astrbot.api import logger
+
+
+class IOExecutor:
+    """插件专用的文件IO线程池
+
+    创建目录、扫描清理、获取文件大小、打开/关闭/删除文件以及写入下载数据都在这里执行，
+    慢速磁盘或网络文件系统只会让IO线程等待，不会阻塞事件循环。线程数有上限，
+    不与其他使用默认线程池的代码争抢线程。
+    """
+
+    MAX_WORKERS = 4
+    # 下载时每次从网络读取的块大小
+    READ_SIZE = 64 * 1024
+    # 合并写入的批大小
+    WRITE_BATCH = 1024 * 1024
+
+    def __init__(self, max_workers: int = MAX_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="plugin-io")
+        self.max_workers = max_workers
+        self.ops = 0
+        self.pending = 0
+        self.peak_pending = 0
+        self.bytes_written = 0
+        self.slowest = 0.0
+
+    async def run(self, fn, *args, **kwargs):
+        """在IO线程池中执行函数并返回结果"""
+        self.pending += 1
+        self.peak_pending = max(self.peak_pending, self.pending)
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self._executor, functools.partial(self._timed, fn, *args, **kwargs)
+            )
+        finally:
+            self.pending -= 1
+            self.ops += 1
+
+    def _timed(self, fn, *args, **kwargs):
+        started = time.monotonic()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            self.slowest = max(self.slowest, time.monotonic() - started)
+
+    def writer(self, path) -> "BatchedFileWriter":
+        """以合并写入的方式写文件（async with 使用）"""
+        return BatchedFileWriter(self, path, self.WRITE_BATCH)
+
+    @asynccontextmanager
+    async def open_read(self, path):
+        """以二进制读方式打开文件，打开和关闭都在IO线程中进行"""
+        f = await self.run(open, path, 'rb')
+        try:
+            yield f
+        finally:
+            await self.run(f.close)
+
+    async def file_size(self, path) -> int:
+        """文件大小，文件不存在时返回None"""
+        try:
+            return (await self.run(os.stat, path)).st_size
+        except FileNotFoundError:
+            return None
+
+    async def remove(self, path):
+        """删除文件，文件不存在时忽略"""
+        try:
+            await self.run(os.remove, path)
+        except FileNotFoundError:
+            pass
+
+    async def remove_expired(self, directory: Path, max_age: float, label: str) -> int:
+        """删除目录中修改时间早于 max_age 秒前的文件（保留.gitkeep），返回删除数量"""
+        return await self.run(self._remove_expired, Path(directory), max_age, label)
+
+    @staticmethod
+    def _remove_expired(directory: Path, max_age: float, label: str) -> int:
+        if not directory.exists():
+            return 0
+        deadline = time.time() - max_age
+        removed = 0
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.name == ".gitkeep" or not entry.is_file():
+                    continue
+                try:
+                    if entry.stat().st_mtime < deadline:
+                        os.remove(entry.path)
+                        removed += 1
+                except OSError as e:
+                    logger.warning(f"⚠️ 删除旧{label}文件失败: {entry.path} - {e}")
+        return removed
+
+    def get_stats(self) -> dict:
+        return {
+            "max_workers": self.max_workers,
+            "ops": self.ops,
+            "pending": self.pending,
+            "peak_pending": self.peak_pending,
+            "written_mb": round(self.bytes_written / (1024 * 1024), 2),
+            "slowest_ms": round(self.slowest * 1000, 1),
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class BatchedFileWriter:
+    """合并写入：收到的小块数据先累积到缓冲区，达到批大小后整批交给IO线程写入
+
+    同一时间最多有一批数据在写入，写入和接收下一批数据重叠进行。
+    """
+
+    def __init__(self, io: IOExecutor, path, batch_size: int):
+        self.io = io
+        self.path = path
+        self.batch_size = batch_size
+        self._file = None
+        self._buffer = bytearray()
+        self._pending = None
+
+    async def __aenter__(self) -> "BatchedFileWriter":
+        self._file = await self.io.run(open, self.path, 'wb', buffering=self.batch_size)
+        return self
+
+    async def write(self, data: bytes):
+        self._buffer += data
+        if len(self._buffer) >= self.batch_size:
+            await self._submit()
+
+    async def _submit(self):
+        if self._pending is not None:
+            pending, self._pending = self._pending, None
+            await pending
+        if self._buffer:
+            batch, self._buffer = self._buffer, bytearray()
+            self.io.bytes_written += len(batch)
+            self._pending = asyncio.ensure_future(self.io.run(self._file.write, batch))
+
+    async def __aexit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                await self._submit()
+            if self._pending is not None:
+                pending, self._pending = self._pending, None
+                if exc_type is None:
+                    await pending
+                else:
+                    # 已经出错时只等待写入结束，不覆盖原来的异常
+                    await asyncio.gather(pending, return_exceptions=True)
+        finally:
+            await self.io.run(self._file.close)
@@ -0,0 +1,179 @@
+"""
+转发任务模块 - 与AstrMessageEvent解耦的紧凑转发任务记录
+"""
+import time
+from pathlib import Path
+from astrbot.api.message_components import Plain, Image, Video, At, AtAll, File
+
+
+class MediaRef:
+    """附件描述：类型（image/video/file）、URL、原始文件名和已知大小"""
+
+    __slots__ = ("kind", "url", "name", "size")
+
+    def __init__(self, kind: str, url: str, name: str = None, size: int = None):
+        self.kind = kind
+        self.url = url
+        self.name = name
+        self.size = size
+
+    @property
+    def ext(self) -> str:
+        """扩展名（小写），文件组件按文件名判断"""
+        return Path(self.name).suffix.lower() if self.name else ''
+
+    def __repr__(self):
+        return f"MediaRef({self.kind}, {self.name or self.url}, size={self.size})"
+
+
+class Mention:
+    """@提及：被提及用户的ID，以及消息中已带有的显示名称（可能为None）"""
+
+    __slots__ = ("user_id", "name")
+
+    def __init__(self, user_id: str, name: str = None):
+        self.user_id = user_id
+        self.name = name
+
+    def __repr__(self):
+        return f"Mention({self.user_id}, {self.name})"
+
+
+class ForwardJob:
+    """一条待转发的Discord消息
+
+    收到消息后立即从事件中提取转发所需的字段（频道、发送者、按顺序排列的文本片段和附件描述），
+    之后的转发流程只持有这个记录，不再引用AstrMessageEvent和消息组件对象。
+    parts 中的元素为 str（文本）、MediaRef（附件）或 Mention（@提及，转换时解析为名称）；
+    sender_avatar 为 (头像哈希, 头像URL) 或 None；route_channel_id 为按映射查找路由时使用的频道ID，
+    子区（thread、论坛帖子）消息在没有单独映射时使用父频道ID。
+    """
+
+    __slots__ = ("discord_channel_id", "sender_id", "self_id", "sender_name", "parts", "sender_avatar",
+                 "route_channel_id", "created_at")
+
+    def __init__(self, discord_channel_id: str, sender_id: str, self_id: str, sender_name: str, parts: list,
+                 sender_avatar: tuple = None):
+        self.discord_channel_id = discord_channel_id
+        self.sender_id = sender_id
+        self.self_id = self_id
+        self.sender_name = sender_name
+        self.parts = parts
+        self.sender_avatar = sender_avatar
+        self.route_channel_id = discord_channel_id
+        self.created_at = time.monotonic()
+
+    @property
+    def is_bot_message(self) -> bool:
+        return self.sender_id == self.self_id
+
+    @property
+    def media(self) -> list:
+        return [part for part in self.parts if isinstance(part, MediaRef)]
+
+    @property
+    def mentions(self) -> list:
+        return [part for part in self.parts if isinstance(part, Mention)]
+
+    def to_dict(self) -> dict:
+        """转换为可JSON序列化的紧凑字典（发送给转发工作进程）"""
+        parts = []
+        for part in self.parts:
+            if isinstance(part, MediaRef):
+                parts.append({"media": part.kind, "url": part.url, "name": part.name, "size": part.size})
+            elif isinstance(part, Mention):
+                parts.append({"mention": part.user_id, "name": part.name})
+            else:
+                parts.append(part)
+        return {
+            "channel": self.discord_channel_id,
+            "route": self.route_channel_id,
+            "sender": self.sender_id,
+            "self": self.self_id,
+            "name": self.sender_name,
+            "avatar": list(self.sender_avatar) if self.sender_avatar else None,
+            "parts": parts,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ForwardJob":
+        """从 to_dict 的结果还原转发任务"""
+        parts = []
+        for part in data.get("parts", []):
+            if isinstance(part, str):
+                parts.append(part)
+            elif "media" in part:
+                parts.append(MediaRef(part["media"], part.get("url"), part.get("name"), part.get("size")))
+            elif "mention" in part:
+                parts.append(Mention(part["mention"], part.get("name")))
+        avatar = data.get("avatar")
+        job = cls(data["channel"], data.get("sender"), data.get("self"), data.get("name"), parts,
+                  tuple(avatar) if avatar else None)
+        job.route_channel_id = data.get("route") or job.discord_channel_id
+        return job
+
+    @classmethod
+    def from_event(cls, event, attachment_sizes: dict) -> "ForwardJob":
+        """从Discord消息事件构建转发任务
+
+        Args:
+            event: AstrMessageEvent
+            attachment_sizes: Discord附件元数据中的文件大小（按URL和文件名索引）
+        """
+        mentioned_names = cls._mentioned_names(event.message_obj)
+        parts = []
+        for component in event.get_messages():
+            if isinstance(component, Plain):
+                parts.append(component.text)
+            elif isinstance(component, (Image, Video)):
+                kind = "image" if isinstance(component, Image) else "video"
+                url = component.file
+                name = getattr(component, 'filename', None)
+                parts.append(MediaRef(kind, url, name, attachment_sizes.get(url) or attachment_sizes.get(name)))
+            elif isinstance(component, File):
+                url = component.url if component.url else component.file
+                name = getattr(component, 'name', None)
+                parts.append(MediaRef("file", url, name, attachment_sizes.get(url) or attachment_sizes.get(name)))
+            elif isinstance(component, At):
+                # @提及在转换时解析为名称
+                user_id = str(component.qq)
+                parts.append(Mention(user_id, getattr(component, 'name', None) or mentioned_names.get(user_id)))
+            elif isinstance(component, AtAll):
+                # 转换@全体为文本
+                parts.append("@全体成员")
+
+        message_obj = event.message_obj
+        return cls(
+            discord_channel_id=message_obj.group_id or event.session_id,
+            sender_id=message_obj.sender.user_id,
+            self_id=message_obj.self_id,
+            sender_name=event.get_sender_name(),
+            parts=parts,
+            sender_avatar=cls._sender_avatar(message_obj),
+        )
+
+    @staticmethod
+    def _mentioned_names(message_obj) -> dict:
+        """从原始Discord消息的提及列表中读取被提及成员的显示名称（用户ID -> 名称）"""
+        names = {}
+        try:
+            raw_message = getattr(message_obj, 'raw_message', None)
+            for user in getattr(raw_message, 'mentions', None) or []:
+                name = getattr(user, 'display_name', None) or getattr(user, 'name', None)
+                if name:
+                    names[str(user.id)] = name
+        except Exception:
+            pass
+        return names
+
+    @staticmethod
+    def _sender_avatar(message_obj):
+        """从原始Discord消息中读取发送者头像（哈希和64px的URL），不可用时返回None"""
+        try:
+            author = getattr(getattr(message_obj, 'raw_message', None), 'author', None)
+            avatar = getattr(author, 'display_avatar', None)
+            if avatar is None:
+                return None
+            return avatar.key, str(avatar.with_size(64).url)
+        except Exception:
+            return None
@@ -0,0 +1,179 @@
+"""
+Kook卡片消息模块 - 构建卡片消息（type=10）的内容
+"""
+import json
+import re
+
+# Kook卡片消息中单个图片组最多包含的图片数
+MAX_IMAGES_PER_GROUP = 9
+# 一条卡片消息中所有卡片的模块总数上限（Kook另外限制每条消息最多5张卡片，这里每条消息只用一张卡片）
+MAX_MODULES_PER_MESSAGE = 50
+# 备注模块（context）最多包含的元素数
+MAX_CONTEXT_ELEMENTS = 10
+
+# Discord自定义表情：<:name:id>，动态表情为 <a:name:id>
+CUSTOM_EMOJI_PATTERN = re.compile(r'<(a?):(\w{2,32}):(\d{15,21})>')
+
+_KMARKDOWN_SPECIAL_CHARS = set('\\*~[]()>-_`')
+
+
+def escape_kmarkdown(text: str) -> str:
+    """转义KMarkdown特殊字符，按原文显示"""
+    return ''.join(f'\\{ch}' if ch in _KMARKDOWN_SPECIAL_CHARS else ch for ch in text)
+
+
+def text_module(content: str, markdown: bool = True) -> dict:
+    """文本段落模块"""
+    text_type = "kmarkdown" if markdown else "plain-text"
+    return {"type": "section", "text": {"type": text_type, "content": content}}
+
+
+def find_custom_emoji(text: str) -> list:
+    """文本中的Discord自定义表情（按ID去重）
+
+    Returns:
+        list: (表情ID, 表情名, Discord CDN URL) 列表
+    """
+    emoji = {}
+    for match in CUSTOM_EMOJI_PATTERN.finditer(text or ""):
+        animated, name, emoji_id = match.groups()
+        if emoji_id not in emoji:
+            ext = "gif" if animated else "png"
+            emoji[emoji_id] = (emoji_id, name, f"https://cdn.discordapp.com/emojis/{emoji_id}.{ext}?size=48")
+    return list(emoji.values())
+
+
+def header_module(header: str, avatar_url: str = None) -> dict:
+    """发送者信息模块：有头像时在名称前显示头像"""
+    if not avatar_url:
+        return text_module(f"**{escape_kmarkdown(header)}**")
+    return {"type": "context", "elements": [
+        {"type": "image", "src": avatar_url},
+        {"type": "kmarkdown", "content": f"**{escape_kmarkdown(header)}**"},
+    ]}
+
+
+def rich_text_modules(text: str, emoji_urls: dict = None) -> list:
+    """正文模块：含自定义表情的行使用备注模块把表情图片嵌在文字之间
+
+    没有Kook资源URL的表情，或一行中的元素超过备注模块上限时，表情显示为 :name:。
+    """
+    emoji_urls = emoji_urls or {}
+    modules = []
+    plain_lines = []
+
+    def flush_plain():
+        if plain_lines and "".join(plain_lines).strip():
+            modules.append(text_module(escape_kmarkdown("\n".join(plain_lines))))
+        plain_lines.clear()
+
+    for line in text.split("\n"):
+        elements = []
+        position = 0
+        for match in CUSTOM_EMOJI_PATTERN.finditer(line):
+            url = emoji_urls.get(match.group(3))
+            if not url:
+                continue
+            if match.start() > position:
+                elements.append({"type": "kmarkdown", "content": escape_kmarkdown(line[position:match.start()])})
+            elements.append({"type": "image", "src": url})
+            position = match.end()
+        if position < len(line):
+            elements.append({"type": "kmarkdown", "content": escape_kmarkdown(line[position:])})
+
+        if any(element["type"] == "image" for element in elements) and len(elements) <= MAX_CONTEXT_ELEMENTS:
+            flush_plain()
+            modules.append({"type": "context", "elements": elements})
+        else:
+            plain_lines.append(replace_custom_emoji(line))
+    flush_plain()
+    return modules
+
+
+def replace_custom_emoji(text: str) -> str:
+    """将Discord自定义表情替换为 :name: 文本"""
+    return CUSTOM_EMOJI_PATTERN.sub(lambda match: f":{match.group(2)}:", text)
+
+
+def image_modules(image_urls: list) -> list:
+    """图片模块：单张图片使用容器大图展示，多张图片按每组9张拆分为图片组"""
+    if not image_urls:
+        return []
+    if len(image_urls) == 1:
+        return [{"type": "container", "elements": [{"type": "image", "src": image_urls[0]}]}]
+    return [
+        {"type": "image-group", "elements": [{"type": "image", "src": url} for url in image_urls[i:i + MAX_IMAGES_PER_GROUP]]}
+        for i in range(0, len(image_urls), MAX_IMAGES_PER_GROUP)
+    ]
+
+
+def build_card_messages(modules: list, theme: str = "secondary") -> list:
+    """将模块列表组装为卡片消息内容（JSON字符串）
+
+    超出单条消息的模块上限时拆分为多条消息，按顺序发送。
+
+    Returns:
+        list: 每条消息的内容
+    """
+    return [
+        json.dumps([{"type": "card", "theme": theme, "size": "lg", "modules": modules[i:i + MAX_MODULES_PER_MESSAGE]}],
+                   ensure_ascii=False)
+        for i in range(0, len(modules), MAX_MODULES_PER_MESSAGE)
+    ]
+
+
+def build_image_group_card(header: str, text: str, image_urls: list, notes: list = None,
+                           avatar_url: str = None, emoji_urls: dict = None) -> list:
+    """构建包含发送者、正文和图片组的卡片消息
+
+    Args:
+        header: 发送者信息（如 "[Discord] 用户名:"）
+        text: 消息正文
+        image_urls: 已上传到Kook的图片URL
+        notes: 附加说明（如下载失败的图片提示），显示在图片下方
+        avatar_url: 发送者头像的Kook资源URL
+        emoji_urls: 自定义表情ID到Kook资源URL的映射，为None时正文按原文显示
+
+    Returns:
+        list: 卡片消息内容，内容过多时为多条消息
+    """
+    modules = []
+    if header:
+        modules.append(header_module(header, avatar_url))
+    if text and text.strip():
+        if emoji_urls is None:
+            modules.append(text_module(escape_kmarkdown(text)))
+        else:
+            modules.extend(rich_text_modules(text, emoji_urls))
+    modules.extend(image_modules(image_urls))
+    if notes:
+        modules.append({"type": "context", "elements": [{"type": "plain-text", "content": "\n".join(notes)}]})
+    return build_card_messages(modules)
+
+
+def format_size(size) -> str:
+    """文件大小的显示文本"""
+    if not size:
+        return "未知大小"
+    if size >= 1024 * 1024:
+        return f"{size / (1024 * 1024):.2f} MB"
+    return f"{size / 1024:.1f} KB"
+
+
+def build_link_card(entries: list, with_preview: bool = True) -> list:
+    """构建只包含原始链接的媒体卡片（不下载、不上传）
+
+    Args:
+        entries: (类型名称, 文件名, 文件大小, URL, 是否图片) 列表
+        with_preview: 是否为图片添加预览（预览图直接引用原始URL）
+
+    Returns:
+        list: 卡片消息内容，内容过多时为多条消息
+    """
+    modules = []
+    for label, filename, size, url, is_image in entries:
+        modules.append(text_module(f"**{escape_kmarkdown(label)}** [{escape_kmarkdown(filename)}]({url})"))
+        modules.append({"type": "context", "elements": [{"type": "plain-text", "content": format_size(size)}]})
+        if with_preview and is_image:
+            modules.append({"type": "container", "elements": [{"type": "image", "src": url}]})
+    return build_card_messages(modules)
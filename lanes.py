@@ -0,0 +1,121 @@
+"""
+转发通道模块 - 文本与媒体分通道调度，避免文本消息排在大文件后面
+"""
+import asyncio
+import time
+from collections import deque
+from astrbot.api import logger
+
+# 纯文本消息的快速通道
+FAST_LANE = "fast"
+# 包含媒体的消息的批量通道
+BULK_LANE = "bulk"
+# 顺序模式
+ORDERING_STRICT = "strict"
+ORDERING_RELAXED = "relaxed"
+
+
+class LaneScheduler:
+    """按Discord频道和通道类型排队执行转发任务
+
+    每个频道的任务按到达顺序执行。relaxed 模式下纯文本任务和媒体任务分别进入快速通道和批量通道，
+    两个通道互不等待，每个通道内用递增的序号保证顺序；strict 模式下同一频道的所有任务共用一个队列，
+    严格保持原始顺序。队列为空时对应的工作任务自动退出，不保留空闲任务。
+    """
+
+    # 每种通道保留的等待时间样本数
+    MAX_SAMPLES = 500
+
+    def __init__(self, handler, ordering: str = ORDERING_RELAXED):
+        """
+        Args:
+            handler: 执行单个转发任务的协程函数，需自行处理异常
+            ordering: 顺序模式，strict 或 relaxed
+        """
+        self.handler = handler
+        self.ordering = ordering
+        self._queues = {}
+        self._workers = {}
+        self._sequences = {}
+        self.stats = {
+            lane: {"submitted": 0, "processed": 0, "waits": deque(maxlen=self.MAX_SAMPLES)}
+            for lane in (FAST_LANE, BULK_LANE)
+        }
+
+    def update_config(self, config: dict):
+        ordering = config.get("lane_ordering", ORDERING_RELAXED)
+        self.ordering = ORDERING_STRICT if ordering == ORDERING_STRICT else ORDERING_RELAXED
+
+    @staticmethod
+    def lane_of(job) -> str:
+        return BULK_LANE if job.media else FAST_LANE
+
+    def submit(self, job) -> asyncio.Future:
+        """提交转发任务
+
+        Returns:
+            asyncio.Future: 任务执行完成时完成
+        """
+        lane = self.lane_of(job)
+        key = (job.discord_channel_id, lane if self.ordering == ORDERING_RELAXED else ORDERING_STRICT)
+        sequence = self._sequences.get(key, 0) + 1
+        self._sequences[key] = sequence
+        done = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(key, deque()).append((sequence, lane, time.monotonic(), job, done))
+        self.stats[lane]["submitted"] += 1
+        if key not in self._workers:
+            self._workers[key] = asyncio.create_task(self._drain(key))
+        return done
+
+    async def _drain(self, key):
+        queue = self._queues[key]
+        try:
+            while queue:
+                sequence, lane, enqueued_at, job, done = queue.popleft()
+                self.stats[lane]["waits"].append(time.monotonic() - enqueued_at)
+                logger.debug(f"🚦 {lane}通道 #{sequence} 开始转发（频道 {key[0]}，排队 {len(queue)}）")
+                try:
+                    await self.handler(job)
+                finally:
+                    self.stats[lane]["processed"] += 1
+                    if not done.done():
+                        done.set_result(None)
+        finally:
+            self._workers.pop(key, None)
+            if not queue:
+                self._queues.pop(key, None)
+
+    def get_stats(self) -> dict:
+        result = {"ordering": self.ordering, "active_lanes": len(self._workers)}
+        queued = {FAST_LANE: 0, BULK_LANE: 0}
+        for queue in self._queues.values():
+            for item in queue:
+                queued[item[1]] += 1
+        for lane, data in self.stats.items():
+            waits = sorted(data["waits"])
+
+            def percentile(ratio):
+                return round(waits[min(len(waits) - 1, int(len(waits) * ratio))] * 1000, 1) if waits else None
+
+            result[lane] = {
+                "submitted": data["submitted"],
+                "processed": data["processed"],
+                "queued": queued[lane],
+                "wait_p50_ms": percentile(0.5),
+                "wait_p95_ms": percentile(0.95),
+                "wait_max_ms": round(waits[-1] * 1000, 1) if waits else None,
+            }
+        return result
+
+    async def stop(self):
+        """取消所有通道的工作任务并等待其退出（插件停止时调用）"""
+        workers = list(self._workers.values())
+        for task in workers:
+            task.cancel()
+        for queue in self._queues.values():
+            for *_, done in queue:
+                if not done.done():
+                    done.cancel()
+        self._queues.clear()
+        # 等待被取消的转发任务执行完清理代码，之后才能关闭其使用的IO线程池和HTTP会话
+        await asyncio.gather(*workers, return_exceptions=True)
@@ -1,8 +1,6 @@
 from astrbot.api.event import filter, AstrMessageEvent, MessageEventResult
 from astrbot.api.star import Context, Star, register
 from astrbot.api import logger
-from astrbot.api.message_components import Plain, Image, Video, At, AtAll, File
-from astrbot.core.message.message_event_result import MessageChain
 from astrbot.core.platform.message_session import MessageSesion
 from astrbot.core.platform.message_type import MessageType
 from astrbot.core.star.filter.platform_adapter_type import PlatformAdapterType
@@ -10,13 +8,34 @@ from pathlib import Path
 import asyncio
 import json
 import aiohttp
-import os
 
 # 导入翻译模块
 from .translator import TranslatorManager
+from .persistence import DebouncedPersister, atomic_write_text
+from .routing import RouteTable, ThreadIndex, parse_mapping_line, NO_TRANSLATION
+from .kook_card import build_image_group_card, build_link_card, find_custom_emoji
+from .media import MediaAdmission, SegmentedDownloader, UploadPool, SharedTransfers, SHARED_TRANSFERS, shared_transfer, shared_admission
+from .fileio import IOExecutor
+from .diagnostics import LoopLagMonitor, MemoryProfiler, SamplingProfiler
+from .traffic import TrafficRecorder
+from .jobs import ForwardJob, MediaRef, Mention
+from .lanes import LaneScheduler
+from .assets import KookAssetCache
+from .members import MemberNameCache
+from .worker import WorkerPool
+
+# 图片文件扩展名
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp', '.svg'}
+# 视频文件扩展名
+VIDEO_EXTENSIONS = {'.mp4', '.avi', '.mov', '.wmv', '.flv', '.webm', '.mkv', '.m4v'}
 
 @register("discord_to_kook_forwarder", "AstrBot Community", "Discord消息转发到Kook插件", "1.0.0", "https://github.com/AstrBotDevs/AstrBot")
 class DiscordToKookForwarder(Star):
+    # 独立映射文件的检查间隔（秒）
+    MAPPING_FILE_CHECK_INTERVAL = 5
+    # Kook API地址（流量回放时指向本地替身服务）
+    KOOK_API_BASE = "https://www.kookapp.cn/api/v3"
+
     def __init__(self, context: Context):
         super().__init__(context)
         # 从插件元数据获取配置实例
@@ -67,9 +86,27 @@ class DiscordToKookForwarder(Star):
                 "default_kook_channel": "",  # 默认Kook频道ID
                 "include_bot_messages": False,  # 是否包含机器人消息
                 "message_prefix": "[Discord] ",  # 消息前缀
+                "group_images_as_card": True,  # 将同一条消息的文本和所有图片合并为一条卡片消息发送
+                "rich_rendering": False,  # 卡片消息中显示发送者头像和Discord自定义表情
+                "link_only_channels": "",  # 只转发媒体链接卡片（不下载不上传）的Discord频道ID，每行一个
+                "lane_ordering": "relaxed",  # 文本与媒体通道的顺序模式：relaxed 文本不等待媒体 / strict 严格保持原始顺序
+                "member_name_ttl_minutes": 60,  # @提及的成员名称缓存时间（分钟）
+                "worker_processes": 0,  # 执行转发的独立工作进程数，0表示在AstrBot进程中转发
                 "image_cleanup_hours": 24,  # 图片文件自动清理时间（小时），设置为0表示不自动清理
                 "video_cleanup_hours": 24,  # 视频文件自动清理时间（小时），设置为0表示不自动清理
+                "max_image_size_mb": 20,  # 图片文件大小上限（MB），设置为0表示不限制
+                "max_video_size_mb": 100,  # 视频文件大小上限（MB），设置为0表示不限制
+                "oversize_action": "link",  # 超出大小上限时的处理方式：link 仅发送链接 / skip 跳过
+                "link_only_threshold_mb": 0,  # 超过此大小（MB）的媒体只转发链接卡片，0表示不启用
+                "upload_max_concurrency": 2,  # 同时上传到Kook的文件数上限，0表示不限制
+                "upload_max_inflight_mb": 100,  # 同时上传中的文件总大小上限（MB），0表示不限制
+                "media_budget_mb": 500,  # 同时转发中的媒体文件总大小预算（MB），0表示不限制
+                "media_admission_wait": 30,  # 预算不足时的最长等待时间（秒），超时后只转发链接
+                "download_connections": 4,  # 大文件分段并行下载的连接数，1表示不分段
+                "download_chunk_mb": 4,  # 分段下载的分段大小（MB）
+                "asset_cache_size": 1000,  # 缓存的Kook头像/表情资源数上限
                 "channel_mappings": [],  # 多频道映射配置（数组格式）
+                "channel_mappings_file": "",  # 独立的频道映射文件路径（相对插件目录），为空表示不使用
                 # 翻译功能配置
                 "enable_translation": False,
                 "translation_provider": "tencent",
@@ -82,12 +119,70 @@ class DiscordToKookForwarder(Star):
                 "baidu_secret_key": "",
                 "google_api_key": "",
                 "translate_threshold": 10,
+                "skip_same_language": True,  # 本地识别为目标语言时跳过翻译API调用
+                "translation_failover": True,  # 主服务商失败或熔断时使用其他已配置的服务商
+                "translation_hedge": True,  # 主服务商超过p95延迟未返回时向备用服务商发出对冲请求
+                "translation_timeout": 10,  # 单次翻译请求超时时间（秒）
+                "tencent_qps": 5,  # 腾讯翻译每秒请求数上限
+                "baidu_qps": 1,  # 百度翻译每秒请求数上限（免费版为1）
+                "google_qps": 10,  # 谷歌翻译每秒请求数上限
+                "translation_max_concurrency": 4,  # 每个服务商的最大并发请求数
+                "translation_queue_timeout": 5,  # 翻译请求在限流队列中的最长等待时间（秒）
+                # 诊断配置
+                "loop_lag_threshold_ms": 200,  # 事件循环延迟超过此值时记录阻塞调用栈，0表示关闭监控
+                "traffic_record_file": "",  # 消息流量录制文件（相对插件目录），为空表示不录制
             }
         
         self.discord_platform = None
         self.kook_platform = None
+        # 频道路由表：增量应用WebUI文本和独立映射文件中的映射，forward_channels指向其路由字典
+        self.route_table = RouteTable()
+        self._bind_route_table()
+        self._mapping_watch_task = None
+        # 子区（thread、论坛帖子）-> 父频道索引，子区消息沿用父频道的映射
+        self.thread_index = ThreadIndex()
+        # 转发任务按频道排队：纯文本走快速通道，含媒体的消息走批量通道
+        self.lane_scheduler = LaneScheduler(self._forward_job)
+        self.lane_scheduler.update_config(self.config)
+        # 链接模式频道的解析缓存：(配置文本, 频道ID集合)
+        self._link_only_cache = None
         # 初始化翻译管理器
         self.translator_manager = TranslatorManager(self.config)
+        # 媒体路径上的文件系统操作在有界的IO线程池中执行，不阻塞事件循环
+        self.io = IOExecutor()
+        # 上传到Kook的文件走独立的限流执行池，不占用文本消息的发送路径
+        self.upload_pool = UploadPool()
+        self.upload_pool.update_config(self.config)
+        # 媒体转发按预计大小占用全局预算，预算不足时排队或降级为链接
+        self.media_admission = MediaAdmission()
+        self.media_admission.update_config(self.config)
+        # 大视频文件使用HTTP Range分段并行下载
+        self.segmented_downloader = SegmentedDownloader(self.io)
+        self.segmented_downloader.update_config(self.config)
+        # @提及的成员名称缓存：来自已收到的消息，缺失时才查询Discord适配器
+        self.member_names = MemberNameCache()
+        self.member_names.update_config(self.config)
+        # 头像和自定义表情上传到Kook后缓存资源URL，只上传一次
+        self.asset_cache = KookAssetCache(Path(__file__).parent / "kook_assets.json")
+        self.asset_cache.load()
+        self.asset_cache.update_config(self.config)
+        # 转发工作进程（worker_processes大于0时启动），翻译、媒体传输和发送不占用AstrBot的事件循环
+        self.worker_pool = WorkerPool(f"{__package__}.worker", Path(__file__).resolve().parents[__package__.count('.') + 1],
+                                      fallback=self.lane_scheduler.submit)
+        self.worker_pool.update_config(self.config)
+        # 事件循环延迟监控（在initialize中启动）
+        self.loop_monitor = LoopLagMonitor()
+        # 按需执行的CPU采样分析和内存分析（空闲时无开销）
+        self.cpu_profiler = SamplingProfiler()
+        self.memory_profiler = MemoryProfiler()
+        # 匿名化的消息流量录制（用于回放测试）
+        self.traffic_recorder = TrafficRecorder()
+        self.traffic_recorder.update_config(self.config, Path(__file__).parent)
+        # 配置写回：内容无变化时不写入，短时间内的多次修改合并为一次，写入不在消息处理路径上进行
+        config_file = Path(__file__).parent / "config.json"
+        self.config_persister = DebouncedPersister("config.json", lambda text: atomic_write_text(config_file, text))
+        # AstrBot的配置对象不是线程安全的，在事件循环中去抖保存
+        self.webui_persister = DebouncedPersister("WebUI配置", lambda _: self.plugin_config.save(), in_thread=False)
 
     async def initialize(self):
         """初始化插件，获取Discord和Kook平台实例"""
@@ -95,6 +190,12 @@ class DiscordToKookForwarder(Star):
             # 加载配置
             await self._load_config()
             
+            # 启动事件循环延迟监控
+            self.loop_monitor.update_config(self.config)
+            
+            # 启动独立映射文件的监视任务
+            self._mapping_watch_task = asyncio.create_task(self._watch_channel_mappings_file())
+            
             # 尝试获取平台实例（如果失败不影响插件加载）
             try:
                 await self._get_platform_instances()
@@ -123,16 +224,23 @@ class DiscordToKookForwarder(Star):
             
             if config_file.exists():
                 with open(config_file, 'r', encoding='utf-8') as f:
-                    file_config = json.load(f)
+                    file_text = f.read()
+                file_config = json.loads(file_text)
+                # 记录文件现有内容，内容未变化时不重复写入
+                self.config_persister.mark_saved(file_text)
                 
                 # 合并配置作为基础
                 self.config.update(file_config)
+                self._bind_route_table()
                 logger.info(f"📄 从config.json加载基础配置: {list(file_config.keys())}")
             else:
                 logger.info("📄 config.json不存在，创建默认配置文件")
                 # 创建默认配置文件
                 self._create_default_config_file()
                 
+            # 记录WebUI配置的当前状态，未变化时不重复保存
+            self.webui_persister.mark_saved(self._webui_snapshot())
+
             # 优先使用WebUI配置并同步到文件
             await self._sync_webui_config()
                 
@@ -181,8 +289,7 @@ class DiscordToKookForwarder(Star):
                 }
             }
             
-            with open(config_file, 'w', encoding='utf-8') as f:
-                json.dump(default_config, f, ensure_ascii=False, indent=2)
+            self.config_persister.submit(json.dumps(default_config, ensure_ascii=False, indent=2))
             
             logger.info(f"✅ 已创建默认配置文件: {config_file}")
             
@@ -209,16 +316,46 @@ class DiscordToKookForwarder(Star):
                     'forwarding.default_kook_channel': 'default_kook_channel',
                     'forwarding.include_bot_messages': 'include_bot_messages',
                     'forwarding.message_prefix': 'message_prefix',
+                    'forwarding.group_images_as_card': 'group_images_as_card',
+                    'forwarding.rich_rendering': 'rich_rendering',
+                    'forwarding.link_only_channels': 'link_only_channels',
+                    'forwarding.lane_ordering': 'lane_ordering',
+                    'forwarding.member_name_ttl_minutes': 'member_name_ttl_minutes',
+                    'forwarding.worker_processes': 'worker_processes',
                     'forwarding.channel_mappings': 'channel_mappings',
+                    'forwarding.channel_mappings_file': 'channel_mappings_file',
                     # 文件管理
                     'file_management.image_cleanup_hours': 'image_cleanup_hours',
                     'file_management.video_cleanup_hours': 'video_cleanup_hours',
+                    'file_management.max_image_size_mb': 'max_image_size_mb',
+                    'file_management.max_video_size_mb': 'max_video_size_mb',
+                    'file_management.oversize_action': 'oversize_action',
+                    'file_management.link_only_threshold_mb': 'link_only_threshold_mb',
+                    'file_management.upload_max_concurrency': 'upload_max_concurrency',
+                    'file_management.upload_max_inflight_mb': 'upload_max_inflight_mb',
+                    'file_management.media_budget_mb': 'media_budget_mb',
+                    'file_management.media_admission_wait': 'media_admission_wait',
+                    'file_management.download_connections': 'download_connections',
+                    'file_management.download_chunk_mb': 'download_chunk_mb',
+                    'file_management.asset_cache_size': 'asset_cache_size',
+                    # 诊断
+                    'diagnostics.loop_lag_threshold_ms': 'loop_lag_threshold_ms',
+                    'diagnostics.traffic_record_file': 'traffic_record_file',
                     # 翻译功能
                     'translation.enable_translation': 'enable_translation',
                     'translation.translation_provider': 'translation_provider',
                     'translation.source_language': 'source_language',
                     'translation.target_language': 'target_language',
                     'translation.translate_threshold': 'translate_threshold',
+                    'translation.skip_same_language': 'skip_same_language',
+                    'translation.translation_failover': 'translation_failover',
+                    'translation.translation_hedge': 'translation_hedge',
+                    'translation.translation_timeout': 'translation_timeout',
+                    'translation.tencent_qps': 'tencent_qps',
+                    'translation.baidu_qps': 'baidu_qps',
+                    'translation.google_qps': 'google_qps',
+                    'translation.translation_max_concurrency': 'translation_max_concurrency',
+                    'translation.translation_queue_timeout': 'translation_queue_timeout',
                     # API密钥配置
                     'api_keys.tencent_secret_id': 'tencent_secret_id',
                     'api_keys.tencent_secret_key': 'tencent_secret_key',
@@ -252,7 +389,10 @@ class DiscordToKookForwarder(Star):
                         # 如果读取到有效值，添加到webui_config
                         if value is not None:
                             webui_config[config_key] = value
-                            logger.info(f"📋 WebUI配置 {webui_key} -> {config_key}: {value}")
+                            if config_key == 'channel_mappings' and isinstance(value, str):
+                                logger.debug(f"📋 WebUI配置 {webui_key} -> {config_key}: {value.count(chr(10)) + 1 if value else 0} 行")
+                            else:
+                                logger.debug(f"📋 WebUI配置 {webui_key} -> {config_key}: {value}")
                             
                     except Exception as e:
                         logger.debug(f"⚠️ 读取WebUI配置项 {webui_key} 失败: {e}")
@@ -262,37 +402,27 @@ class DiscordToKookForwarder(Star):
                 if webui_config:
                     logger.info(f"🔄 使用WebUI配置更新内存配置: {list(webui_config.keys())}")
                     
-                    # 特殊处理channel_mappings字段 - 转换为forward_channels
+                    # 特殊处理channel_mappings字段 - 增量应用到路由表（forward_channels）
                     if 'channel_mappings' in webui_config:
-                        channel_mappings_text = webui_config['channel_mappings']
-                        logger.info(f"📋 解析频道映射配置: {channel_mappings_text}")
+                        channel_mappings = webui_config.pop('channel_mappings')
                         
                         # 根据配置类型选择解析方法
-                        if isinstance(channel_mappings_text, str):
-                            # 新的文本格式："Discord频道ID 空格 Kook频道ID"
-                            parsed_mappings = self._parse_channel_mappings_text(channel_mappings_text)
-                        elif isinstance(channel_mappings_text, list):
+                        if isinstance(channel_mappings, str):
+                            # 新的文本格式："Discord频道ID 空格 Kook频道ID"，只解析变化的行
+                            self.route_table.apply_text("webui", channel_mappings)
+                        elif isinstance(channel_mappings, list):
                             # 旧的数组格式（向下兼容）
-                            parsed_mappings = self._parse_channel_mappings_array(channel_mappings_text)
+                            self.route_table.apply_mapping("webui", self._parse_channel_mappings_array(channel_mappings))
                         else:
-                            logger.warning(f"⚠️ 不支持的channel_mappings格式: {type(channel_mappings_text)}")
-                            parsed_mappings = {}
-                        
-                        # 更新forward_channels配置
-                        webui_config['forward_channels'] = parsed_mappings
-                        logger.info(f"✅ 解析后的频道映射: {parsed_mappings}")
-                        
-                        # 移除channel_mappings，避免重复存储
-                        del webui_config['channel_mappings']
+                            logger.warning(f"⚠️ 不支持的channel_mappings格式: {type(channel_mappings)}")
                     
                     # 如果WebUI直接提供了forward_channels，也要处理
-                    elif 'forward_channels' in webui_config:
-                        forward_channels = webui_config['forward_channels']
+                    if 'forward_channels' in webui_config:
+                        forward_channels = webui_config.pop('forward_channels')
                         if isinstance(forward_channels, dict):
-                            logger.info(f"📋 直接使用WebUI的forward_channels配置: {forward_channels}")
+                            self.route_table.apply_mapping("webui", forward_channels)
                         else:
                             logger.warning(f"⚠️ WebUI的forward_channels格式不正确: {type(forward_channels)}")
-                            webui_config['forward_channels'] = {}
                     
                     self.config.update(webui_config)
                     
@@ -301,6 +431,16 @@ class DiscordToKookForwarder(Star):
                         self.translator_manager.update_config(self.config)
                         logger.info("🌐 翻译管理器配置已更新")
                     
+                    self.lane_scheduler.update_config(self.config)
+                    self.member_names.update_config(self.config)
+                    self.upload_pool.update_config(self.config)
+                    self.media_admission.update_config(self.config)
+                    self.segmented_downloader.update_config(self.config)
+                    self.asset_cache.update_config(self.config)
+                    self.loop_monitor.update_config(self.config)
+                    self.traffic_recorder.update_config(self.config, Path(__file__).parent)
+                    self.worker_pool.update_config(self.config)
+                    
                     # 强制同步到config.json（确保WebUI配置持久化）
                     logger.info("💾 强制同步WebUI配置到config.json")
                     self._save_config()
@@ -365,65 +505,6 @@ class DiscordToKookForwarder(Star):
         
         return mappings
     
-    def _parse_channel_mappings_text(self, mappings_text: str) -> dict:
-        """解析新的文本格式的频道映射配置
-        
-        Args:
-            mappings_text: 文本格式的映射配置，如：
-                "1416029491796381806 3467992097213849\n1234567890123456 9876543210987654"
-        
-        Returns:
-            dict: 解析后的频道映射字典
-        """
-        mappings = {}
-        
-        if not mappings_text or not mappings_text.strip():
-            logger.info("📋 频道映射配置为空")
-            return mappings
-        
-        try:
-            # 按行分割
-            lines = mappings_text.strip().split('\n')
-            
-            for line_num, line in enumerate(lines, 1):
-                line = line.strip()
-                if not line:
-                    continue  # 跳过空行
-                
-                # 按空格分割
-                parts = line.split()
-                if len(parts) == 2:
-                    discord_id = parts[0].strip()
-                    kook_id = parts[1].strip()
-                    
-                    if discord_id and kook_id:
-                        mappings[discord_id] = kook_id
-                        logger.info(f"📝 解析映射 {line_num}: {discord_id} -> {kook_id}")
-                    else:
-                        logger.warning(f"⚠️ 第{line_num}行映射格式错误（ID为空）: {line}")
-                elif len(parts) > 2:
-                    # 如果有多个空格，取第一个和最后一个作为频道ID
-                    discord_id = parts[0].strip()
-                    kook_id = parts[-1].strip()
-                    
-                    if discord_id and kook_id:
-                        mappings[discord_id] = kook_id
-                        logger.info(f"📝 解析映射 {line_num}: {discord_id} -> {kook_id}")
-                        logger.warning(f"⚠️ 第{line_num}行包含多个空格，已取首尾作为频道ID: {line}")
-                    else:
-                        logger.warning(f"⚠️ 第{line_num}行映射格式错误（ID为空）: {line}")
-                else:
-                    logger.warning(f"⚠️ 第{line_num}行缺少空格分隔符: {line}")
-            
-            logger.info(f"✅ 成功解析 {len(mappings)} 个频道映射")
-            
-        except Exception as e:
-            logger.error(f"❌ 解析频道映射配置失败: {e}")
-            import traceback
-            logger.error(traceback.format_exc())
-        
-        return mappings
-    
     def _parse_channel_mappings(self, mappings_text: str) -> dict:
         """解析文本格式的频道映射配置（向下兼容旧格式）
         
@@ -497,16 +578,16 @@ class DiscordToKookForwarder(Star):
                             forwarding_group['default_kook_channel'] = self.config.get('default_kook_channel', '')
                             forwarding_group['include_bot_messages'] = self.config.get('include_bot_messages', False)
                             forwarding_group['message_prefix'] = self.config.get('message_prefix', '[Discord] ')
+                            forwarding_group['group_images_as_card'] = self.config.get('group_images_as_card', True)
+                            forwarding_group['rich_rendering'] = self.config.get('rich_rendering', False)
+                            forwarding_group['link_only_channels'] = self.config.get('link_only_channels', '')
+                            forwarding_group['lane_ordering'] = self.config.get('lane_ordering', 'relaxed')
+                            forwarding_group['member_name_ttl_minutes'] = self.config.get('member_name_ttl_minutes', 60)
+                            forwarding_group['worker_processes'] = self.config.get('worker_processes', 0)
+                            forwarding_group['channel_mappings_file'] = self.config.get('channel_mappings_file', '')
                             
-                            # 特别处理channel_mappings - 确保WebUI能够编辑（文本格式）
-                            if 'forward_channels' in self.config and self.config['forward_channels']:
-                                mappings_lines = []
-                                for discord_id, kook_id in self.config['forward_channels'].items():
-                                    mappings_lines.append(f"{discord_id} {kook_id}")
-                                forwarding_group['channel_mappings'] = '\n'.join(mappings_lines)
-                                logger.info(f"📝 更新WebUI的channel_mappings配置: {len(mappings_lines)} 个映射")
-                            else:
-                                forwarding_group['channel_mappings'] = ""
+                            # 特别处理channel_mappings - 确保WebUI能够编辑（文本格式），只写回WebUI来源的映射
+                            forwarding_group['channel_mappings'] = self._webui_mappings_text()
                     
                     # 文件管理设置
                     if hasattr(self.plugin_config, '__getitem__') and 'file_management' in self.plugin_config:
@@ -514,6 +595,17 @@ class DiscordToKookForwarder(Star):
                         if hasattr(file_group, '__setitem__'):
                             file_group['image_cleanup_hours'] = self.config.get('image_cleanup_hours', 24)
                             file_group['video_cleanup_hours'] = self.config.get('video_cleanup_hours', 24)
+                            file_group['max_image_size_mb'] = self.config.get('max_image_size_mb', 20)
+                            file_group['max_video_size_mb'] = self.config.get('max_video_size_mb', 100)
+                            file_group['oversize_action'] = self.config.get('oversize_action', 'link')
+                            file_group['link_only_threshold_mb'] = self.config.get('link_only_threshold_mb', 0)
+                            file_group['upload_max_concurrency'] = self.config.get('upload_max_concurrency', 2)
+                            file_group['upload_max_inflight_mb'] = self.config.get('upload_max_inflight_mb', 100)
+                            file_group['media_budget_mb'] = self.config.get('media_budget_mb', 500)
+                            file_group['media_admission_wait'] = self.config.get('media_admission_wait', 30)
+                            file_group['download_connections'] = self.config.get('download_connections', 4)
+                            file_group['download_chunk_mb'] = self.config.get('download_chunk_mb', 4)
+                            file_group['asset_cache_size'] = self.config.get('asset_cache_size', 1000)
                     
                     # 翻译设置
                     if hasattr(self.plugin_config, '__getitem__') and 'translation' in self.plugin_config:
@@ -524,6 +616,15 @@ class DiscordToKookForwarder(Star):
                             translation_group['source_language'] = self.config.get('source_language', 'auto')
                             translation_group['target_language'] = self.config.get('target_language', 'zh')
                             translation_group['translate_threshold'] = self.config.get('translate_threshold', 10)
+                            translation_group['skip_same_language'] = self.config.get('skip_same_language', True)
+                            translation_group['translation_failover'] = self.config.get('translation_failover', True)
+                            translation_group['translation_hedge'] = self.config.get('translation_hedge', True)
+                            translation_group['translation_timeout'] = self.config.get('translation_timeout', 10)
+                            translation_group['tencent_qps'] = self.config.get('tencent_qps', 5)
+                            translation_group['baidu_qps'] = self.config.get('baidu_qps', 1)
+                            translation_group['google_qps'] = self.config.get('google_qps', 10)
+                            translation_group['translation_max_concurrency'] = self.config.get('translation_max_concurrency', 4)
+                            translation_group['translation_queue_timeout'] = self.config.get('translation_queue_timeout', 5)
                     
                     # API密钥设置
                     if hasattr(self.plugin_config, '__getitem__') and 'api_keys' in self.plugin_config:
@@ -535,11 +636,18 @@ class DiscordToKookForwarder(Star):
                             api_group['baidu_secret_key'] = self.config.get('baidu_secret_key', '')
                             api_group['google_api_key'] = self.config.get('google_api_key', '')
                     
+                    # 诊断设置
+                    if hasattr(self.plugin_config, '__getitem__') and 'diagnostics' in self.plugin_config:
+                        diagnostics_group = self.plugin_config['diagnostics']
+                        if hasattr(diagnostics_group, '__setitem__'):
+                            diagnostics_group['loop_lag_threshold_ms'] = self.config.get('loop_lag_threshold_ms', 200)
+                            diagnostics_group['traffic_record_file'] = self.config.get('traffic_record_file', '')
+                    
                     # 检查save方法是否存在且可调用
                     if hasattr(self.plugin_config, 'save') and callable(getattr(self.plugin_config, 'save', None)):
-                        self.plugin_config.save()
+                        if self.webui_persister.submit(self._webui_snapshot()):
+                            logger.info("✅ 插件配置已提交保存到WebUI（方式1）")
                         saved = True
-                        logger.info("✅ 插件配置已保存到WebUI（方式1）")
                     else:
                         logger.debug("📋 plugin_config对象没有可调用的save方法，跳过方式1")
                 except Exception as e:
@@ -547,21 +655,15 @@ class DiscordToKookForwarder(Star):
                     import traceback
                     logger.debug(traceback.format_exc())
             
-            # 方式2：直接写入配置文件（始终执行，确保WebUI配置同步）
+            # 方式2：写入配置文件（始终执行，确保WebUI配置同步）
             try:
-                import os
-                from pathlib import Path
-                
-                plugin_dir = Path(__file__).parent
-                config_file = plugin_dir / "config.json"
-                
                 # 准备保存的分组结构配置
                 save_config = {
                     "forwarding": {
                         "enabled": self.config.get("enabled", False),
                         "discord_platform_id": self.config.get("discord_platform_id", ""),
                         "kook_platform_id": self.config.get("kook_platform_id", ""),
-                        "forward_channels": self.config.get("forward_channels", {}),
+                        "forward_channels": dict(self.route_table.source_entries("webui")),
                         "channel_mappings": ""
                     },
                     "file_management": {
@@ -581,21 +683,13 @@ class DiscordToKookForwarder(Star):
                     }
                 }
                 
-                # 将forward_channels字典转换为channel_mappings文本格式
-                if 'forward_channels' in self.config and self.config['forward_channels']:
-                    mappings_lines = []
-                    for discord_id, kook_id in self.config['forward_channels'].items():
-                        mappings_lines.append(f"{discord_id} {kook_id}")
-                    save_config['forwarding']['channel_mappings'] = '\n'.join(mappings_lines)
-                    logger.info(f"📝 转换频道映射为文本格式: {len(mappings_lines)} 个映射")
-                else:
-                    save_config['forwarding']['channel_mappings'] = ""
-                
-                with open(config_file, 'w', encoding='utf-8') as f:
-                    json.dump(save_config, f, ensure_ascii=False, indent=2)
+                # 将WebUI来源的映射转换为channel_mappings文本格式
+                save_config['forwarding']['channel_mappings'] = self._webui_mappings_text()
                 
+                # 与上次保存的内容比较，有变化时才安排写入
+                if self.config_persister.submit(json.dumps(save_config, ensure_ascii=False, indent=2)):
+                    logger.info("✅ 插件配置已提交同步到config.json")
                 saved = True
-                logger.info("✅ 插件配置已同步到config.json")
             except Exception as e:
                 logger.warning(f"⚠️ 同步config.json失败: {e}")
             
@@ -606,6 +700,56 @@ class DiscordToKookForwarder(Star):
             import traceback
             logger.error(traceback.format_exc())
 
+    def _bind_route_table(self):
+        """让forward_channels指向路由表的路由字典，并导入旧配置中的映射"""
+        existing = self.config.get("forward_channels")
+        if existing is self.route_table.routes:
+            return
+        if isinstance(existing, dict) and existing:
+            self.route_table.apply_mapping("webui", existing)
+        self.config["forward_channels"] = self.route_table.routes
+
+    def _webui_mappings_text(self) -> str:
+        """WebUI来源的映射（不含独立映射文件中的映射）的原始文本，保留用户的注释和行顺序"""
+        return self.route_table.source_text("webui")
+
+    def _get_channel_mappings_path(self):
+        """独立映射文件的路径，未配置时返回None"""
+        mappings_file = (self.config.get("channel_mappings_file") or "").strip()
+        if not mappings_file:
+            return None
+        path = Path(mappings_file)
+        return path if path.is_absolute() else Path(__file__).parent / path
+
+    async def _watch_channel_mappings_file(self):
+        """定期按修改时间和校验和检查独立映射文件，有变化时增量更新路由表"""
+        while True:
+            try:
+                path = self._get_channel_mappings_path()
+                if path is not None:
+                    text = await asyncio.to_thread(self.route_table.read_changed_file, path)
+                    if text is not None:
+                        self.route_table.apply_text("file", text)
+                elif self.route_table.source_entries("file"):
+                    # 取消配置映射文件后移除其中的映射
+                    self.route_table.apply_text("file", "")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"⚠️ 加载频道映射文件失败: {e}")
+            await asyncio.sleep(self.MAPPING_FILE_CHECK_INTERVAL)
+
+    def _webui_snapshot(self) -> str:
+        """WebUI配置对象中各分组的序列化快照，用于判断是否需要保存"""
+        if not self.plugin_config or not hasattr(self.plugin_config, '__getitem__'):
+            return None
+        snapshot = {}
+        for group_name in ('forwarding', 'file_management', 'translation', 'api_keys', 'diagnostics'):
+            if group_name in self.plugin_config:
+                group = self.plugin_config[group_name]
+                snapshot[group_name] = dict(group) if hasattr(group, 'keys') else group
+        return json.dumps(snapshot, ensure_ascii=False, sort_keys=True, default=str)
+
     async def _get_platform_instances(self):
         """获取Discord和Kook平台实例"""
         platform_manager = self.context.platform_manager
@@ -654,6 +798,19 @@ class DiscordToKookForwarder(Star):
             # 每次处理消息前同步WebUI配置（确保实时响应WebUI配置变更）
             await self._sync_webui_config()
             
+            # 立即把事件转换为紧凑的转发任务，之后的转发流程不再引用事件对象
+            job = ForwardJob.from_event(event, self._collect_attachment_sizes(event))
+            
+            # 记录消息中出现的成员名称，之后的@提及无需查询即可显示名称
+            self.member_names.observe(job.sender_id, job.sender_name)
+            for mention in job.mentions:
+                self.member_names.observe(mention.user_id, mention.name)
+            self._observe_thread_parent(event)
+            
+            # 录制消息形态（仅在配置了录制文件时）
+            if self.traffic_recorder.enabled:
+                self.traffic_recorder.record(job)
+            
             if not self.config["enabled"]:
                 logger.info("❌ 转发功能已禁用，跳过消息")
                 return
@@ -667,27 +824,87 @@ class DiscordToKookForwarder(Star):
                 logger.warning("❌ Kook平台未找到，无法转发消息")
                 return
             
+            # 交给工作进程或在后台按通道排队转发，事件处理函数立即返回，事件对象可以尽早释放
+            await self._dispatch_job(job)
+        except Exception as e:
+            logger.error(f"❌ 转发Discord消息到Kook时发生错误: {e}")
+            import traceback
+            logger.error(traceback.format_exc())
+    
+    async def _dispatch_job(self, job: ForwardJob):
+        """启用工作进程时把转发任务发给负责该频道的工作进程，否则（或工作进程不可用时）在本进程中排队转发"""
+        if self.worker_pool.enabled:
+            # 工作进程无法访问Discord适配器，子区的父频道和@提及名称在这里解析后随任务发送
+            job.route_channel_id = await self._resolve_route_channel(job)
+            for mention in job.mentions:
+                mention.name = mention.name or self.member_names.peek(mention.user_id)
+            token = getattr(getattr(self.kook_platform, 'client', None), 'token', None)
+            self.worker_pool.sync_state(self.config, self.route_table, token, self.KOOK_API_BASE)
+            if self.worker_pool.submit(job):
+                return
+        self.lane_scheduler.submit(job)
+
+    def _worker_report_lines(self, describe) -> list:
+        """启用工作进程时各工作进程上报的统计的显示文本（随健康检查每5秒更新）
+
+        Args:
+            describe: 把单个工作进程的统计（lanes、upload_pool、media_admission、translation）转换为一行文本的函数
+        """
+        if not self.worker_pool.enabled:
+            return []
+        reports = self.worker_pool.worker_stats()
+        lines = ["🧩 转发工作进程（以上为AstrBot进程本身的统计）:"]
+        lines += [f"- #{index}: {describe(stats)}" for index, stats in reports] or ["- 暂无上报"]
+        return lines
+    
+    async def _forward_job(self, job: ForwardJob):
+        """对单条转发任务执行转发检查、格式转换和发送（流量回放也从这里进入）"""
+        try:
+            # 子区消息没有单独映射时按父频道路由
+            job.route_channel_id = await self._resolve_route_channel(job)
+            
             # 检查是否应该转发此消息
-            should_forward = await self._should_forward_message(event)
+            should_forward = await self._should_forward_message(job)
             logger.info(f"📋 消息转发检查结果: {should_forward}")
             if not should_forward:
                 return
             
-            # 转换消息格式
-            forwarded_message = await self._convert_message_for_kook(event)
-            logger.info(f"🔄 消息格式转换完成，消息链长度: {len(forwarded_message.chain)}")
+            # 确定目标Kook频道及各自的翻译语言
+            targets = await self._get_target_kook_channels(job)
+            logger.info(f"🎯 目标Kook频道: {', '.join(channel for channel, _ in targets) or '无'}")
+            if not targets:
+                logger.warning("❌ 未找到对应的Kook频道，消息未转发")
+                return
             
-            # 确定目标Kook频道
-            target_channel = await self._get_target_kook_channel(event)
-            logger.info(f"🎯 目标Kook频道: {target_channel}")
+            # 转换消息格式：每种目标语言只转换（翻译）一次，不同语言并发进行
+            languages = list(dict.fromkeys(language for _, language in targets))
+            converted = await asyncio.gather(*(self._convert_message_for_kook(job, language) for language in languages))
+            parts_by_language = dict(zip(languages, converted))
+            logger.info(f"🔄 消息格式转换完成，语言数: {len(languages)}，消息片段数: {len(converted[0])}")
             
-            if target_channel:
-                # 发送到Kook
-                await self._send_to_kook(target_channel, forwarded_message)
+            link_only = job.route_channel_id in self._link_only_channels()
+            if len(targets) == 1:
+                target_channel, language = targets[0]
+                await self._send_to_kook(target_channel, parts_by_language[language], link_only, job.sender_avatar)
                 logger.info(f"✅ 已转发Discord消息到Kook频道: {target_channel}")
-            else:
-                logger.warning("❌ 未找到对应的Kook频道，消息未转发")
-                
+                return
+            
+            # 多个目标并发发送，同一媒体只下载和上传一次
+            transfers = SharedTransfers()
+            token = SHARED_TRANSFERS.set(transfers)
+            try:
+                await asyncio.gather(*(
+                    self._send_to_kook(target_channel, parts_by_language[language], link_only, job.sender_avatar)
+                    for target_channel, language in targets
+                ))
+            finally:
+                SHARED_TRANSFERS.reset(token)
+                transfers.cancel()
+                # 所有目标都完成后才归还共享媒体占用的预算
+                for charge in transfers.charges:
+                    self.media_admission.release(charge)
+            logger.info(f"✅ 已转发Discord消息到 {len(targets)} 个Kook频道（{len(languages)} 种语言），"
+                        f"共享媒体传输 {transfers.shared} 次")
         except Exception as e:
             logger.error(f"❌ 转发Discord消息到Kook时发生错误: {e}")
             import traceback
@@ -704,18 +921,18 @@ class DiscordToKookForwarder(Star):
             import traceback
             logger.error(traceback.format_exc())
 
-    async def _should_forward_message(self, event: AstrMessageEvent) -> bool:
+    async def _should_forward_message(self, job: ForwardJob) -> bool:
         """判断是否应该转发此消息"""
         # 检查是否包含机器人消息
-        is_bot_message = event.message_obj.sender.user_id == event.message_obj.self_id
-        logger.info(f"🤖 机器人消息检查: 发送者ID={event.message_obj.sender.user_id}, 机器人ID={event.message_obj.self_id}, 是否机器人消息={is_bot_message}")
+        is_bot_message = job.is_bot_message
+        logger.info(f"🤖 机器人消息检查: 发送者ID={job.sender_id}, 机器人ID={job.self_id}, 是否机器人消息={is_bot_message}")
         
         if not self.config["include_bot_messages"] and is_bot_message:
             logger.info("❌ 跳过机器人消息（配置不包含机器人消息）")
             return False
         
-        # 获取Discord频道ID
-        discord_channel_id = event.message_obj.group_id or event.session_id
+        # 获取Discord频道ID（子区消息为父频道ID）
+        discord_channel_id = job.route_channel_id
         logger.info(f"📍 Discord频道ID: {discord_channel_id}")
         
         # 检查频道配置
@@ -749,19 +966,29 @@ class DiscordToKookForwarder(Star):
         
         return False
 
-    async def _convert_message_for_kook(self, event: AstrMessageEvent) -> MessageChain:
-        """将Discord消息转换为Kook格式"""
-        message_chain = MessageChain()
-        
+    async def _convert_message_for_kook(self, job: ForwardJob, target_lang: str = None) -> list:
+        """将Discord消息转换为Kook格式
+
+        Args:
+            target_lang: 翻译目标语言，为None时使用全局目标语言，为"off"时不翻译
+
+        Returns:
+            list: 按顺序排列的消息片段，元素为 str（文本）或 MediaRef（附件）
+        """
         # 添加消息前缀和发送者信息
-        sender_name = event.get_sender_name()
-        prefix_text = f"{self.config['message_prefix']}{sender_name}: "
-        message_chain.chain.append(Plain(prefix_text))
+        prefix_text = f"{self.config['message_prefix']}{job.sender_name}: "
+        parts = [prefix_text]
+        
+        # 并发解析消息中的@提及（通常直接命中名称缓存）
+        mention_names = await self._resolve_mention_names(job)
         
         # 处理消息内容
-        for component in event.get_messages():
-            if isinstance(component, Plain):
-                original_text = component.text
+        for part in job.parts:
+            if isinstance(part, Mention):
+                # 转换@提及为名称文本，无法解析时显示用户ID
+                parts.append(f"@{mention_names.get(part.user_id) or part.user_id}")
+            elif isinstance(part, str):
+                original_text = part
                 
                 # 添加调试日志
                 logger.info(f"🔍 检查翻译条件:")
@@ -773,51 +1000,73 @@ class DiscordToKookForwarder(Star):
                 # 检查是否需要翻译
                 if (self.config.get('enable_translation', False) and 
                     self.translator_manager and 
+                    target_lang != NO_TRANSLATION and
                     len(original_text.strip()) >= self.config.get('translate_threshold', 10)):
                     
                     logger.info("✅ 满足翻译条件，开始翻译...")
                     try:
                         # 执行翻译
-                        translated_text = await self.translator_manager.translate(original_text)
+                        translated_text = await self.translator_manager.translate(original_text, target_lang)
                         
                         if translated_text and translated_text != original_text:
                             # 添加原文和译文
-                            message_chain.chain.append(Plain(f"{original_text}\n[翻译] {translated_text}"))
+                            parts.append(f"{original_text}\n[翻译] {translated_text}")
                             logger.info(f"🌐 消息翻译成功: {original_text[:50]}... -> {translated_text[:50]}...")
                         else:
                             # 翻译失败或无变化，使用原文
-                            message_chain.chain.append(Plain(original_text))
+                            parts.append(original_text)
                             logger.info("⚠️ 翻译结果为空或与原文相同")
                     except Exception as e:
                         logger.error(f"❌ 翻译失败: {e}")
                         # 翻译失败时使用原文
-                        message_chain.chain.append(Plain(original_text))
+                        parts.append(original_text)
                 else:
                     # 不需要翻译或文本太短
                     logger.info("❌ 不满足翻译条件，使用原文")
-                    message_chain.chain.append(Plain(original_text))
-                    
-            elif isinstance(component, Image):
-                # 保留图片
-                message_chain.chain.append(component)
-            elif isinstance(component, Video):
-                # 保留视频
-                message_chain.chain.append(component)
-            elif isinstance(component, File):
-                # 保留文件
-                message_chain.chain.append(component)
-            elif isinstance(component, At):
-                # 转换@提及为文本
-                message_chain.chain.append(Plain(f"@{component.qq}"))
-            elif isinstance(component, AtAll):
-                # 转换@全体为文本
-                message_chain.chain.append(Plain("@全体成员"))
+                    parts.append(original_text)
+            else:
+                # 保留图片、视频和文件
+                parts.append(part)
         
-        return message_chain
+        return parts
+
+    async def _resolve_mention_names(self, job: ForwardJob) -> dict:
+        """解析消息中被@提及的用户名称（用户ID -> 名称）"""
+        user_ids = {mention.user_id for mention in job.mentions}
+        if not user_ids:
+            return {}
+        user_ids = list(user_ids)
+        names = await asyncio.gather(*(self.member_names.resolve(user_id, self._lookup_discord_member_name) for user_id in user_ids))
+        return dict(zip(user_ids, names))
+
+    async def _lookup_discord_member_name(self, user_id: str) -> str:
+        """通过Discord适配器查询用户名称：优先读取客户端缓存，没有时请求Discord API"""
+        client = getattr(self.discord_platform, 'client', None)
+        if client is None or not str(user_id).isdigit():
+            return None
+        user = None
+        if hasattr(client, 'get_user'):
+            user = client.get_user(int(user_id))
+        if user is None and hasattr(client, 'fetch_user'):
+            user = await client.fetch_user(int(user_id))
+        return getattr(user, 'display_name', None) or getattr(user, 'name', None)
+
+    async def _get_target_kook_channels(self, job: ForwardJob) -> list:
+        """获取所有目标Kook频道及各自的翻译语言
 
-    async def _get_target_kook_channel(self, event: AstrMessageEvent) -> str:
+        Returns:
+            list: [(Kook频道ID, 目标语言), ...]，未指定语言的目标使用全局目标语言
+        """
+        target = await self._get_target_kook_channel(job)
+        if not target:
+            return []
+        default_language = self.config.get("target_language", "zh")
+        targets = self.route_table.fanout.get(job.route_channel_id) or ((target, None),)
+        return [(channel, language or default_language) for channel, language in targets]
+
+    async def _get_target_kook_channel(self, job: ForwardJob) -> str:
         """获取目标Kook频道ID - 支持多频道映射"""
-        discord_channel_id = event.message_obj.group_id or event.session_id
+        discord_channel_id = job.route_channel_id
         logger.info(f"🔍 查找目标Kook频道，Discord频道ID: {discord_channel_id}")
         
         # 优先级1: 检查多频道映射配置
@@ -849,8 +1098,347 @@ class DiscordToKookForwarder(Star):
         
         return None
 
-    async def _send_to_kook(self, channel_id: str, message_chain: MessageChain):
-        """发送消息到Kook频道"""
+    def _observe_thread_parent(self, event: AstrMessageEvent):
+        """从原始Discord消息的频道信息中记录子区的父频道（普通频道记录为没有父频道）"""
+        try:
+            channel = getattr(getattr(event.message_obj, 'raw_message', None), 'channel', None)
+            channel_id = getattr(channel, 'id', None)
+            if channel_id is not None:
+                self.thread_index.observe(str(channel_id), getattr(channel, 'parent_id', None))
+        except Exception as e:
+            logger.debug(f"读取Discord频道信息失败: {e}")
+
+    async def _resolve_route_channel(self, job: ForwardJob) -> str:
+        """确定按映射路由时使用的频道ID：频道自身有映射时使用自身，子区没有映射时使用父频道"""
+        channel_id = job.discord_channel_id
+        if channel_id in self.config.get("forward_channels", {}) or channel_id == self.config.get("default_discord_channel"):
+            return channel_id
+        parent_id = await self.thread_index.parent_of(channel_id, self._lookup_discord_parent_channel)
+        if parent_id:
+            logger.info(f"🧵 子区 {channel_id} 按父频道 {parent_id} 路由")
+            return parent_id
+        return channel_id
+
+    async def _lookup_discord_parent_channel(self, channel_id: str) -> str:
+        """通过Discord适配器查询频道的父频道：优先读取客户端缓存，没有时请求Discord API"""
+        client = getattr(self.discord_platform, 'client', None)
+        if client is None or not str(channel_id).isdigit():
+            return None
+        channel = None
+        if hasattr(client, 'get_channel'):
+            channel = client.get_channel(int(channel_id))
+        if channel is None and hasattr(client, 'fetch_channel'):
+            channel = await client.fetch_channel(int(channel_id))
+        return getattr(channel, 'parent_id', None)
+
+    def _collect_attachment_sizes(self, event: AstrMessageEvent) -> dict:
+        """从Discord原始消息的附件元数据中提取文件大小（URL/文件名 -> 字节数）"""
+        sizes = {}
+        try:
+            raw_message = getattr(event.message_obj, 'raw_message', None)
+            for attachment in getattr(raw_message, 'attachments', None) or []:
+                size = getattr(attachment, 'size', None)
+                if not isinstance(size, int) or size <= 0:
+                    continue
+                for key in (getattr(attachment, 'url', None), getattr(attachment, 'proxy_url', None), getattr(attachment, 'filename', None)):
+                    if key:
+                        sizes[key] = size
+        except Exception as e:
+            logger.debug(f"⚠️ 读取Discord附件元数据失败: {e}")
+        return sizes
+
+    async def _probe_content_length(self, url: str):
+        """通过HEAD请求获取远程文件大小，失败时返回None"""
+        try:
+            async with aiohttp.ClientSession() as session:
+                async with session.head(url, allow_redirects=True, timeout=aiohttp.ClientTimeout(total=10)) as response:
+                    if response.status == 200 and response.content_length:
+                        return response.content_length
+                    logger.debug(f"⚠️ HEAD请求未返回文件大小: 状态码={response.status}")
+        except Exception as e:
+            logger.debug(f"⚠️ HEAD请求失败: {url} - {e}")
+        return None
+
+    async def _preflight_media(self, url: str, size_hint, kind: str) -> tuple:
+        """下载前的媒体预检，根据附件元数据或HEAD请求得到的大小决定处理方式
+
+        Args:
+            url: 媒体文件URL
+            size_hint: 附件元数据中的文件大小（字节），未知时为None
+            kind: 媒体类型，"image" 或 "video"
+
+        Returns:
+            tuple: (决策, 文件大小)，决策为 "forward"/"link"/"skip"，文件大小未知时为None
+        """
+        limit_mb = self.config.get(f"max_{kind}_size_mb", 0) or 0
+        if limit_mb <= 0:
+            # 未设置上限，无需额外的HEAD请求
+            return "forward", size_hint
+
+        size = size_hint if isinstance(size_hint, int) and size_hint > 0 else None
+        if size is None:
+            size = await self._probe_content_length(url)
+
+        if size is None:
+            logger.info(f"📏 无法预知文件大小，继续下载: {url}")
+            return "forward", None
+
+        if size <= limit_mb * 1024 * 1024:
+            return "forward", size
+
+        action = self.config.get("oversize_action", "link")
+        decision = "skip" if action == "skip" else "link"
+        logger.info(f"📏 文件大小 {size / (1024 * 1024):.2f} MB 超过上限 {limit_mb} MB，处理方式: {decision}")
+        return decision, size
+
+    async def _admit_media(self, url: str, size, kind: str) -> tuple:
+        """为媒体转发任务申请全局字节预算
+
+        Returns:
+            tuple: (计入预算的字节数, 决策)，获准时决策为 "forward"，等待超时降级为 "link"
+        """
+        charge = self.media_admission.estimate(size, kind, self.config.get(f"max_{kind}_size_mb", 0) or 0)
+        if await self.media_admission.admit(charge):
+            return charge, "forward"
+        logger.warning(f"⚠️ 媒体转发预算不足，等待超时，改为只转发链接: {url}")
+        return 0, "link"
+
+    async def _admit_shared_media(self, url: str, size_hint, kind: str, preflight: bool = True) -> tuple:
+        """预检并申请媒体预算，多目标分发时同一媒体只申请一次，其余目标使用同一决策
+
+        多目标分发时预算记录在本次分发的 SharedTransfers 中，由 _forward_job 在所有目标完成后归还
+        （其他目标可能仍在使用共享的下载和上传）。
+
+        Returns:
+            tuple: (本目标需要归还的字节数, 决策, 文件大小)，多目标分发时为0
+        """
+        async def admit():
+            decision, size = "forward", size_hint
+            if preflight:
+                decision, size = await self._preflight_media(url, size_hint, kind)
+            charge = 0
+            if decision == "forward":
+                charge, decision = await self._admit_media(url, size, kind)
+            return charge, decision, size
+
+        (charge, decision, size), owner = await shared_admission(("admit", url), admit)
+        transfers = SHARED_TRANSFERS.get()
+        if transfers is None:
+            return charge, decision, size
+        if owner and charge:
+            transfers.charges.append(charge)
+        return 0, decision, size
+
+    async def _send_media_fallback(self, kook_client, channel_id: str, label: str, filename: str, url: str, size, decision: str):
+        """发送未下载媒体的替代提示（仅链接或跳过说明）"""
+        size_text = f"{size / (1024 * 1024):.2f} MB" if size else "未知大小"
+        if decision == "link":
+            await kook_client.send_text(channel_id, f"[{label}: {filename} ({size_text})] {url}")
+        else:
+            await kook_client.send_text(channel_id, f"[{label}过大已跳过: {filename} ({size_text})]")
+
+    @staticmethod
+    def _resolve_media_filename(url: str, filename: str, default: str) -> str:
+        """确定媒体文件的显示文件名：优先使用URL中的文件名"""
+        from urllib.parse import urlparse
+        url_filename = Path(urlparse(url).path).name if url else ''
+        if url_filename and '.' in url_filename:
+            return url_filename
+        if filename and filename != '未知文件名':
+            return filename
+        return default
+
+    async def _prepare_card_image(self, token: str, url: str, filename: str, size_hint) -> tuple:
+        """下载并上传一张卡片图片
+
+        Returns:
+            tuple: (Kook图片URL, 提示文本)，成功时提示文本为None，失败时图片URL为None
+        """
+        charge = 0
+        try:
+            charge, decision, size = await self._admit_shared_media(url, size_hint, "image")
+            if decision != "forward":
+                size_text = f"{size / (1024 * 1024):.2f} MB" if size else "未知大小"
+                if decision == "link":
+                    return None, f"[图片: {filename} ({size_text})] {url}"
+                return None, f"[图片过大已跳过: {filename} ({size_text})]"
+            
+            local_image_path = await shared_transfer(("download", url), lambda: self._download_image(url, filename))
+            if not local_image_path:
+                return None, f"[图片下载失败: {filename}]"
+            
+            asset_url = await shared_transfer(("upload", local_image_path),
+                                              lambda: self._upload_image_to_kook_api(local_image_path, token))
+            if not asset_url:
+                return None, f"[图片发送失败: {filename}]"
+            return asset_url, None
+        except Exception as e:
+            logger.error(f"❌ 准备卡片图片失败: {filename} - {e}")
+            return None, f"[图片转发失败: {filename}]"
+        finally:
+            self.media_admission.release(charge)
+
+    async def _send_images_as_card(self, kook_client, channel_id: str, parts: list, avatar: tuple = None) -> list:
+        """将消息中的文本和所有图片合并为一条卡片消息（type=10）发送
+
+        启用头像和表情显示时，带有发送者头像或自定义表情的纯文本消息也以卡片发送。
+
+        Returns:
+            list: 仍需逐个发送的片段（视频、其他文件等）；没有需要合并的内容时返回原片段列表
+        """
+        texts = []
+        images = []
+        remaining = []
+        group_images = self.config.get("group_images_as_card", True)
+        for part in parts:
+            if isinstance(part, str):
+                texts.append(part)
+            elif not group_images:
+                remaining.append(part)
+            elif part.kind == "image" and part.url:
+                filename = self._resolve_media_filename(part.url, part.name, 'image.png')
+                images.append((part.url, filename, part.size))
+            elif part.kind == "file" and part.ext in IMAGE_EXTENSIONS and part.url:
+                images.append((part.url, part.name, part.size))
+            else:
+                remaining.append(part)
+        
+        # 第一个文本组件是消息前缀和发送者信息
+        header = texts[0].strip() if texts else ""
+        body = "".join(texts[1:])
+        rich = self.config.get("rich_rendering", False)
+        emoji = find_custom_emoji(body) if rich else []
+        if not images and not (rich and (avatar or emoji)):
+            return parts
+        
+        token = getattr(kook_client, 'token', None)
+        if not token:
+            logger.warning("⚠️ 无法获取Kook认证token，图片逐条发送")
+            return parts
+        
+        # 并发下载并上传所有图片，同时从缓存获取头像和表情的Kook资源
+        logger.info(f"🖼️ 合并 {len(images)} 张图片为卡片消息")
+        results, (avatar_url, emoji_urls) = await asyncio.gather(
+            asyncio.gather(*(self._prepare_card_image(token, url, filename, size_hint) for url, filename, size_hint in images)),
+            self._resolve_rich_assets(token, avatar if rich else None, emoji),
+        )
+        image_urls = [asset_url for asset_url, _ in results if asset_url]
+        notes = [note for _, note in results if note]
+        
+        card_contents = build_image_group_card(header, body, image_urls, notes, avatar_url, emoji_urls if rich else None)
+        sent = await self._send_card_messages_to_kook(channel_id, card_contents, token)
+        if sent == len(card_contents):
+            return remaining
+        if sent:
+            # 前面的卡片已发出，不再逐条重发，避免重复
+            logger.error(f"❌ 卡片消息只发送了 {sent}/{len(card_contents)} 条，其余内容未能转发")
+            return remaining
+        
+        # 卡片发送失败时使用已上传的图片逐条发送
+        logger.warning("⚠️ 卡片消息发送失败，改为逐条发送文本和图片")
+        for text in texts:
+            await kook_client.send_text(channel_id, text)
+        for asset_url in image_urls:
+            await self._send_image_message_to_kook(channel_id, asset_url, asset_url, token)
+        for note in notes:
+            await kook_client.send_text(channel_id, note)
+        return remaining
+
+    async def _resolve_rich_assets(self, token: str, avatar: tuple, emoji: list) -> tuple:
+        """从资源缓存获取发送者头像和自定义表情的Kook资源URL（未缓存时上传一次）
+
+        Returns:
+            tuple: (头像URL或None, 表情ID到Kook资源URL的映射)
+        """
+        def upload_as(filename):
+            return lambda url: self._upload_asset(token, url, filename)
+
+        avatar_url = None
+        emoji_urls = {}
+        lookups = [
+            self.asset_cache.get(f"emoji:{emoji_id}", source_url,
+                                 upload_as(f"emoji_{emoji_id}.{'gif' if '.gif' in source_url else 'png'}"))
+            for emoji_id, _, source_url in emoji
+        ]
+        if avatar:
+            avatar_hash, avatar_source = avatar
+            lookups.append(self.asset_cache.get(f"avatar:{avatar_hash}", avatar_source, upload_as(f"avatar_{avatar_hash}.png")))
+        results = await asyncio.gather(*lookups)
+        for (emoji_id, _, _), url in zip(emoji, results):
+            if url:
+                emoji_urls[emoji_id] = url
+        if avatar:
+            avatar_url = results[-1]
+        return avatar_url, emoji_urls
+
+    async def _upload_asset(self, token: str, source_url: str, filename: str) -> str:
+        """下载头像或表情并上传到Kook，返回Kook资源URL（本地文件上传后删除）"""
+        local_path = await self._download_image(source_url, filename)
+        if not local_path:
+            return None
+        try:
+            return await self._upload_image_to_kook_api(local_path, token)
+        finally:
+            await self.io.remove(local_path)
+
+    def _link_only_channels(self) -> set:
+        """只转发媒体链接的Discord频道ID集合（按配置文本缓存解析结果）"""
+        text = self.config.get("link_only_channels") or ""
+        if isinstance(text, list):
+            text = "\n".join(str(item) for item in text)
+        cached = self._link_only_cache
+        if cached is None or cached[0] != text:
+            channels = {item for item in text.replace(',', ' ').split() if item.isdigit()}
+            cached = self._link_only_cache = (text, channels)
+        return cached[1]
+
+    def _should_link_only(self, media: MediaRef, link_only_route: bool) -> bool:
+        """判断媒体是否只转发链接：所在路由启用了链接模式，或已知大小超过阈值"""
+        if link_only_route:
+            return True
+        threshold_mb = self.config.get("link_only_threshold_mb", 0) or 0
+        return threshold_mb > 0 and bool(media.size) and media.size > threshold_mb * 1024 * 1024
+
+    async def _send_link_card(self, kook_client, channel_id: str, media_list: list):
+        """以卡片形式发送媒体的原始链接（文件名、大小和图片预览），不下载也不上传"""
+        entries = []
+        for media in media_list:
+            is_image = media.kind == "image" or media.ext in IMAGE_EXTENSIONS
+            is_video = media.kind == "video" or media.ext in VIDEO_EXTENSIONS
+            label = "图片" if is_image else "视频" if is_video else "文件"
+            default_name = 'image.png' if is_image else 'video.mp4' if is_video else 'file'
+            filename = self._resolve_media_filename(media.url, media.name, default_name)
+            entries.append((label, filename, media.size, media.url, is_image))
+        logger.info(f"🔗 以链接卡片转发 {len(entries)} 个媒体文件（不下载）")
+        
+        token = getattr(kook_client, 'token', None)
+        if token:
+            # 预览图引用外部地址，被Kook拒绝时改为不带预览的卡片
+            card_contents = build_link_card(entries)
+            sent = await self._send_card_messages_to_kook(channel_id, card_contents, token)
+            if sent == len(card_contents):
+                return
+            if not sent and any(entry[4] for entry in entries):
+                card_contents = build_link_card(entries, with_preview=False)
+                sent = await self._send_card_messages_to_kook(channel_id, card_contents, token)
+                if sent == len(card_contents):
+                    return
+            if sent:
+                logger.error(f"❌ 链接卡片只发送了 {sent}/{len(card_contents)} 条，其余内容未能转发")
+                return
+        
+        for label, filename, size, url, _ in entries:
+            await self._send_media_fallback(kook_client, channel_id, label, filename, url, size, "link")
+
+    async def _send_to_kook(self, channel_id: str, parts: list, link_only: bool = False, avatar: tuple = None):
+        """发送消息到Kook频道
+
+        Args:
+            channel_id: Kook频道ID
+            parts: 消息片段，元素为 str（文本）或 MediaRef（附件，附带附件元数据中的文件大小供下载前预检）
+            link_only: 所在路由是否只转发媒体链接
+            avatar: 发送者头像 (头像哈希, 头像URL)，启用头像和表情显示时使用
+        """
         try:
             if not self.kook_platform:
                 logger.error("❌ Kook平台实例未找到，无法发送消息")
@@ -864,15 +1452,24 @@ class DiscordToKookForwarder(Star):
                 
             logger.info(f"📤 准备直接通过Kook客户端发送消息到频道: {channel_id}")
             
-            # 遍历消息链中的每个组件
-            for component in message_chain.chain:
-                if isinstance(component, Plain):
-                    await kook_client.send_text(channel_id, component.text)
-                    logger.info(f"✅ 发送文本消息成功: {component.text[:50]}...")
-                elif isinstance(component, Image):
+            # 零拷贝转发：链接模式的路由或超过大小阈值的媒体只发送链接卡片，不下载也不上传
+            link_media = [part for part in parts if isinstance(part, MediaRef) and part.url and self._should_link_only(part, link_only)]
+            if link_media:
+                parts = [part for part in parts if not any(part is media for media in link_media)]
+            
+            if self.config.get("group_images_as_card", True) or self.config.get("rich_rendering", False):
+                # 文本和所有图片合并为一条卡片消息，其余片段继续逐个发送
+                parts = await self._send_images_as_card(kook_client, channel_id, parts, avatar)
+            
+            # 遍历消息中的每个片段
+            for part in parts:
+                if isinstance(part, str):
+                    await kook_client.send_text(channel_id, part)
+                    logger.info(f"✅ 发送文本消息成功: {part[:50]}...")
+                elif part.kind == "image":
                     # 处理图片消息
-                    image_url = component.file
-                    filename = getattr(component, 'filename', '未知文件名')
+                    image_url = part.url
+                    filename = part.name or '未知文件名'
                     
                     # 从URL中提取实际文件名
                     from urllib.parse import urlparse
@@ -891,9 +1488,14 @@ class DiscordToKookForwarder(Star):
                     logger.info(f"🖼️ 检测到图片组件: URL={image_url}, 文件名={display_filename}")
                     
                     if image_url:
+                        size_hint = part.size
+                        charge, decision, _ = await self._admit_shared_media(image_url, size_hint, "image", preflight=False)
+                        if decision != "forward":
+                            await self._send_media_fallback(kook_client, channel_id, "图片", display_filename, image_url, size_hint, decision)
+                            continue
                         try:
                             # 下载Discord图片到本地
-                            local_image_path = await self._download_image(image_url, filename)
+                            local_image_path = await shared_transfer(("download", image_url), lambda: self._download_image(image_url, filename))
                             if local_image_path:
                                 # 上传图片到Kook并发送
                                 logger.info(f"📤 准备上传并发送图片到Kook: {local_image_path}")
@@ -912,13 +1514,15 @@ class DiscordToKookForwarder(Star):
                             logger.error(traceback.format_exc())
                             # 如果图片发送失败，发送一个文本提示
                             await kook_client.send_text(channel_id, f"[图片转发失败: {display_filename}]")
+                        finally:
+                            self.media_admission.release(charge)
                     else:
                         logger.warning("⚠️ 图片组件没有有效的文件URL")
                         await kook_client.send_text(channel_id, "[图片信息缺失]")
-                elif isinstance(component, Video):
+                elif part.kind == "video":
                     # 处理视频消息
-                    video_url = component.file
-                    filename = getattr(component, 'filename', '未知文件名')
+                    video_url = part.url
+                    filename = part.name or '未知文件名'
                     
                     # 从URL中提取实际文件名
                     from urllib.parse import urlparse
@@ -937,13 +1541,19 @@ class DiscordToKookForwarder(Star):
                     logger.info(f"🎬 检测到视频组件: URL={video_url}, 文件名={display_filename}")
                     
                     if video_url:
+                        # 下载前预检文件大小
+                        size_hint = part.size
+                        charge, decision, size = await self._admit_shared_media(video_url, size_hint, "video")
+                        if decision != "forward":
+                            await self._send_media_fallback(kook_client, channel_id, "视频", display_filename, video_url, size, decision)
+                            continue
                         try:
                             # 下载Discord视频到本地
-                            local_video_path = await self._download_video(video_url, filename)
+                            local_video_path = await shared_transfer(("download", video_url), lambda: self._download_video(video_url, filename, size))
                             if local_video_path:
-                                # 使用本地视频路径发送到Kook
+                                # 通过上传执行池上传视频后发送（与视频文件使用同一路径，受上传并发和在途大小限制）
                                 logger.info(f"📤 准备发送本地视频到Kook: {local_video_path}")
-                                success = await kook_client.send_image(channel_id, local_video_path)
+                                success = await self._send_video_to_kook_direct(channel_id, local_video_path, display_filename)
                                 if success:
                                     logger.info(f"✅ 发送视频消息成功: {display_filename}")
                                 else:
@@ -958,13 +1568,15 @@ class DiscordToKookForwarder(Star):
                             logger.error(traceback.format_exc())
                             # 如果视频发送失败，发送一个文本提示
                             await kook_client.send_text(channel_id, f"[视频转发失败: {display_filename}]")
+                        finally:
+                            self.media_admission.release(charge)
                     else:
                         logger.warning("⚠️ 视频组件没有有效的文件URL")
                         await kook_client.send_text(channel_id, "[视频信息缺失]")
-                elif isinstance(component, File):
+                elif part.kind == "file":
                     # 处理文件消息（可能是图片或视频）
-                    file_url = component.url if component.url else component.file
-                    filename = getattr(component, 'name', '未知文件名')
+                    file_url = part.url
+                    filename = part.name or '未知文件名'
                     
                     logger.info(f"📁 检测到文件组件: URL={file_url}, 文件名={filename}")
                     
@@ -973,17 +1585,24 @@ class DiscordToKookForwarder(Star):
                         from pathlib import Path
                         file_ext = Path(filename).suffix.lower() if filename else ''
                         
-                        # 图片文件扩展名
-                        image_extensions = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp', '.svg'}
-                        # 视频文件扩展名
-                        video_extensions = {'.mp4', '.avi', '.mov', '.wmv', '.flv', '.webm', '.mkv', '.m4v'}
-                        
+                        image_extensions = IMAGE_EXTENSIONS
+                        video_extensions = VIDEO_EXTENSIONS
+
+                        # 下载前预检文件大小（仅对可转发的图片/视频文件）
+                        if file_ext in image_extensions or file_ext in video_extensions:
+                            kind, label = ("image", "图片文件") if file_ext in image_extensions else ("video", "视频文件")
+                            size_hint = part.size
+                            charge, decision, size = await self._admit_shared_media(file_url, size_hint, kind)
+                            if decision != "forward":
+                                await self._send_media_fallback(kook_client, channel_id, label, filename, file_url, size, decision)
+                                continue
+
                         if file_ext in image_extensions:
                             # 作为图片处理
                             logger.info(f"🖼️ 文件识别为图片: {filename}")
                             try:
                                 # 下载Discord图片到本地
-                                local_image_path = await self._download_image(file_url, filename)
+                                local_image_path = await shared_transfer(("download", file_url), lambda: self._download_image(file_url, filename))
                                 if local_image_path:
                                     # 上传图片到Kook并发送
                                     logger.info(f"📤 准备上传并发送图片到Kook: {local_image_path}")
@@ -1001,13 +1620,15 @@ class DiscordToKookForwarder(Star):
                                 import traceback
                                 logger.error(traceback.format_exc())
                                 await kook_client.send_text(channel_id, f"[图片文件转发失败: {filename}]")
+                            finally:
+                                self.media_admission.release(charge)
                         
                         elif file_ext in video_extensions:
                             # 作为视频处理
                             logger.info(f"🎬 文件识别为视频: {filename}")
                             try:
                                 # 下载Discord视频到本地
-                                local_video_path = await self._download_video(file_url, filename)
+                                local_video_path = await shared_transfer(("download", file_url), lambda: self._download_video(file_url, filename, size))
                                 if local_video_path:
                                     # 使用直接的HTTP API调用发送视频到Kook
                                     logger.info(f"📤 准备发送本地视频到Kook: {local_video_path}")
@@ -1026,6 +1647,8 @@ class DiscordToKookForwarder(Star):
                                 import traceback
                                 logger.error(traceback.format_exc())
                                 await kook_client.send_text(channel_id, f"[视频文件转发失败: {filename}]")
+                            finally:
+                                self.media_admission.release(charge)
                         
                         else:
                             # 不支持的文件类型
@@ -1035,17 +1658,25 @@ class DiscordToKookForwarder(Star):
                         logger.warning("⚠️ 文件组件没有有效的文件URL")
                         await kook_client.send_text(channel_id, "[文件信息缺失]")
                 else:
-                    logger.warning(f"⚠️ 不支持的消息组件类型: {type(component)}")
+                    logger.warning(f"⚠️ 不支持的消息片段: {part!r}")
+            
+            if link_media:
+                await self._send_link_card(kook_client, channel_id, link_media)
                     
         except Exception as e:
             logger.error(f"❌ 发送消息到Kook时发生错误: {e}")
             import traceback
             logger.error(traceback.format_exc())
 
-    async def _download_video(self, video_url: str, filename: str) -> str:
-        """下载Discord视频到本地public/video文件夹"""
+    async def _download_video(self, video_url: str, filename: str, size: int = None) -> str:
+        """下载Discord视频到本地public/video文件夹
+
+        Args:
+            video_url: 视频URL
+            filename: 原始文件名
+            size: 预检得到的文件大小，足够大时使用分段并行下载
+        """
         import aiohttp
-        import os
         import uuid
         from pathlib import Path
         from urllib.parse import urlparse
@@ -1054,7 +1685,7 @@ class DiscordToKookForwarder(Star):
             # 创建public/video目录
             plugin_dir = Path(__file__).parent
             video_dir = plugin_dir / "public" / "video"
-            video_dir.mkdir(parents=True, exist_ok=True)
+            await self.io.run(video_dir.mkdir, parents=True, exist_ok=True)
             
             # 从URL中提取文件名
             parsed_url = urlparse(video_url)
@@ -1077,13 +1708,20 @@ class DiscordToKookForwarder(Star):
             
             logger.info(f"📥 开始下载视频: {video_url} -> {local_path}")
             
+            # 大文件使用分段并行下载，服务器不支持或失败时改用普通下载
+            if self.segmented_downloader.applicable(size):
+                if await self.segmented_downloader.download(video_url, local_path, size):
+                    logger.info(f"✅ 视频下载成功: {local_path}")
+                    await self._cleanup_old_videos()
+                    return str(local_path)
+            
             # 下载视频
             async with aiohttp.ClientSession() as session:
                 async with session.get(video_url) as response:
                     if response.status == 200:
-                        with open(local_path, 'wb') as f:
-                            async for chunk in response.content.iter_chunked(8192):
-                                f.write(chunk)
+                        async with self.io.writer(local_path) as writer:
+                            async for chunk in response.content.iter_chunked(self.io.READ_SIZE):
+                                await writer.write(chunk)
                         
                         logger.info(f"✅ 视频下载成功: {local_path}")
                         
@@ -1103,8 +1741,6 @@ class DiscordToKookForwarder(Star):
 
     async def _cleanup_old_videos(self):
         """根据配置清理旧视频文件"""
-        import os
-        import time
         from pathlib import Path
         
         try:
@@ -1118,23 +1754,8 @@ class DiscordToKookForwarder(Star):
             plugin_dir = Path(__file__).parent
             video_dir = plugin_dir / "public" / "video"
             
-            if not video_dir.exists():
-                return
-                
-            current_time = time.time()
-            cleanup_count = 0
-            cleanup_seconds = cleanup_hours * 3600  # 转换为秒
-            
-            # 清理超过配置时间的视频文件
-            for video_file in video_dir.glob("*"):
-                if video_file.is_file() and video_file.name != ".gitkeep":
-                    file_age = current_time - video_file.stat().st_mtime
-                    if file_age > cleanup_seconds:
-                        try:
-                            video_file.unlink()
-                            cleanup_count += 1
-                        except Exception as e:
-                            logger.warning(f"⚠️ 删除旧视频文件失败: {video_file} - {e}")
+            # 在IO线程中扫描并清理超过配置时间的视频文件
+            cleanup_count = await self.io.remove_expired(video_dir, cleanup_hours * 3600, "视频")
             
             if cleanup_count > 0:
                 logger.info(f"🧹 清理了 {cleanup_count} 个超过 {cleanup_hours} 小时的旧视频文件")
@@ -1162,11 +1783,16 @@ class DiscordToKookForwarder(Star):
             
             # 第一步：上传视频文件到Kook
             logger.info(f"📤 开始上传视频文件: {video_path}")
-            video_url = await self._upload_video_to_kook(video_path, token)
+            video_url = await shared_transfer(("upload", video_path), lambda: self._upload_video_to_kook(video_path, token))
             if not video_url:
                 logger.error(f"❌ 视频上传失败: {filename}")
                 return False
             
+            # 等待服务器处理视频文件（在上传执行池之外等待，不占用上传额度）
+            logger.info(f"⏳ 等待服务器处理视频文件...")
+            await asyncio.sleep(5.0)  # 等待5秒让服务器处理视频
+            logger.info(f"✅ 服务器处理完成，准备发送消息")
+            
             # 第二步：发送视频消息到频道
             logger.info(f"📡 开始发送视频消息到频道: {channel_id}")
             success = await self._send_video_message_to_kook(channel_id, video_url, filename, token)
@@ -1182,24 +1808,23 @@ class DiscordToKookForwarder(Star):
     async def _upload_video_to_kook(self, video_path: str, token: str) -> str:
         """上传视频到Kook并返回URL"""
         try:
-            # 检查文件是否存在
-            if not os.path.exists(video_path):
+            # 检查文件是否存在并获取文件大小
+            file_size = await self.io.file_size(video_path)
+            if file_size is None:
                 logger.error(f"❌ 视频文件不存在: {video_path}")
                 return None
             
-            # 获取文件大小
-            file_size = os.path.getsize(video_path)
             logger.info(f"📁 视频文件大小: {file_size} 字节 ({file_size / (1024 * 1024):.2f} MB)")
             
             # 构建上传URL和请求头
-            upload_url = "https://www.kookapp.cn/api/v3/asset/create"
+            upload_url = f"{self.KOOK_API_BASE}/asset/create"
             headers = {'Authorization': f'Bot {token}'}
             
             logger.info(f"📡 发送上传请求到: {upload_url}")
             
-            # 使用aiohttp上传文件
-            async with aiohttp.ClientSession() as session:
-                with open(video_path, 'rb') as f:
+            # 通过上传执行池上传文件（排队等待并发和在途字节额度）
+            async with self.upload_pool.upload(file_size) as session:
+                async with self.io.open_read(video_path) as f:
                     data = aiohttp.FormData()
                     data.add_field('file', f, filename=Path(video_path).name)
                     
@@ -1231,12 +1856,6 @@ class DiscordToKookForwarder(Star):
                                     # 记录完整的返回数据用于调试
                                     logger.debug(f"🔍 完整的Kook返回数据: {data}")
                                     
-                                    # 等待服务器处理视频文件
-                                    logger.info(f"⏳ 等待服务器处理视频文件...")
-                                    import asyncio
-                                    await asyncio.sleep(5.0)  # 等待5秒让服务器处理视频
-                                    logger.info(f"✅ 服务器处理完成，准备发送消息")
-                                    
                                     return asset_url
                                 else:
                                     logger.error(f"❌ 无法从Kook响应中提取URL，数据结构: {data}")
@@ -1262,7 +1881,7 @@ class DiscordToKookForwarder(Star):
         """发送视频消息到Kook频道"""
         try:
             # 构建消息发送URL和请求头
-            url = "https://www.kookapp.cn/api/v3/message/create"
+            url = f"{self.KOOK_API_BASE}/message/create"
             headers = {
                 "Authorization": f"Bot {token}",
                 "Content-Type": "application/json"
@@ -1323,7 +1942,7 @@ class DiscordToKookForwarder(Star):
             
             # 第一步：上传图片文件到Kook
             logger.info(f"📤 开始上传图片文件: {image_path}")
-            image_url = await self._upload_image_to_kook_api(image_path, token)
+            image_url = await shared_transfer(("upload", image_path), lambda: self._upload_image_to_kook_api(image_path, token))
             if not image_url:
                 logger.error(f"❌ 图片上传失败: {filename}")
                 return False
@@ -1343,24 +1962,23 @@ class DiscordToKookForwarder(Star):
     async def _upload_image_to_kook_api(self, image_path: str, token: str) -> str:
         """上传图片到Kook并返回URL"""
         try:
-            # 检查文件是否存在
-            if not os.path.exists(image_path):
+            # 检查文件是否存在并获取文件大小
+            file_size = await self.io.file_size(image_path)
+            if file_size is None:
                 logger.error(f"❌ 图片文件不存在: {image_path}")
                 return None
             
-            # 获取文件大小
-            file_size = os.path.getsize(image_path)
             logger.info(f"📁 图片文件大小: {file_size} 字节 ({file_size / (1024 * 1024):.2f} MB)")
             
             # 构建上传URL和请求头
-            upload_url = "https://www.kookapp.cn/api/v3/asset/create"
+            upload_url = f"{self.KOOK_API_BASE}/asset/create"
             headers = {'Authorization': f'Bot {token}'}
             
             logger.info(f"📡 发送图片上传请求到: {upload_url}")
             
-            # 使用aiohttp上传文件
-            async with aiohttp.ClientSession() as session:
-                with open(image_path, 'rb') as f:
+            # 通过上传执行池上传文件（排队等待并发和在途字节额度）
+            async with self.upload_pool.upload(file_size) as session:
+                async with self.io.open_read(image_path) as f:
                     data = aiohttp.FormData()
                     data.add_field('file', f, filename=Path(image_path).name)
                     
@@ -1417,7 +2035,7 @@ class DiscordToKookForwarder(Star):
         """发送图片消息到Kook频道"""
         try:
             # 构建消息发送URL和请求头
-            url = "https://www.kookapp.cn/api/v3/message/create"
+            url = f"{self.KOOK_API_BASE}/message/create"
             headers = {
                 "Authorization": f"Bot {token}",
                 "Content-Type": "application/json"
@@ -1458,10 +2076,64 @@ class DiscordToKookForwarder(Star):
             logger.error(traceback.format_exc())
             return False
 
+    async def _send_card_messages_to_kook(self, channel_id: str, card_contents: list, token: str) -> int:
+        """按顺序发送多条卡片消息，遇到失败时停止
+
+        Returns:
+            int: 成功发送的消息数
+        """
+        for index, card_content in enumerate(card_contents):
+            if not await self._send_card_message_to_kook(channel_id, card_content, token):
+                return index
+        return len(card_contents)
+
+    async def _send_card_message_to_kook(self, channel_id: str, card_content: str, token: str) -> bool:
+        """发送卡片消息到Kook频道"""
+        try:
+            # 构建消息发送URL和请求头
+            url = f"{self.KOOK_API_BASE}/message/create"
+            headers = {
+                "Authorization": f"Bot {token}",
+                "Content-Type": "application/json"
+            }
+            payload = {
+                "target_id": channel_id,
+                "content": card_content,
+                "type": 10  # 使用type=10发送卡片消息
+            }
+            
+            logger.info(f"📡 发送卡片消息到频道 {channel_id}")
+            logger.debug(f"📄 卡片内容: {card_content}")
+            
+            async with aiohttp.ClientSession() as session:
+                async with session.post(url, headers=headers, json=payload) as resp:
+                    logger.info(f"📥 收到卡片发送响应，状态码: {resp.status}")
+                    
+                    if resp.status == 200:
+                        result = await resp.json()
+                        
+                        if result.get('code') == 0:
+                            logger.info("✅ 发送卡片消息成功")
+                            return True
+                        else:
+                            error_msg = result.get('message', '未知错误')
+                            logger.error(f"❌ 发送卡片消息失败: {error_msg}")
+                            return False
+                    else:
+                        response_text = await resp.text()
+                        logger.error(f"❌ 发送卡片消息HTTP错误: {resp.status}")
+                        logger.error(f"📄 错误详情: {response_text}")
+                        return False
+                        
+        except Exception as e:
+            logger.error(f"❌ 发送卡片消息异常: {e}")
+            import traceback
+            logger.error(traceback.format_exc())
+            return False
+
     async def _download_image(self, image_url: str, filename: str) -> str:
         """下载Discord图片到本地public/image文件夹"""
         import aiohttp
-        import os
         import uuid
         from pathlib import Path
         from urllib.parse import urlparse
@@ -1470,7 +2142,7 @@ class DiscordToKookForwarder(Star):
             # 创建public/image目录
             plugin_dir = Path(__file__).parent
             image_dir = plugin_dir / "public" / "image"
-            image_dir.mkdir(parents=True, exist_ok=True)
+            await self.io.run(image_dir.mkdir, parents=True, exist_ok=True)
             
             # 从URL中提取文件名
             parsed_url = urlparse(image_url)
@@ -1497,9 +2169,9 @@ class DiscordToKookForwarder(Star):
             async with aiohttp.ClientSession() as session:
                 async with session.get(image_url) as response:
                     if response.status == 200:
-                        with open(local_path, 'wb') as f:
-                            async for chunk in response.content.iter_chunked(8192):
-                                f.write(chunk)
+                        async with self.io.writer(local_path) as writer:
+                            async for chunk in response.content.iter_chunked(self.io.READ_SIZE):
+                                await writer.write(chunk)
                         
                         logger.info(f"✅ 图片下载成功: {local_path}")
                         
@@ -1519,8 +2191,6 @@ class DiscordToKookForwarder(Star):
 
     async def _cleanup_old_images(self):
         """根据配置清理旧图片文件"""
-        import os
-        import time
         from pathlib import Path
         
         try:
@@ -1534,23 +2204,8 @@ class DiscordToKookForwarder(Star):
             plugin_dir = Path(__file__).parent
             image_dir = plugin_dir / "public" / "image"
             
-            if not image_dir.exists():
-                return
-                
-            current_time = time.time()
-            cleanup_count = 0
-            cleanup_seconds = cleanup_hours * 3600  # 转换为秒
-            
-            # 清理超过配置时间的图片文件
-            for image_file in image_dir.glob("*"):
-                if image_file.is_file() and image_file.name != ".gitkeep":
-                    file_age = current_time - image_file.stat().st_mtime
-                    if file_age > cleanup_seconds:
-                        try:
-                            image_file.unlink()
-                            cleanup_count += 1
-                        except Exception as e:
-                            logger.warning(f"⚠️ 删除旧图片文件失败: {image_file} - {e}")
+            # 在IO线程中扫描并清理超过配置时间的图片文件
+            cleanup_count = await self.io.remove_expired(image_dir, cleanup_hours * 3600, "图片")
             
             if cleanup_count > 0:
                 logger.info(f"🧹 清理了 {cleanup_count} 个超过 {cleanup_hours} 小时的旧图片文件")
@@ -1586,14 +2241,23 @@ Kook平台状态: {platform_status}
 /discord_kook_config set_kook_platform <platform_id> - 手动设置Kook平台ID
 /discord_kook_config refresh_platforms - 重新检测平台适配器
 /discord_kook_config set_default_channel <kook_channel_id> - 设置默认Kook频道
-/discord_kook_config add_mapping <discord_channel_id> <kook_channel_id> - 添加频道映射
+/discord_kook_config add_mapping <discord_channel_id> <kook_channel_id> [语言] - 添加频道映射（可指定该目标的翻译语言）
                 /discord_kook_config remove_mapping <discord_channel_id> - 移除频道映射
                 /discord_kook_config toggle_all_channels - 切换是否转发所有频道
                 /discord_kook_config quick_test <kook_channel_id> - 快速测试（启用转发所有频道到指定Kook频道）
                 /discord_kook_config cleanup_images - 立即清理旧图片文件
                 /discord_kook_config cleanup_videos - 立即清理旧视频文件
                 /discord_kook_config set_cleanup_hours <hours> - 设置图片清理时间（小时，0表示不自动清理）
-                /discord_kook_config set_video_cleanup_hours <hours> - 设置视频清理时间（小时，0表示不自动清理）"""
+                /discord_kook_config set_video_cleanup_hours <hours> - 设置视频清理时间（小时，0表示不自动清理）
+                /discord_kook_config translation_status - 查看翻译服务商状态（熔断、延迟、对冲统计）
+                /discord_kook_config mapping_status - 查看频道映射加载状态（映射数量、错误行、解析耗时）
+                /discord_kook_config upload_status - 查看文件上传队列、吞吐量和媒体转发预算
+                /discord_kook_config lane_status - 查看文本/媒体转发通道的排队和等待时间
+                /discord_kook_config mention_status - 查看@提及成员名称缓存的命中率
+                /discord_kook_config worker_status - 查看转发工作进程的状态（健康检查、重启次数、未完成任务）
+                /discord_kook_config loop_status [reset] - 查看事件循环延迟和阻塞排行（reset 清空统计）
+                /discord_kook_config profile <秒数> - 对事件循环进行CPU采样分析（1-60秒）
+                /discord_kook_config memprofile [stop] - 拍摄内存快照，查看分配最多和增长最多的位置（stop 停止跟踪）"""
             yield event.plain_result(config_text)
             return
         
@@ -1629,12 +2293,16 @@ Kook平台状态: {platform_status}
             self._save_config()
             yield event.plain_result(f"默认Kook频道已设置为: {args[1]}")
         elif command == "add_mapping" and len(args) > 2:
-            self.config["forward_channels"][args[1]] = args[2]
+            parsed = parse_mapping_line(" ".join(args[1:4]))
+            if not parsed or parsed[1] != args[2]:
+                yield event.plain_result("❌ 频道ID必须为数字，语言需为语言代码（如 en、ja、zh-TW）或 off")
+                return
+            self.route_table.set_route("webui", *parsed)
             self._save_config()
-            yield event.plain_result(f"已添加频道映射: {args[1]} -> {args[2]}")
+            language_text = f"（翻译为 {parsed[2]}）" if parsed[2] else ""
+            yield event.plain_result(f"已添加频道映射: {args[1]} -> {args[2]}{language_text}")
         elif command == "remove_mapping" and len(args) > 1:
-            if args[1] in self.config["forward_channels"]:
-                del self.config["forward_channels"][args[1]]
+            if self.route_table.remove_route("webui", args[1]):
                 self._save_config()
                 yield event.plain_result(f"已移除频道映射: {args[1]}")
             else:
@@ -1689,9 +2357,226 @@ Kook平台状态: {platform_status}
                         yield event.plain_result(f"✅ 视频清理时间已设置为 {hours} 小时")
             except ValueError:
                 yield event.plain_result("❌ 请输入有效的小时数")
+        elif command == "mapping_status":
+            lines = [f"🗺️ 频道映射状态: 路由总数 {len(self.route_table.routes)}，多目标/指定语言的路由 {len(self.route_table.fanout)}"]
+            mappings_path = self._get_channel_mappings_path()
+            lines.append(f"映射文件: {mappings_path or '未配置'}")
+            thread_stats = self.thread_index.get_stats()
+            lines.append(
+                f"子区索引: 频道 {thread_stats['size']}（子区 {thread_stats['threads']}），"
+                f"命中={thread_stats['hits']}, 查询={thread_stats['lookups']}, 查询失败={thread_stats['lookup_failures']}"
+            )
+            for source, stats in self.route_table.stats.items():
+                lines.append(
+                    f"- {source}: 映射={stats['count']}, 错误行={stats['invalid']}, "
+                    f"最近变更=+{stats['added']}/-{stats['removed']}, 解析耗时={stats['parse_ms']} ms"
+                )
+            yield event.plain_result("\n".join(lines))
+        elif command == "upload_status":
+            stats = self.upload_pool.get_stats()
+            throughput_text = f"{stats['throughput_mbps']} MB/s" if stats["throughput_mbps"] is not None else "暂无数据"
+            wait_text = f"{stats['avg_wait_ms']} ms" if stats["avg_wait_ms"] is not None else "暂无数据"
+            lines = [
+                "📤 文件上传状态:",
+                f"上传中: {stats['active']}（上限 {stats['max_concurrency'] or '不限'}）",
+                f"排队中: {stats['queued']}",
+                f"在途大小: {stats['inflight_mb']} MB（上限 {stats['max_inflight_mb'] or '不限'} MB，峰值 {stats['peak_inflight_mb']} MB）",
+                f"已完成: {stats['completed']}，异常: {stats['errors']}",
+                f"累计上传: {stats['uploaded_mb']} MB，平均吞吐: {throughput_text}",
+                f"平均排队时间: {wait_text}",
+            ]
+            admission = self.media_admission.get_stats()
+            lines += [
+                "📥 媒体转发预算:",
+                f"转发中: {admission['active']}，排队中: {admission['queued']}",
+                f"占用: {admission['inflight_mb']} MB（预算 {admission['budget_mb'] or '不限'} MB，峰值 {admission['peak_inflight_mb']} MB）",
+                f"已放行: {admission['admitted']}，超时降级为链接: {admission['degraded']}",
+            ]
+            io_stats = self.io.get_stats()
+            lines += [
+                "💽 文件IO线程池:",
+                f"线程数: {io_stats['max_workers']}，排队中: {io_stats['pending']}（峰值 {io_stats['peak_pending']}）",
+                f"已执行: {io_stats['ops']}，累计写入: {io_stats['written_mb']} MB，最慢一次: {io_stats['slowest_ms']} ms",
+            ]
+            assets = self.asset_cache.get_stats()
+            hit_rate_text = f"{assets['hit_rate']}%" if assets["hit_rate"] is not None else "暂无数据"
+            lines += [
+                "🎨 头像/表情资源缓存:",
+                f"缓存: {assets['size']}/{assets['capacity']}，命中率: {hit_rate_text}",
+                f"上传: {assets['uploads']}，合并的并发请求: {assets['shared']}，失败: {assets['failures']}，淘汰: {assets['evictions']}",
+            ]
+            lines += self._worker_report_lines(lambda report: (
+                f"上传中 {report['upload_pool']['active']}（上限 {report['upload_pool']['max_concurrency'] or '不限'}），"
+                f"排队 {report['upload_pool']['queued']}，在途 {report['upload_pool']['inflight_mb']} MB"
+                f"（上限 {report['upload_pool']['max_inflight_mb'] or '不限'} MB），已完成 {report['upload_pool']['completed']}，"
+                f"异常 {report['upload_pool']['errors']}；媒体转发中 {report['media_admission']['active']}，"
+                f"占用 {report['media_admission']['inflight_mb']} MB（预算 {report['media_admission']['budget_mb'] or '不限'} MB），"
+                f"降级为链接 {report['media_admission']['degraded']}"
+            ))
+            yield event.plain_result("\n".join(lines))
+        elif command == "lane_status":
+            stats = self.lane_scheduler.get_stats()
+            ordering_text = "严格保持顺序" if stats["ordering"] == "strict" else "文本不等待媒体"
+            lines = [f"🚦 转发通道状态: {ordering_text}，活动队列 {stats['active_lanes']}"]
+            for lane, label in (("fast", "快速通道（纯文本）"), ("bulk", "批量通道（含媒体）")):
+                lane_stats = stats[lane]
+                if lane_stats["wait_p50_ms"] is None:
+                    wait_text = "暂无数据"
+                else:
+                    wait_text = (f"p50={lane_stats['wait_p50_ms']} ms, p95={lane_stats['wait_p95_ms']} ms, "
+                                 f"最大={lane_stats['wait_max_ms']} ms")
+                lines.append(
+                    f"- {label}: 已提交={lane_stats['submitted']}, 已完成={lane_stats['processed']}, "
+                    f"排队={lane_stats['queued']}, 排队时间 {wait_text}"
+                )
+            lines += self._worker_report_lines(lambda report: "，".join(
+                f"{label} 已完成={report['lanes'][lane]['processed']}, 排队={report['lanes'][lane]['queued']}, "
+                f"p95={report['lanes'][lane]['wait_p95_ms'] if report['lanes'][lane]['wait_p95_ms'] is not None else '-'} ms"
+                for lane, label in (("fast", "快速通道"), ("bulk", "批量通道"))
+            ))
+            yield event.plain_result("\n".join(lines))
+        elif command == "worker_status":
+            stats = self.worker_pool.get_stats()
+            if not stats["desired"]:
+                yield event.plain_result("🧩 未启用转发工作进程（worker_processes = 0），转发在AstrBot进程中执行")
+                return
+            lines = [
+                f"🧩 转发工作进程: {stats['desired']} 个，套接字: {stats['socket'] or '未启动'}",
+                f"已分发: {stats['dispatched']}，已完成: {stats['completed']}，断开时丢失: {stats['lost']}，"
+                f"重启期间暂存: {stats['held']}，工作进程不可用改为本进程转发: {stats['fallback']}"
+                f"（其中暂存超时、顺序可能交错: {stats['reordered']}），重启: {stats['restarts']}",
+            ]
+            for worker in stats["workers"]:
+                seen_text = f"{worker['last_seen_s']} 秒前" if worker["last_seen_s"] is not None else "无"
+                rtt_text = f"{worker['rtt_ms']} ms" if worker["rtt_ms"] is not None else "暂无数据"
+                p95_text = f"{worker['p95_ms']} ms" if worker["p95_ms"] is not None else "暂无数据"
+                lines.append(
+                    f"- #{worker['index']} pid={worker['pid']} 状态={worker['state']}, 未完成={worker['pending']}, 暂存={worker['held']}, "
+                    f"排队={worker['queued']}, 已完成={worker['completed']}, 重启={worker['restarts']}, "
+                    f"最近响应={seen_text}, ping={rtt_text}, 完成耗时p95={p95_text}"
+                )
+                if worker["budgets"]:
+                    lines.append("  分到的预算: " + "，".join(f"{key}={value:g}" for key, value in worker["budgets"].items()))
+            yield event.plain_result("\n".join(lines))
+        elif command == "mention_status":
+            stats = self.member_names.get_stats()
+            hit_rate_text = f"{stats['hit_rate']}%" if stats["hit_rate"] is not None else "暂无数据"
+            lines = [
+                "👥 成员名称缓存:",
+                f"缓存: {stats['size']}，有效期: {stats['ttl_minutes']} 分钟，命中率: {hit_rate_text}",
+                f"从消息记录: {stats['observed']}，查询: {stats['lookups']}，合并的并发查询: {stats['shared']}",
+                f"查询失败: {stats['lookup_failures']}，等待超时: {stats['timeouts']}",
+            ]
+            yield event.plain_result("\n".join(lines))
+        elif command == "loop_status":
+            if len(args) > 1 and args[1] == "reset":
+                self.loop_monitor.reset()
+                yield event.plain_result("✅ 事件循环延迟统计已清空")
+                return
+            stats = self.loop_monitor.get_stats()
+            if not stats["running"]:
+                yield event.plain_result("🩺 事件循环延迟监控未启用（loop_lag_threshold_ms 为0）")
+                return
+            p99_text = f"{stats['p99_ms']} ms" if stats["p99_ms"] is not None else "暂无数据"
+            lines = [
+                f"🩺 事件循环延迟（阈值 {stats['threshold_ms']} ms）:",
+                f"样本数: {stats['samples']}，p99: {p99_text}，最大: {stats['max_ms']} ms",
+                f"阻塞次数: {stats['stalls']}",
+            ]
+            if stats["offenders"]:
+                lines.append("阻塞排行（按累计阻塞时间）:")
+                for index, offender in enumerate(stats["offenders"], 1):
+                    lines.append(
+                        f"{index}. {offender['location']} - 次数={offender['count']}, "
+                        f"累计={offender['total_ms']} ms, 最长={offender['max_ms']} ms"
+                    )
+                top_stack = stats["offenders"][0]["stack"]
+                if top_stack:
+                    lines.append("最严重阻塞位置的调用栈:")
+                    lines.append(top_stack.rstrip())
+            yield event.plain_result("\n".join(lines))
+        elif command == "profile" and len(args) > 1:
+            try:
+                seconds = float(args[1])
+            except ValueError:
+                yield event.plain_result("❌ 请输入有效的秒数")
+                return
+            if self.cpu_profiler.running:
+                yield event.plain_result("❌ 已有分析任务正在运行")
+                return
+            result = await self.cpu_profiler.run(seconds)
+            lines = [
+                f"🔬 CPU采样分析（{result['seconds']} 秒，{result['samples']} 个样本，事件循环繁忙 {result['busy_percent']}%）:",
+                "插件函数（按累计耗时）:",
+            ]
+            lines += [f"- {item['function']}: {item['percent']}%（{item['samples']}）" for item in result["plugin_cumulative"]] or ["- 无样本"]
+            lines.append("全部函数（按自身耗时）:")
+            lines += [f"- {item['function']}: {item['percent']}%（{item['samples']}）" for item in result["top_self"]] or ["- 无样本"]
+            yield event.plain_result("\n".join(lines))
+        elif command == "memprofile":
+            if len(args) > 1 and args[1] == "stop":
+                if self.memory_profiler.stop():
+                    yield event.plain_result("✅ 已停止内存跟踪")
+                else:
+                    yield event.plain_result("ℹ️ 内存跟踪不是由插件开启的，已清除快照，跟踪保持不变")
+                return
+            result = await self.memory_profiler.snapshot()
+            if result["started"]:
+                yield event.plain_result("🧠 已开始跟踪内存分配并记录基线快照，再次执行 memprofile 查看分配和增长情况（跟踪期间有额外开销，完成后请执行 memprofile stop）")
+                return
+            lines = [f"🧠 内存快照: 当前跟踪 {result['current_mb']} MB，峰值 {result['peak_mb']} MB", "分配最多的位置:"]
+            lines += [f"- {item['location']}: {item['size_kb']} KB（{item['count']} 个对象）" for item in result["top"]]
+            lines.append("相比上次快照增长最多的位置:")
+            lines += [f"- {item['location']}: +{item['diff_kb']} KB（+{item['count_diff']} 个对象）" for item in result["growth"]] or ["- 无增长"]
+            yield event.plain_result("\n".join(lines))
+        elif command == "translation_status":
+            stats = self.translator_manager.get_stats()
+            lines = [
+                "🌐 翻译服务状态:",
+                f"请求次数: {stats['requested']}",
+                f"同语言跳过: {stats['skipped_same_language']}",
+                f"无正文跳过: {stats['skipped_protected']}",
+                f"对冲请求: {stats['hedged']}",
+                f"故障切换: {stats['failed_over']}",
+                f"长文本分段: {stats['chunked']} 条消息，共 {stats['chunks']} 段",
+            ]
+            if not stats["providers"]:
+                lines.append("没有可用的翻译服务商")
+            for provider in stats["providers"]:
+                p95_text = f"{provider['p95_ms']} ms" if provider["p95_ms"] is not None else "样本不足"
+                lines.append(
+                    f"- {provider['name']}: 状态={provider['state']}, 调用={provider['calls']}, "
+                    f"失败={provider['failures']}, 对冲胜出={provider['hedged_wins']}, p95={p95_text}, "
+                    f"排队={provider['queued']}, 排队超时={provider['queue_rejected']}"
+                )
+            lines += self._worker_report_lines(lambda report: (
+                f"请求 {report['translation']['requested']}，长文本分段 {report['translation']['chunked']}，服务商: " + ("；".join(
+                    f"{provider['name']} 调用={provider['calls']}, 失败={provider['failures']}, "
+                    f"排队超时={provider['queue_rejected']}"
+                    for provider in report["translation"]["providers"]
+                ) or "无")
+            ))
+            yield event.plain_result("\n".join(lines))
         else:
             yield event.plain_result("无效的配置命令，请使用 /discord_kook_config 查看帮助")
 
     async def terminate(self):
         """插件销毁时的清理工作"""
+        if self._mapping_watch_task:
+            self._mapping_watch_task.cancel()
+        await self.worker_pool.stop()
+        # 取消尚未完成的转发任务，等待其退出后再关闭IO线程池
+        await self.lane_scheduler.stop()
+        self.member_names.stop()
+        self.loop_monitor.stop()
+        self.memory_profiler.stop()
+        await self.traffic_recorder.flush()
+        await self.asset_cache.flush()
+        if self.translator_manager:
+            await self.translator_manager.close()
+        await self.upload_pool.close()
+        self.io.shutdown()
+        # 写入尚在去抖等待中的配置
+        await self.config_persister.flush()
+        await self.webui_persister.flush()
         logger.info("Discord到Kook转发插件已停止")
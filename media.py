@@ -0,0 +1,445 @@
+"""
+媒体传输模块 - 按字节预算限制并发的媒体上传/下载，大文件的分段并行下载，以及多目标转发时共享传输结果
+"""
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from pathlib import Path
+import aiohttp
+from astrbot.api import logger
+
+MB = 1024 * 1024
+
+
+class ByteBudget:
+    """字节预算（先到先得）
+
+    每个任务按预计字节数占用额度，总占用不超过容量，可选同时限制任务数。
+    单个任务超过总容量时，只在没有其他任务占用额度时放行，避免永远等待。
+    """
+
+    def __init__(self, capacity: int, max_jobs: int = 0):
+        """
+        Args:
+            capacity: 字节容量，0表示不限制
+            max_jobs: 同时进行的任务数上限，0表示不限制
+        """
+        self.capacity = capacity
+        self.max_jobs = max_jobs
+        self.in_flight = 0
+        self.active = 0
+        self.peak = 0
+        self.admitted = 0
+        self.timed_out = 0
+        self._waiters = deque()
+
+    @property
+    def waiting(self) -> int:
+        return sum(1 for fut, _ in self._waiters if not fut.done())
+
+    def resize(self, capacity: int, max_jobs: int = 0):
+        """修改容量和任务数上限，放宽后立即唤醒可以放行的等待者"""
+        self.capacity = capacity
+        self.max_jobs = max_jobs
+        self._wake()
+
+    def _fits(self, nbytes: int) -> bool:
+        if self.max_jobs and self.active >= self.max_jobs:
+            return False
+        if self.capacity <= 0 or self.active == 0:
+            return True
+        return self.in_flight + nbytes <= self.capacity
+
+    def _admit(self, nbytes: int):
+        self.in_flight += nbytes
+        self.active += 1
+        self.admitted += 1
+        self.peak = max(self.peak, self.in_flight)
+
+    def _wake(self):
+        while self._waiters:
+            fut, nbytes = self._waiters[0]
+            if fut.done():
+                self._waiters.popleft()
+                continue
+            if not self._fits(nbytes):
+                break
+            self._waiters.popleft()
+            self._admit(nbytes)
+            fut.set_result(True)
+
+    async def acquire(self, nbytes: int, timeout: float = None) -> bool:
+        """占用额度，排队等待直到放行
+
+        Args:
+            nbytes: 预计字节数
+            timeout: 最长等待时间（秒），None表示一直等待
+
+        Returns:
+            bool: 获得额度返回True，等待超时返回False
+        """
+        if not self._waiters and self._fits(nbytes):
+            self._admit(nbytes)
+            return True
+        if timeout is not None and timeout <= 0:
+            self.timed_out += 1
+            return False
+
+        fut = asyncio.get_running_loop().create_future()
+        entry = (fut, nbytes)
+        self._waiters.append(entry)
+        try:
+            await asyncio.wait_for(fut, timeout)
+            return True
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if fut.done() and not fut.cancelled():
+                # 已获放行但调用方放弃等待，归还额度
+                self.release(nbytes)
+            else:
+                try:
+                    self._waiters.remove(entry)
+                except ValueError:
+                    pass
+                # 队首的等待者离开后，后面的任务可能已经可以放行
+                self._wake()
+            if isinstance(e, asyncio.TimeoutError):
+                self.timed_out += 1
+                return False
+            raise
+
+    def release(self, nbytes: int):
+        """归还额度"""
+        self.in_flight -= nbytes
+        self.active -= 1
+        self._wake()
+
+
+class UploadPool:
+    """Kook asset/create 上传专用执行池
+
+    上传使用独立的HTTP会话，并按并发数和在途字节数限流，大文件上传不会与
+    message/create 等小请求争抢连接，也不会同时占满上行带宽。
+    """
+
+    def __init__(self, max_concurrency: int = 2, max_inflight_mb: float = 100):
+        self.budget = ByteBudget(int(max_inflight_mb * MB), max_concurrency)
+        self._session = None
+        self.completed = 0
+        self.errors = 0
+        self.bytes_uploaded = 0
+        self.upload_seconds = 0.0
+        self.wait_seconds = 0.0
+
+    def update_config(self, config: dict):
+        """按配置调整并发数和在途字节上限"""
+        max_concurrency = max(0, int(config.get("upload_max_concurrency", 2) or 0))
+        max_inflight_mb = max(0.0, float(config.get("upload_max_inflight_mb", 100) or 0))
+        self.budget.resize(int(max_inflight_mb * MB), max_concurrency)
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            # 大文件上传耗时较长，只限制连接和读取响应的时间
+            timeout = aiohttp.ClientTimeout(total=None, sock_connect=30, sock_read=300)
+            self._session = aiohttp.ClientSession(timeout=timeout)
+        return self._session
+
+    @asynccontextmanager
+    async def upload(self, nbytes: int):
+        """占用上传额度并提供上传专用的HTTP会话"""
+        started = time.monotonic()
+        await self.budget.acquire(nbytes)
+        admitted = time.monotonic()
+        waited = admitted - started
+        self.wait_seconds += waited
+        if waited >= 1:
+            logger.info(f"⏳ 上传排队 {waited:.1f} 秒（{nbytes / MB:.2f} MB）")
+        try:
+            yield await self._get_session()
+            self.completed += 1
+            self.bytes_uploaded += nbytes
+            self.upload_seconds += time.monotonic() - admitted
+        except BaseException:
+            self.errors += 1
+            raise
+        finally:
+            self.budget.release(nbytes)
+
+    def get_stats(self) -> dict:
+        """上传队列和吞吐统计"""
+        finished = self.completed + self.errors
+        return {
+            "active": self.budget.active,
+            "queued": self.budget.waiting,
+            "inflight_mb": round(self.budget.in_flight / MB, 2),
+            "peak_inflight_mb": round(self.budget.peak / MB, 2),
+            "max_concurrency": self.budget.max_jobs,
+            "max_inflight_mb": round(self.budget.capacity / MB, 2),
+            "completed": self.completed,
+            "errors": self.errors,
+            "uploaded_mb": round(self.bytes_uploaded / MB, 2),
+            "throughput_mbps": round(self.bytes_uploaded / MB / self.upload_seconds, 2) if self.upload_seconds else None,
+            "avg_wait_ms": round(self.wait_seconds * 1000 / finished, 1) if finished else None,
+        }
+
+    async def close(self):
+        if self._session and not self._session.closed:
+            await self._session.close()
+
+
+class MediaAdmission:
+    """媒体转发准入控制
+
+    每个媒体转发任务（下载、上传、发送）按预计大小占用全局字节预算，
+    预算不足时排队等待，等待超时则降级为只转发链接，使磁盘、文件句柄和内存的占用可预测。
+    """
+
+    # 无法预知大小且未设置大小上限时，按此大小（MB）计入预算
+    DEFAULT_CHARGE_MB = {"image": 8, "video": 50}
+
+    def __init__(self, budget_mb: float = 500, max_wait: float = 30):
+        self.budget = ByteBudget(int(budget_mb * MB))
+        self.max_wait = max_wait
+        self.degraded = 0
+
+    def update_config(self, config: dict):
+        """按配置调整预算和等待上限"""
+        budget_mb = max(0.0, float(config.get("media_budget_mb", 500) or 0))
+        self.max_wait = max(0.0, float(config.get("media_admission_wait", 30) or 0))
+        self.budget.resize(int(budget_mb * MB))
+
+    def estimate(self, size, kind: str, limit_mb: float = 0) -> int:
+        """计算任务计入预算的字节数：已知大小按实际大小，否则按大小上限或默认值"""
+        if isinstance(size, int) and size > 0:
+            return size
+        if limit_mb and limit_mb > 0:
+            return int(limit_mb * MB)
+        return int(self.DEFAULT_CHARGE_MB.get(kind, 8) * MB)
+
+    async def admit(self, nbytes: int) -> bool:
+        """申请预算，等待超过上限时返回False（调用方应降级处理）"""
+        if await self.budget.acquire(nbytes, self.max_wait):
+            return True
+        self.degraded += 1
+        return False
+
+    def release(self, nbytes: int):
+        """归还额度（没有占用预算的任务传入0或None，不做处理）"""
+        if nbytes:
+            self.budget.release(nbytes)
+
+    def get_stats(self) -> dict:
+        return {
+            "active": self.budget.active,
+            "queued": self.budget.waiting,
+            "inflight_mb": round(self.budget.in_flight / MB, 2),
+            "peak_inflight_mb": round(self.budget.peak / MB, 2),
+            "budget_mb": round(self.budget.capacity / MB, 2),
+            "admitted": self.budget.admitted,
+            "degraded": self.degraded,
+        }
+
+
+class SegmentedDownloader:
+    """分段并行下载器
+
+    对支持HTTP Range的大文件按固定大小切分为多个分段，使用多个连接并发下载，
+    在IO线程池中按偏移写入预先分配好大小的文件（每个分段的数据累积到一定大小后合并写入）；
+    分段失败时从已写入的位置继续下载，而不是整个文件重新开始。
+    """
+
+    MAX_RETRIES = 3
+    READ_SIZE = 256 * 1024
+    WRITE_BATCH = 1024 * 1024
+
+    def __init__(self, io, connections: int = 4, chunk_mb: float = 4):
+        """
+        Args:
+            io: 执行文件操作的IOExecutor
+        """
+        self.io = io
+        self.connections = connections
+        self.chunk_size = int(chunk_mb * MB)
+        self.downloads = 0
+        self.resumed_segments = 0
+        self._write_lock = threading.Lock()
+
+    def update_config(self, config: dict):
+        """按配置调整连接数和分段大小"""
+        self.connections = max(1, int(config.get("download_connections", 4) or 1))
+        self.chunk_size = max(MB // 4, int(float(config.get("download_chunk_mb", 4) or 4) * MB))
+
+    def applicable(self, size) -> bool:
+        """文件大小已知且至少能切分为两个分段时才使用分段下载"""
+        return self.connections > 1 and isinstance(size, int) and size >= self.chunk_size * 2
+
+    async def _probe(self, session: aiohttp.ClientSession, url: str):
+        """确认服务器支持Range请求，返回文件大小（大小未知或为0时返回None）"""
+        async with session.head(url, allow_redirects=True) as response:
+            if response.status != 200 or response.headers.get("Accept-Ranges", "").lower() != "bytes":
+                return None
+            # 部分服务器对HEAD返回 Content-Length: 0，不能当作空文件
+            return response.content_length or None
+
+    @staticmethod
+    def _preallocate(path: Path, size: int) -> int:
+        fd = os.open(path, os.O_RDWR | os.O_CREAT | getattr(os, "O_BINARY", 0), 0o644)
+        try:
+            if hasattr(os, "posix_fallocate"):
+                os.posix_fallocate(fd, 0, size)
+            else:
+                os.ftruncate(fd, size)
+        except OSError:
+            # 文件系统不支持预分配时退回到设置文件长度
+            os.ftruncate(fd, size)
+        return fd
+
+    def _write_at(self, fd: int, offset: int, data: bytes):
+        if hasattr(os, "pwrite"):
+            os.pwrite(fd, data, offset)
+            return
+        # 没有pwrite的平台（Windows）用锁保证定位和写入不被其他分段打断
+        with self._write_lock:
+            os.lseek(fd, offset, os.SEEK_SET)
+            os.write(fd, data)
+
+    async def _fetch_segment(self, session: aiohttp.ClientSession, url: str, fd: int, start: int, end: int):
+        """下载 [start, end] 字节区间，失败时从已写入的位置继续"""
+        position = start
+        buffer = bytearray()
+
+        async def flush():
+            nonlocal position, buffer
+            if buffer:
+                batch, buffer = buffer, bytearray()
+                await self.io.run(self._write_at, fd, position, batch)
+                self.io.bytes_written += len(batch)
+                position += len(batch)
+
+        for attempt in range(self.MAX_RETRIES + 1):
+            try:
+                headers = {"Range": f"bytes={position}-{end}"}
+                async with session.get(url, headers=headers) as response:
+                    if response.status != 206:
+                        raise RuntimeError(f"服务器未返回分段内容，状态码: {response.status}")
+                    async for data in response.content.iter_chunked(self.READ_SIZE):
+                        buffer += data[:end + 1 - position - len(buffer)]
+                        if len(buffer) >= self.WRITE_BATCH:
+                            await flush()
+                await flush()
+                if position > end:
+                    return
+                raise RuntimeError(f"分段提前结束: {position - start}/{end + 1 - start} 字节")
+            except (aiohttp.ClientError, asyncio.TimeoutError, RuntimeError) as e:
+                # 已收到的数据先写入，之后从其后继续
+                await flush()
+                if attempt >= self.MAX_RETRIES:
+                    raise
+                self.resumed_segments += 1
+                logger.warning(f"⚠️ 分段 {start}-{end} 下载中断（{e}），从 {position} 继续")
+                await asyncio.sleep(0.5 * (attempt + 1))
+
+    async def download(self, url: str, path: Path, size: int) -> bool:
+        """分段并行下载到指定路径
+
+        Returns:
+            bool: 下载成功返回True；服务器不支持Range或下载失败时返回False（调用方应改用普通下载）
+        """
+        started = time.monotonic()
+        fd = None
+        try:
+            async with aiohttp.ClientSession() as session:
+                probed = await self._probe(session, url)
+                if probed is None:
+                    logger.info("📥 服务器不支持分段下载或未提供文件大小，改用普通下载")
+                    return False
+                size = probed
+
+                fd = await self.io.run(self._preallocate, path, size)
+                segments = [(start, min(start + self.chunk_size, size) - 1) for start in range(0, size, self.chunk_size)]
+                queue = asyncio.Queue()
+                for segment in segments:
+                    queue.put_nowait(segment)
+
+                async def worker():
+                    while not queue.empty():
+                        start, end = queue.get_nowait()
+                        await self._fetch_segment(session, url, fd, start, end)
+
+                workers = [asyncio.create_task(worker()) for _ in range(min(self.connections, len(segments)))]
+                try:
+                    await asyncio.gather(*workers)
+                except BaseException:
+                    for task in workers:
+                        task.cancel()
+                    raise
+
+            elapsed = time.monotonic() - started
+            self.downloads += 1
+            logger.info(f"✅ 分段下载完成: {size / MB:.2f} MB，{len(segments)} 个分段，"
+                        f"{min(self.connections, len(segments))} 个连接，{size / MB / max(elapsed, 0.001):.2f} MB/s")
+            return True
+        except Exception as e:
+            logger.warning(f"⚠️ 分段下载失败，改用普通下载: {e}")
+            return False
+        finally:
+            if fd is not None:
+                await self.io.run(os.close, fd)
+
+
+class SharedTransfers:
+    """一条消息分发到多个Kook频道时共享的下载和上传结果
+
+    同一媒体的预算申请、下载，同一本地文件的上传只执行一次，各目标等待同一个结果。
+    只在一次分发期间有效（通过 SHARED_TRANSFERS 上下文变量传递给该次分发的各个发送任务）。
+    """
+
+    def __init__(self):
+        self._results = {}
+        self.shared = 0
+        # 本次分发占用的媒体预算，所有目标完成后统一归还
+        self.charges = []
+
+    async def run(self, key, factory):
+        return (await self.run_owned(key, factory))[0]
+
+    async def run_owned(self, key, factory) -> tuple:
+        """与run相同，另外返回调用方是否为实际执行 factory() 的第一个任务"""
+        future = self._results.get(key)
+        owner = future is None
+        if owner:
+            future = self._results[key] = asyncio.ensure_future(factory())
+        else:
+            self.shared += 1
+        return await asyncio.shield(future), owner
+
+    def cancel(self):
+        """分发结束（或被取消）时取消仍在进行的共享任务"""
+        for future in self._results.values():
+            future.cancel()
+
+
+SHARED_TRANSFERS = contextvars.ContextVar("shared_transfers", default=None)
+
+
+async def shared_transfer(key, factory):
+    """在多目标分发期间共享 factory() 的结果，不在分发中时直接执行"""
+    transfers = SHARED_TRANSFERS.get()
+    if transfers is None:
+        return await factory()
+    return await transfers.run(key, factory)
+
+
+async def shared_admission(key, factory) -> tuple:
+    """在多目标分发期间共享预算申请的结果
+
+    Returns:
+        tuple: (factory() 的结果, 调用方是否为申请者)；只有申请者需要归还占用的预算
+    """
+    transfers = SHARED_TRANSFERS.get()
+    if transfers is None:
+        return await factory(), True
+    return await transfers.run_owned(key, factory)
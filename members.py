@@ -0,0 +1,121 @@
+"""
+成员名称模块 - 缓存Discord用户ID到显示名称的映射，用于把@提及显示为名称
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from astrbot.api import logger
+
+
+class MemberNameCache:
+    """Discord用户ID到显示名称的缓存（TTL + LRU）
+
+    名称主要来自已经收到的消息（发送者名称、消息中提及的成员），不产生额外请求；
+    缓存中没有的用户才通过Discord适配器查询，同一用户的并发查询只执行一次。
+    查询在短时间内没有返回时先显示用户ID，查询在后台继续并写入缓存，供之后的消息使用。
+    """
+
+    # 缓存的名称数上限
+    MAX_ENTRIES = 5000
+    # 查询失败的用户在此时间内不再查询（秒）
+    NEGATIVE_TTL = 300
+    # 转发流程等待查询结果的最长时间（秒）
+    LOOKUP_WAIT = 1.0
+
+    def __init__(self, ttl: float = 3600):
+        self.ttl = ttl
+        self._names = OrderedDict()
+        self._failed = {}
+        self._inflight = {}
+        self.stats = {"hits": 0, "misses": 0, "observed": 0, "lookups": 0, "shared": 0,
+                      "lookup_failures": 0, "timeouts": 0}
+
+    def update_config(self, config: dict):
+        minutes = config.get("member_name_ttl_minutes", 60)
+        self.ttl = max(1, int(minutes if minutes is not None else 60)) * 60
+
+    def observe(self, user_id, name: str):
+        """记录消息中出现的用户名称"""
+        if not user_id or not name:
+            return
+        key = str(user_id)
+        self._names[key] = (name, time.monotonic() + self.ttl)
+        self._names.move_to_end(key)
+        self._failed.pop(key, None)
+        self.stats["observed"] += 1
+        while len(self._names) > self.MAX_ENTRIES:
+            self._names.popitem(last=False)
+
+    def peek(self, user_id) -> str:
+        """只读取缓存，不触发查询；过期的名称视为未缓存"""
+        key = str(user_id)
+        entry = self._names.get(key)
+        if entry is None:
+            return None
+        name, expires_at = entry
+        if time.monotonic() >= expires_at:
+            del self._names[key]
+            return None
+        self._names.move_to_end(key)
+        return name
+
+    async def resolve(self, user_id, lookup) -> str:
+        """获取用户名称，未缓存时调用 lookup(user_id) 查询
+
+        Returns:
+            str: 用户名称，查询失败或等待超时时返回None
+        """
+        key = str(user_id)
+        name = self.peek(key)
+        if name is not None:
+            self.stats["hits"] += 1
+            return name
+
+        failed_at = self._failed.get(key)
+        if failed_at is not None and time.monotonic() - failed_at < self.NEGATIVE_TTL:
+            self.stats["misses"] += 1
+            return None
+
+        task = self._inflight.get(key)
+        if task is None:
+            self.stats["misses"] += 1
+            self.stats["lookups"] += 1
+            task = self._inflight[key] = asyncio.create_task(self._lookup(key, lookup))
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.stats["shared"] += 1
+
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), self.LOOKUP_WAIT)
+        except asyncio.TimeoutError:
+            self.stats["timeouts"] += 1
+            return None
+
+    async def _lookup(self, key: str, lookup) -> str:
+        try:
+            name = await lookup(key)
+        except Exception as e:
+            logger.debug(f"查询Discord用户名称失败: {key} - {e}")
+            name = None
+        if name:
+            self.observe(key, name)
+        else:
+            self.stats["lookup_failures"] += 1
+            if len(self._failed) >= self.MAX_ENTRIES:
+                self._failed.clear()
+            self._failed[key] = time.monotonic()
+        return name
+
+    def get_stats(self) -> dict:
+        lookups = self.stats["hits"] + self.stats["misses"] + self.stats["shared"]
+        return {
+            **self.stats,
+            "size": len(self._names),
+            "ttl_minutes": round(self.ttl / 60),
+            "hit_rate": round(self.stats["hits"] * 100 / lookups, 1) if lookups else None,
+        }
+
+    def stop(self):
+        """取消尚未完成的查询（插件停止时调用）"""
+        for task in list(self._inflight.values()):
+            task.cancel()
@@ -0,0 +1,122 @@
+"""
+配置持久化模块 - 去重、去抖，并在工作线程中原子写入
+"""
+import asyncio
+import os
+import tempfile
+from pathlib import Path
+from astrbot.api import logger
+
+
+def atomic_write_text(path: Path, text: str):
+    """先写入同目录下的临时文件再原子重命名，写入中途崩溃不会留下截断的文件"""
+    path = Path(path)
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=path.parent)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class DebouncedPersister:
+    """写回式持久化器
+
+    提交的内容与上次保存（或等待保存）的内容相同时直接忽略；短时间内的多次提交
+    会合并为一次写入，写入在延迟到期后进行，不占用消息处理路径。
+    """
+
+    def __init__(self, name: str, write_fn, delay: float = 1.0, in_thread: bool = True):
+        """
+        Args:
+            name: 日志中使用的名称
+            write_fn: 实际写入函数，参数为提交的内容
+            delay: 去抖延迟（秒）
+            in_thread: 是否在工作线程中执行写入函数
+        """
+        self.name = name
+        self.write_fn = write_fn
+        self.delay = delay
+        self.in_thread = in_thread
+        self._saved = None
+        self._pending = None
+        self._task = None
+        self.writes = 0
+        self.skipped = 0
+
+    def mark_saved(self, content):
+        """记录已持久化的内容（如启动时从文件读取的内容），避免重复写入"""
+        self._saved = content
+
+    def submit(self, content) -> bool:
+        """提交待保存的内容
+
+        Returns:
+            bool: 内容有变化并已安排写入时返回True
+        """
+        latest = self._pending if self._pending is not None else self._saved
+        if content == latest:
+            self.skipped += 1
+            return False
+
+        self._pending = content
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # 没有运行中的事件循环时直接同步写入
+            self._write(content)
+            return True
+
+        if self._task is None or self._task.done():
+            self._task = loop.create_task(self._run())
+        return True
+
+    def _write(self, content):
+        self.write_fn(content)
+        self._saved = content
+        if self._pending == content:
+            self._pending = None
+        self.writes += 1
+
+    async def _run(self):
+        """等待去抖延迟后写入，写入期间的新提交会在下一轮写入"""
+        while self._pending is not None:
+            await asyncio.sleep(self.delay)
+            await self._write_pending()
+
+    async def _write_pending(self):
+        content = self._pending
+        if content is None:
+            return
+        try:
+            if self.in_thread:
+                await asyncio.to_thread(self.write_fn, content)
+            else:
+                self.write_fn(content)
+            self._saved = content
+            if self._pending == content:
+                self._pending = None
+            self.writes += 1
+            logger.debug(f"💾 {self.name}已保存")
+        except Exception as e:
+            # 清空保存记录，下一次提交相同内容时会重新写入
+            logger.warning(f"⚠️ {self.name}保存失败: {e}")
+            self._pending = None
+            self._saved = None
+
+    async def flush(self):
+        """立即写入等待中的内容（插件停止时调用）"""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        await self._write_pending()
@@ -0,0 +1,322 @@
+"""
+频道路由模块 - 频道映射的增量加载，子区到父频道的索引
+"""
+import asyncio
+import hashlib
+import os
+import re
+import time
+from collections import OrderedDict
+from pathlib import Path
+from astrbot.api import logger
+
+# 映射行末尾的目标语言（如 en、ja、zh-TW），off 表示该目标不翻译
+LANGUAGE_TOKEN_PATTERN = re.compile(r'^(?:[A-Za-z]{2,3}(?:-[A-Za-z0-9]{2,4})?|off)$')
+NO_TRANSLATION = "off"
+
+
+def parse_mapping_line(line: str):
+    """解析一行频道映射
+
+    格式为 "Discord频道ID 空格 Kook频道ID [目标语言]"，多个空格时取首尾作为频道ID；
+    最后一项是语言代码时作为该目标的翻译语言。
+
+    Returns:
+        tuple: (discord_id, kook_id, language)，未指定语言时language为None；格式错误或ID不是数字时返回None
+    """
+    parts = line.split()
+    if len(parts) < 2:
+        return None
+    language = None
+    if len(parts) > 2 and LANGUAGE_TOKEN_PATTERN.match(parts[-1]):
+        language = parts.pop()
+    discord_id, kook_id = parts[0], parts[-1]
+    if not discord_id.isdigit() or not kook_id.isdigit():
+        return None
+    return discord_id, kook_id, language
+
+
+def format_mapping_line(discord_id: str, kook_id: str, language: str = None) -> str:
+    return f"{discord_id} {kook_id} {language}" if language else f"{discord_id} {kook_id}"
+
+
+def normalize_mapping_lines(text: str) -> dict:
+    """提取映射文本中的有效行（去除首尾空白、空行和#注释行）
+
+    Returns:
+        dict: 有效行 -> 该行在文本中的序号，按文本顺序排列，重复的行只保留第一次出现的位置
+    """
+    lines = {}
+    for line in text.splitlines():
+        line = line.strip()
+        if line and not line.startswith('#'):
+            lines.setdefault(line, len(lines))
+    return lines
+
+
+def _mapping_discord_id(line: str):
+    """映射文本中一行对应的Discord频道ID，空行、注释行和格式错误的行返回None"""
+    line = line.strip()
+    if not line or line.startswith('#'):
+        return None
+    parsed = parse_mapping_line(line)
+    return parsed[0] if parsed else None
+
+
+class RouteTable:
+    """Discord频道 -> Kook频道 路由表
+
+    映射可以来自多个来源（WebUI文本、独立映射文件），每次加载只对比新旧行集合，
+    按文本顺序解析并应用变化的行，而不是重建整个路由表。来源优先级按 SOURCE_PRIORITY 排列。
+    每个来源保留用户的原始文本（包括注释和顺序），写回配置时使用原始文本。
+
+    同一Discord频道可以有多行映射，消息会分发到所有目标Kook频道，每个目标可以指定翻译语言。
+    目标按映射行在文本中的位置排列，routes 中保存每个Discord频道第一行的目标；
+    有多个目标或指定了语言的频道另外记录在 fanout 中。同一对频道出现多行时只使用第一行。
+    """
+
+    SOURCE_PRIORITY = ("file", "webui")
+
+    def __init__(self):
+        # 对外暴露的路由字典，对象本身保持不变，只做增量修改
+        self.routes = {}
+        # Discord频道 -> ((Kook频道, 目标语言), ...)，只包含多目标或指定了语言的路由
+        self.fanout = {}
+        # 每次路由变化时递增（转发工作进程据此判断是否需要重新同步映射）
+        self.version = 0
+        self._entries = {source: {} for source in self.SOURCE_PRIORITY}
+        self._targets = {source: {} for source in self.SOURCE_PRIORITY}
+        # Discord频道 -> {映射行: (Kook频道, 目标语言)}，删除时按行匹配
+        self._route_lines = {source: {} for source in self.SOURCE_PRIORITY}
+        self._lines = {source: {} for source in self.SOURCE_PRIORITY}
+        self._texts = {source: "" for source in self.SOURCE_PRIORITY}
+        self._invalid = {source: set() for source in self.SOURCE_PRIORITY}
+        self.stats = {source: {"count": 0, "invalid": 0, "parse_ms": 0.0, "added": 0, "removed": 0, "loaded_at": None}
+                      for source in self.SOURCE_PRIORITY}
+        self._file_state = None
+
+    def _resolve(self, discord_id: str):
+        """按来源优先级重新计算单个Discord频道的路由"""
+        for source in self.SOURCE_PRIORITY:
+            kook_id = self._entries[source].get(discord_id)
+            if kook_id is not None:
+                self.routes[discord_id] = kook_id
+                targets = self._targets[source][discord_id]
+                if len(targets) > 1 or any(targets.values()):
+                    self.fanout[discord_id] = tuple(targets.items())
+                else:
+                    self.fanout.pop(discord_id, None)
+                return
+        self.routes.pop(discord_id, None)
+        self.fanout.pop(discord_id, None)
+
+    def _rebuild_targets(self, source: str, discord_id: str, positions: dict) -> list:
+        """按映射行在文本中的位置重建单个Discord频道的目标列表
+
+        Returns:
+            list: 重复映射同一Kook频道而被忽略的行
+        """
+        route_lines = self._route_lines[source].get(discord_id)
+        if not route_lines:
+            self._route_lines[source].pop(discord_id, None)
+            self._targets[source].pop(discord_id, None)
+            self._entries[source].pop(discord_id, None)
+            return []
+        targets = {}
+        duplicates = []
+        for line in sorted(route_lines, key=positions.__getitem__):
+            kook_id, language = route_lines[line]
+            if kook_id in targets:
+                duplicates.append(line)
+                continue
+            targets[kook_id] = language
+        self._targets[source][discord_id] = targets
+        self._entries[source][discord_id] = next(iter(targets))
+        return duplicates
+
+    def apply_text(self, source: str, text: str) -> bool:
+        """按行对比并应用某个来源的映射文本
+
+        Returns:
+            bool: 路由表是否发生变化
+        """
+        started = time.perf_counter()
+        text = text or ""
+        self._texts[source] = text
+        new_lines = normalize_mapping_lines(text)
+        old_lines = self._lines[source]
+        if new_lines.keys() == old_lines.keys():
+            self._lines[source] = new_lines
+            return False
+
+        removed = [line for line in old_lines if line not in new_lines]
+        added = [line for line in new_lines if line not in old_lines]
+        entries = self._entries[source]
+        invalid = self._invalid[source]
+        touched = {}
+
+        route_lines = self._route_lines[source]
+
+        for line in removed:
+            invalid.discard(line)
+            parsed = parse_mapping_line(line)
+            if parsed:
+                route_lines.get(parsed[0], {}).pop(line, None)
+                touched[parsed[0]] = None
+
+        for line in added:
+            parsed = parse_mapping_line(line)
+            if parsed is None:
+                invalid.add(line)
+                continue
+            route_lines.setdefault(parsed[0], {})[line] = parsed[1:]
+            touched[parsed[0]] = None
+
+        duplicates = []
+        for discord_id in touched:
+            duplicates.extend(self._rebuild_targets(source, discord_id, new_lines))
+            self._resolve(discord_id)
+
+        self._lines[source] = new_lines
+        self.version += 1
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.stats[source].update(
+            count=len(entries), invalid=len(invalid), parse_ms=round(elapsed_ms, 2),
+            added=len(added), removed=len(removed), loaded_at=time.time(),
+        )
+        logger.info(f"✅ 频道映射已更新({source}): +{len(added)} -{len(removed)} 行，共 {len(entries)} 个映射，"
+                    f"路由总数 {len(self.routes)}，耗时 {elapsed_ms:.2f} ms")
+        if invalid:
+            samples = ", ".join(sorted(invalid)[:5])
+            logger.warning(f"⚠️ {source} 中有 {len(invalid)} 行映射格式错误（ID需为数字）: {samples}")
+        if duplicates:
+            samples = ", ".join(duplicates[:5])
+            logger.warning(f"⚠️ {source} 中有 {len(duplicates)} 行重复映射同一对频道，只使用第一行: {samples}")
+        return True
+
+    def apply_mapping(self, source: str, mapping: dict) -> bool:
+        """以字典形式应用某个来源的映射"""
+        return self.apply_text(source, "\n".join(f"{discord_id} {kook_id}" for discord_id, kook_id in mapping.items()))
+
+    def set_route(self, source: str, discord_id: str, kook_id: str, language: str = None):
+        """添加或修改单个映射（替换该Discord频道在此来源中的所有目标）
+
+        在原始文本中把该频道的第一行映射替换为新映射并删除其余行，没有时追加到末尾，其他行和注释保持不变。
+        """
+        new_line = format_mapping_line(discord_id, kook_id, language)
+        lines = []
+        replaced = False
+        for line in self._texts[source].splitlines():
+            if _mapping_discord_id(line) != discord_id:
+                lines.append(line)
+            elif not replaced:
+                lines.append(new_line)
+                replaced = True
+        if not replaced:
+            lines.append(new_line)
+        self.apply_text(source, "\n".join(lines))
+
+    def remove_route(self, source: str, discord_id: str) -> bool:
+        """移除单个Discord频道的所有映射（从原始文本中删除该频道的映射行）"""
+        if discord_id not in self._entries[source]:
+            return False
+        lines = [line for line in self._texts[source].splitlines() if _mapping_discord_id(line) != discord_id]
+        self.apply_text(source, "\n".join(lines))
+        return True
+
+    def source_entries(self, source: str) -> dict:
+        """某个来源中每个Discord频道的第一个目标"""
+        return self._entries[source]
+
+    def source_text(self, source: str) -> str:
+        """某个来源的原始映射文本，包括注释和行顺序（用于写回该来源的配置）"""
+        return self._texts[source]
+
+    def read_changed_file(self, path: Path):
+        """按修改时间和校验和检查映射文件，只读取不修改路由表（可在工作线程中调用）
+
+        Returns:
+            str: 文件内容有变化时返回新内容（文件被删除时返回空字符串），否则返回None
+        """
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            if self._file_state is not None:
+                logger.warning(f"⚠️ 频道映射文件已不存在: {path}")
+                self._file_state = None
+                return ""
+            return None
+
+        if self._file_state and self._file_state[0] == (stat.st_mtime_ns, stat.st_size):
+            return None
+
+        with open(path, 'rb') as f:
+            content = f.read()
+        checksum = hashlib.sha1(content).hexdigest()
+        changed = not self._file_state or self._file_state[1] != checksum
+        self._file_state = ((stat.st_mtime_ns, stat.st_size), checksum)
+        return content.decode('utf-8', errors='replace') if changed else None
+
+
+class ThreadIndex:
+    """Discord子区（thread、论坛帖子）ID -> 父频道ID 索引
+
+    索引主要从消息事件自带的频道信息中填充；事件中没有频道信息时才通过Discord适配器查询，
+    同一频道的并发查询只执行一次。普通频道也记录在索引中（父频道为None），避免重复查询。
+    """
+
+    # 索引的频道数上限（按最近使用淘汰）
+    MAX_ENTRIES = 20000
+
+    def __init__(self):
+        self._parents = OrderedDict()
+        self._inflight = {}
+        self.stats = {"hits": 0, "observed": 0, "lookups": 0, "lookup_failures": 0}
+
+    def observe(self, channel_id: str, parent_id: str = None):
+        """记录频道的父频道（普通频道的父频道为None）"""
+        if not channel_id:
+            return
+        key = str(channel_id)
+        self._parents[key] = str(parent_id) if parent_id else None
+        self._parents.move_to_end(key)
+        self.stats["observed"] += 1
+        while len(self._parents) > self.MAX_ENTRIES:
+            self._parents.popitem(last=False)
+
+    async def parent_of(self, channel_id: str, lookup) -> str:
+        """获取频道的父频道ID，未索引时调用 lookup(channel_id) 查询
+
+        Returns:
+            str: 父频道ID，普通频道或查询失败时返回None
+        """
+        key = str(channel_id)
+        if key in self._parents:
+            self._parents.move_to_end(key)
+            self.stats["hits"] += 1
+            return self._parents[key]
+
+        task = self._inflight.get(key)
+        if task is None:
+            self.stats["lookups"] += 1
+            task = self._inflight[key] = asyncio.create_task(self._lookup(key, lookup))
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _lookup(self, key: str, lookup):
+        try:
+            parent_id = await lookup(key)
+        except Exception as e:
+            logger.warning(f"⚠️ 查询Discord频道的父频道失败: {key} - {e}")
+            self.stats["lookup_failures"] += 1
+            # 查询失败按普通频道处理，避免每条消息都重新查询
+            parent_id = None
+        self.observe(key, parent_id)
+        return self._parents.get(key)
+
+    @property
+    def thread_count(self) -> int:
+        return sum(1 for parent_id in self._parents.values() if parent_id)
+
+    def get_stats(self) -> dict:
+        return {**self.stats, "size": len(self._parents), "threads": self.thread_count}
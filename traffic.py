@@ -0,0 +1,362 @@
+"""
+流量录制与回放模块 - 录制匿名化的消息形态，并按真实节奏回放以检验转发性能
+
+录制文件为JSONL，每行一条消息，只包含消息形态，不包含任何文本内容、用户名或ID：
+    {"dt": 0.53, "channel": "3f2a9c1e", "bot": false, "components": [{"type": "Text", "len": 42},
+     {"type": "image", "ext": ".png", "size": 123456}]}
+
+回放（在AstrBot根目录下运行，使插件包可以被导入）：
+    python -m data.plugins.<插件目录>.traffic <录制文件> --speed 10
+"""
+import asyncio
+import hashlib
+import json
+import os
+import secrets
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from urllib.parse import urlparse
+from astrbot.api import logger
+from .jobs import ForwardJob, MediaRef, Mention
+
+# 回放时使用的机器人ID
+REPLAY_BOT_ID = "replay-bot"
+# 回放速度范围
+MIN_SPEED = 1
+MAX_SPEED = 100
+# 录制中没有大小信息时回放使用的默认大小（字节）
+DEFAULT_REPLAY_SIZE = {"image": 200 * 1024, "video": 4 * 1024 * 1024, "file": 1024 * 1024}
+
+
+def _url_ext(url: str) -> str:
+    return Path(urlparse(url).path).suffix.lower() if url else ''
+
+
+class TrafficRecorder:
+    """匿名化的消息形态录制器
+
+    只在配置了录制文件时启用。记录片段类型、文本长度、附件大小和消息间隔；
+    频道ID使用每次启动随机生成的盐做哈希，只保留"是否同一频道"的信息。
+    录制内容先缓存在内存中，按间隔批量在工作线程中追加写入文件。
+    """
+
+    FLUSH_INTERVAL = 2.0
+
+    def __init__(self):
+        self.path = None
+        self._salt = secrets.token_hex(8)
+        self._last_at = None
+        self._buffer = []
+        self._task = None
+        self.recorded = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.path is not None
+
+    def update_config(self, config: dict, base_dir: Path):
+        """按配置启用或停止录制，相对路径以插件目录为基准"""
+        path_text = (config.get("traffic_record_file") or "").strip()
+        path = None
+        if path_text:
+            path = Path(path_text)
+            if not path.is_absolute():
+                path = base_dir / path
+        if path != self.path:
+            if path:
+                logger.info(f"📼 开始录制消息流量: {path}")
+            elif self.path:
+                logger.info(f"📼 已停止录制消息流量，共 {self.recorded} 条")
+            self.path = path
+            self._last_at = None
+
+    def _channel_key(self, channel_id) -> str:
+        return hashlib.sha1(f"{self._salt}:{channel_id}".encode('utf-8')).hexdigest()[:8]
+
+    def record(self, job: ForwardJob):
+        """记录一条Discord消息的形态"""
+        if not self.enabled:
+            return
+        now = time.monotonic()
+        dt = 0.0 if self._last_at is None else now - self._last_at
+        self._last_at = now
+
+        components = []
+        for part in job.parts:
+            if isinstance(part, str):
+                components.append({"type": "Text", "len": len(part)})
+            elif isinstance(part, Mention):
+                components.append({"type": "Mention"})
+            else:
+                components.append({"type": part.kind, "ext": part.ext or _url_ext(part.url), "size": part.size})
+
+        self._buffer.append(json.dumps({
+            "dt": round(dt, 3),
+            "channel": self._channel_key(job.discord_channel_id),
+            "bot": job.is_bot_message,
+            "components": components,
+        }, ensure_ascii=False))
+        self.recorded += 1
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.FLUSH_INTERVAL)
+        await self.flush()
+
+    def _append(self, path: Path, lines: list):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write("\n".join(lines) + "\n")
+
+    async def flush(self):
+        """把缓存的录制内容追加写入文件"""
+        if not self._buffer or not self.path:
+            self._buffer.clear()
+            return
+        lines, self._buffer = self._buffer, []
+        try:
+            await asyncio.to_thread(self._append, self.path, lines)
+        except Exception as e:
+            logger.warning(f"⚠️ 写入流量录制文件失败: {e}")
+
+
+def load_recording(path) -> list:
+    """读取录制文件，跳过格式错误的行"""
+    records = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                logger.warning(f"⚠️ 跳过格式错误的录制行: {line[:80]}")
+    return records
+
+
+class StandInServer:
+    """本地的Kook API和Discord CDN替身
+
+    - GET/HEAD /cdn/{size}/{name}：返回指定大小的文件内容
+    - POST /api/v3/asset/create：读取上传内容并返回资源URL
+    - POST /api/v3/message/create：返回发送成功
+    """
+
+    CHUNK = b"\0" * 65536
+
+    def __init__(self):
+        self.base_url = None
+        self._runner = None
+        self.stats = {"cdn_requests": 0, "cdn_bytes": 0, "uploads": 0, "upload_bytes": 0, "messages": 0}
+
+    async def start(self):
+        from aiohttp import web
+
+        app = web.Application(client_max_size=1024 ** 3)
+        app.router.add_get("/cdn/{size}/{name}", self._serve_cdn)
+        app.router.add_post("/api/v3/asset/create", self._asset_create)
+        app.router.add_post("/api/v3/message/create", self._message_create)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, "127.0.0.1", 0).start()
+        port = self._runner.addresses[0][1]
+        self.base_url = f"http://127.0.0.1:{port}"
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+
+    def media_url(self, size: int, name: str) -> str:
+        return f"{self.base_url}/cdn/{size}/{name}"
+
+    async def _serve_cdn(self, request):
+        from aiohttp import web
+
+        size = int(request.match_info["size"])
+        response = web.StreamResponse(headers={"Content-Length": str(size), "Content-Type": "application/octet-stream"})
+        await response.prepare(request)
+        if request.method == "HEAD":
+            return response
+        self.stats["cdn_requests"] += 1
+        remaining = size
+        while remaining > 0:
+            chunk = self.CHUNK[:min(remaining, len(self.CHUNK))]
+            await response.write(chunk)
+            remaining -= len(chunk)
+        self.stats["cdn_bytes"] += size
+        await response.write_eof()
+        return response
+
+    async def _asset_create(self, request):
+        from aiohttp import web
+
+        size = 0
+        reader = await request.multipart()
+        async for part in reader:
+            while True:
+                chunk = await part.read_chunk()
+                if not chunk:
+                    break
+                size += len(chunk)
+        self.stats["uploads"] += 1
+        self.stats["upload_bytes"] += size
+        return web.json_response({"code": 0, "data": {"url": f"{self.base_url}/cdn/{size}/asset"}})
+
+    async def _message_create(self, request):
+        from aiohttp import web
+
+        await request.read()
+        self.stats["messages"] += 1
+        return web.json_response({"code": 0, "message": "ok", "data": {}})
+
+
+class StandInKookClient:
+    """替代Kook适配器客户端，请求发往本地替身服务"""
+
+    def __init__(self, server: StandInServer):
+        self.server = server
+        self.token = "replay"
+
+    async def send_text(self, channel_id: str, text: str):
+        import aiohttp
+
+        async with aiohttp.ClientSession() as session:
+            payload = {"target_id": channel_id, "content": text, "type": 1}
+            async with session.post(f"{self.server.base_url}/api/v3/message/create", json=payload) as resp:
+                return resp.status == 200
+
+    async def send_image(self, channel_id: str, path: str):
+        import aiohttp
+
+        async with aiohttp.ClientSession() as session:
+            with open(path, 'rb') as f:
+                data = aiohttp.FormData()
+                data.add_field('file', f, filename=Path(path).name)
+                async with session.post(f"{self.server.base_url}/api/v3/asset/create", data=data) as resp:
+                    if resp.status != 200:
+                        return False
+        return await self.send_text(channel_id, "asset")
+
+
+def job_from_record(record: dict, server: StandInServer, index: int) -> ForwardJob:
+    """根据录制的消息形态构造转发任务，附件指向本地CDN替身"""
+    parts = []
+    for position, entry in enumerate(record.get("components", [])):
+        kind = entry.get("type")
+        if kind == "Text":
+            length = entry.get("len", 0)
+            parts.append(("lorem ipsum " * (length // 12 + 1))[:length])
+        elif kind == "Mention":
+            parts.append(Mention(f"replay-{index}-{position}", "replay"))
+        elif kind in DEFAULT_REPLAY_SIZE:
+            size = entry.get("size") or DEFAULT_REPLAY_SIZE[kind]
+            name = f"replay_{index}_{position}{entry.get('ext') or '.bin'}"
+            parts.append(MediaRef(kind, server.media_url(size, name), name, entry.get("size")))
+
+    sender_id = REPLAY_BOT_ID if record.get("bot") else "replay-user"
+    return ForwardJob(record.get("channel") or "replay", sender_id, REPLAY_BOT_ID, "replay", parts)
+
+
+def _percentile(values: list, ratio: float):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * ratio))]
+
+
+async def replay(path, speed: float = 1.0, limit: int = 0) -> dict:
+    """按录制节奏把消息送入插件的转发流程，Kook和CDN请求发往本地替身服务
+
+    Args:
+        path: 录制文件路径
+        speed: 回放倍速（1-100）
+        limit: 最多回放的消息数，0表示全部
+
+    Returns:
+        dict: 回放结果统计
+    """
+    from .main import DiscordToKookForwarder
+
+    speed = min(max(speed, MIN_SPEED), MAX_SPEED)
+    records = load_recording(path)
+    if limit:
+        records = records[:limit]
+
+    server = StandInServer()
+    await server.start()
+    plugin = DiscordToKookForwarder(SimpleNamespace(get_all_stars=lambda: []))
+    plugin.KOOK_API_BASE = f"{server.base_url}/api/v3"
+    plugin.kook_platform = SimpleNamespace(client=StandInKookClient(server))
+    plugin.config.update({
+        "enabled": True,
+        "forward_all_channels": True,
+        "default_discord_channel": "",
+        "default_kook_channel": "replay",
+        "include_bot_messages": True,
+    })
+    plugin.loop_monitor.update_config(plugin.config)
+
+    latencies = []
+
+    async def forward(index: int, record: dict):
+        started = time.perf_counter()
+        # 与插件相同，经转发通道排队执行；转发流程内部会捕获并记录异常
+        await plugin.lane_scheduler.submit(job_from_record(record, server, index))
+        latencies.append(time.perf_counter() - started)
+
+    logger.info(f"▶️ 开始回放 {len(records)} 条消息，倍速 {speed}x")
+    started = time.perf_counter()
+    tasks = []
+    try:
+        for index, record in enumerate(records):
+            delay = max(0.0, float(record.get("dt") or 0)) / speed
+            if delay:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(forward(index, record)))
+        await asyncio.gather(*tasks)
+    finally:
+        elapsed = time.perf_counter() - started
+        plugin.loop_monitor.stop()
+        await plugin.upload_pool.close()
+        await plugin.translator_manager.close()
+        await server.stop()
+
+    p50, p95 = _percentile(latencies, 0.5), _percentile(latencies, 0.95)
+    return {
+        "messages": len(records),
+        "speed": speed,
+        "elapsed_s": round(elapsed, 2),
+        "latency_p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+        "latency_p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+        "latency_max_ms": round(max(latencies) * 1000, 1) if latencies else None,
+        "stand_in": server.stats,
+        "upload_pool": plugin.upload_pool.get_stats(),
+        "media_admission": plugin.media_admission.get_stats(),
+        "lanes": plugin.lane_scheduler.get_stats(),
+        "loop_lag": {k: v for k, v in plugin.loop_monitor.get_stats().items() if k != "offenders"},
+    }
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="回放录制的Discord消息流量")
+    parser.add_argument("recording", help="录制文件（JSONL）")
+    parser.add_argument("--speed", type=float, default=1.0, help=f"回放倍速（{MIN_SPEED}-{MAX_SPEED}）")
+    parser.add_argument("--limit", type=int, default=0, help="最多回放的消息数，0表示全部")
+    parser.add_argument("--output", help="把结果写入JSON文件")
+    args = parser.parse_args()
+
+    result = asyncio.run(replay(args.recording, args.speed, args.limit))
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + os.linesep)
+
+
+if __name__ == "__main__":
+    main()
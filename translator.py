@@ -8,6 +8,9 @@ import hashlib
 import hmac
 import time
 import random
+import re
+from collections import deque
+from contextlib import asynccontextmanager
 from datetime import datetime
 from urllib.parse import quote
 from astrbot.api import logger
@@ -30,41 +33,87 @@ class TranslationError(Exception):
     pass
 
 
+class QueueTimeoutError(TranslationError):
+    """请求在限流队列中等待超过截止时间"""
+    pass
+
+
 class BaseTranslator:
     """翻译器基类"""
-    
+
+    # 服务商标识与日志中使用的名称
+    name = ""
+    display_name = ""
+    # 单次请求的正文长度上限（按 request_size 计量），超出时由管理器分段翻译
+    max_request_size = 5000
+
     def __init__(self, config: dict):
         self.config = config
-    
+        self._session = None
+
     async def translate(self, text: str, source_lang: str = "auto", target_lang: str = "zh") -> str:
-        """翻译文本"""
+        """翻译文本，失败时返回原文"""
+        if not self._should_translate(text):
+            return text
+
+        try:
+            return await self.request(text, source_lang, target_lang)
+        except Exception as e:
+            logger.error(f"❌ {self.display_name}翻译失败: {e}")
+            return text  # 翻译失败时返回原文
+
+    async def request(self, text: str, source_lang: str = "auto", target_lang: str = "zh") -> str:
+        """调用翻译API，失败时抛出异常"""
         raise NotImplementedError
-    
+
+    def request_size(self, text: str) -> int:
+        """按服务商的计量方式计算文本长度（默认按字符数）"""
+        return len(text)
+
     def _should_translate(self, text: str) -> bool:
         """判断是否需要翻译"""
         if not text or not text.strip():
             return False
-        
+
         # 检查长度阈值
         threshold = self.config.get("translate_threshold", 10)
         if len(text.strip()) < threshold:
             return False
-        
+
         return True
 
+    def _get_session(self) -> aiohttp.ClientSession:
+        """获取复用的HTTP会话，保持与服务商的连接常驻"""
+        if self._session is None or self._session.closed:
+            timeout = aiohttp.ClientTimeout(total=self.config.get("translation_timeout", 10))
+            self._session = aiohttp.ClientSession(timeout=timeout)
+        return self._session
+
+    async def close(self):
+        """关闭HTTP会话"""
+        if self._session and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
 
 class TencentTranslator(BaseTranslator):
     """腾讯云翻译"""
-    
+
+    name = "tencent"
+    display_name = "腾讯"
+    # 接口上限为6000字符，留出余量
+    max_request_size = 5500
+
     def __init__(self, config: dict):
         super().__init__(config)
         self.secret_id = config.get("tencent_secret_id", "")
         self.secret_key = config.get("tencent_secret_key", "")
         self.endpoint = "tmt.tencentcloudapi.com"
-        
+        self._sdk_client = None
+
         if not self.secret_id or not self.secret_key:
             raise TranslationError("腾讯翻译API配置不完整：缺少SecretId或SecretKey")
-    
+
     def _sign(self, secret_key: str, string_to_sign: str) -> str:
         """生成签名"""
         return hmac.new(
@@ -72,7 +121,7 @@ class TencentTranslator(BaseTranslator):
             string_to_sign.encode('utf-8'),
             hashlib.sha256
         ).hexdigest()
-    
+
     def _get_authorization(self, payload: str, timestamp: int) -> str:
         """生成授权头"""
         # 步骤1：拼接规范请求串
@@ -83,7 +132,7 @@ class TencentTranslator(BaseTranslator):
         signed_headers = "content-type;host;x-tc-action;x-tc-timestamp;x-tc-version"
         hashed_request_payload = hashlib.sha256(payload.encode('utf-8')).hexdigest()
         canonical_request = f"{http_request_method}\n{canonical_uri}\n{canonical_querystring}\n{canonical_headers}\n{signed_headers}\n{hashed_request_payload}"
-        
+
         # 步骤2：拼接待签名字符串
         algorithm = "TC3-HMAC-SHA256"
         date = datetime.utcfromtimestamp(timestamp).strftime("%Y-%m-%d")
@@ -91,362 +140,908 @@ class TencentTranslator(BaseTranslator):
         credential_scope = f"{date}/{service}/tc3_request"
         hashed_canonical_request = hashlib.sha256(canonical_request.encode('utf-8')).hexdigest()
         string_to_sign = f"{algorithm}\n{timestamp}\n{credential_scope}\n{hashed_canonical_request}"
-        
+
         # 步骤3：计算签名
         secret_date = hmac.new(f"TC3{self.secret_key}".encode('utf-8'), date.encode('utf-8'), hashlib.sha256).digest()
         secret_service = hmac.new(secret_date, service.encode('utf-8'), hashlib.sha256).digest()
         secret_signing = hmac.new(secret_service, "tc3_request".encode('utf-8'), hashlib.sha256).digest()
         signature = hmac.new(secret_signing, string_to_sign.encode('utf-8'), hashlib.sha256).hexdigest()
-        
+
         # 步骤4：拼接Authorization
         authorization = f"{algorithm} Credential={self.secret_id}/{credential_scope}, SignedHeaders={signed_headers}, Signature={signature}"
         return authorization
-    
-    async def translate(self, text: str, source_lang: str = "auto", target_lang: str = "zh") -> str:
+
+    async def request(self, text: str, source_lang: str = "auto", target_lang: str = "zh") -> str:
         """使用腾讯云翻译API翻译文本"""
-        if not self._should_translate(text):
-            return text
-        
         # 优先使用官方SDK
         if TENCENT_SDK_AVAILABLE:
             return await self._translate_with_sdk(text, source_lang, target_lang)
         else:
             return await self._translate_with_custom(text, source_lang, target_lang)
-    
-    async def _translate_with_sdk(self, text: str, source_lang: str = "auto", target_lang: str = "zh") -> str:
-        """使用腾讯云官方SDK翻译"""
-        try:
-            # 语言代码映射
-            lang_map = {
-                "auto": "auto",
-                "zh": "zh",
-                "en": "en",
-                "ja": "ja",
-                "ko": "ko",
-                "fr": "fr",
-                "de": "de",
-                "es": "es",
-                "ru": "ru"
-            }
-            
-            source = lang_map.get(source_lang, source_lang)
-            target = lang_map.get(target_lang, target_lang)
-            
+
+    def _get_sdk_client(self):
+        """创建并复用腾讯云SDK客户端"""
+        if self._sdk_client is None:
             # 创建认证对象
             cred = credential.Credential(self.secret_id, self.secret_key)
-            
+
             # 实例化一个http选项，可选的，没有特殊需求可以跳过
             httpProfile = HttpProfile()
             httpProfile.endpoint = self.endpoint
-            
+            httpProfile.reqTimeout = self.config.get("translation_timeout", 10)
+
             # 实例化一个client选项，可选的，没有特殊需求可以跳过
             clientProfile = ClientProfile()
             clientProfile.httpProfile = httpProfile
-            
+
             # 实例化要请求产品的client对象，clientProfile是可选的
-            client = tmt_client.TmtClient(cred, "ap-beijing", clientProfile)
-            
-            # 实例化一个请求对象，每个接口都会对应一个request对象
-            req = models.TextTranslateRequest()
-            req.SourceText = text
-            req.Source = source
-            req.Target = target
-            req.ProjectId = 0
-            
-            # 返回的resp是一个TextTranslateResponse的实例，与请求对象对应
-            resp = client.TextTranslate(req)
-            
-            translated_text = resp.TargetText
-            logger.info(f"🌐 腾讯翻译成功(SDK): '{text[:50]}...' -> '{translated_text[:50]}...'")
-            return translated_text
-            
+            self._sdk_client = tmt_client.TmtClient(cred, "ap-beijing", clientProfile)
+        return self._sdk_client
+
+    async def _translate_with_sdk(self, text: str, source_lang: str = "auto", target_lang: str = "zh") -> str:
+        """使用腾讯云官方SDK翻译"""
+        # 语言代码映射
+        lang_map = {
+            "auto": "auto",
+            "zh": "zh",
+            "en": "en",
+            "ja": "ja",
+            "ko": "ko",
+            "fr": "fr",
+            "de": "de",
+            "es": "es",
+            "ru": "ru"
+        }
+
+        source = lang_map.get(source_lang, source_lang)
+        target = lang_map.get(target_lang, target_lang)
+
+        client = self._get_sdk_client()
+
+        # 实例化一个请求对象，每个接口都会对应一个request对象
+        req = models.TextTranslateRequest()
+        req.SourceText = text
+        req.Source = source
+        req.Target = target
+        req.ProjectId = 0
+
+        try:
+            # SDK为同步调用，放到线程中执行，避免阻塞事件循环
+            resp = await asyncio.to_thread(client.TextTranslate, req)
         except TencentCloudSDKException as e:
-            logger.error(f"❌ 腾讯翻译SDK失败: {e}")
-            return text
-        except Exception as e:
-            logger.error(f"❌ 腾讯翻译SDK异常: {e}")
-            return text
-    
+            raise TranslationError(f"腾讯翻译SDK失败: {e}")
+
+        translated_text = resp.TargetText
+        logger.info(f"🌐 腾讯翻译成功(SDK): '{text[:50]}...' -> '{translated_text[:50]}...'")
+        return translated_text
+
     async def _translate_with_custom(self, text: str, source_lang: str = "auto", target_lang: str = "zh") -> str:
         """使用自定义实现翻译"""
-        if not self._should_translate(text):
-            return text
-        
-        try:
-            # 语言代码映射
-            lang_map = {
-                "auto": "auto",
-                "zh": "zh",
-                "en": "en",
-                "ja": "ja",
-                "ko": "ko",
-                "fr": "fr",
-                "de": "de",
-                "es": "es",
-                "ru": "ru"
-            }
-            
-            source = lang_map.get(source_lang, source_lang)
-            target = lang_map.get(target_lang, target_lang)
-            
-            # 构建请求参数
-            timestamp = int(time.time())
-            payload = json.dumps({
-                "Action": "TextTranslate",
-                "Version": "2018-03-21",
-                "SourceText": text,
-                "Source": source,
-                "Target": target,
-                "ProjectId": 0
-            })
-            
-            # 生成授权头
-            authorization = self._get_authorization(payload, timestamp)
-            
-            headers = {
-                "Authorization": authorization,
-                "Content-Type": "application/json; charset=utf-8",
-                "Host": self.endpoint,
-                "X-TC-Action": "TextTranslate",
-                "X-TC-Timestamp": str(timestamp),
-                "X-TC-Version": "2018-03-21"
-            }
-            
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"https://{self.endpoint}",
-                    headers=headers,
-                    data=payload,
-                    timeout=aiohttp.ClientTimeout(total=10)
-                ) as response:
-                    result = await response.json()
-                    logger.info(f"🔍 腾讯翻译API响应: {result}")
-                    
-                    if response.status != 200:
-                        raise TranslationError(f"腾讯翻译API请求失败: {response.status}")
-                    
-                    if "Error" in result:
-                        error_msg = result["Error"].get("Message", "未知错误")
-                        raise TranslationError(f"腾讯翻译API错误: {error_msg}")
-                    
-                    # 检查响应结构
-                    if "Response" not in result:
-                        raise TranslationError(f"腾讯翻译API响应格式错误: 缺少Response字段")
-                    
-                    if "TargetText" not in result["Response"]:
-                        raise TranslationError(f"腾讯翻译API响应格式错误: 缺少TargetText字段")
-                    
-                    translated_text = result["Response"]["TargetText"]
-                    logger.info(f"🌐 腾讯翻译成功: '{text[:50]}...' -> '{translated_text[:50]}...'")
-                    return translated_text
-                    
-        except Exception as e:
-            logger.error(f"❌ 腾讯翻译失败: {e}")
-            return text  # 翻译失败时返回原文
+        # 语言代码映射
+        lang_map = {
+            "auto": "auto",
+            "zh": "zh",
+            "en": "en",
+            "ja": "ja",
+            "ko": "ko",
+            "fr": "fr",
+            "de": "de",
+            "es": "es",
+            "ru": "ru"
+        }
+
+        source = lang_map.get(source_lang, source_lang)
+        target = lang_map.get(target_lang, target_lang)
+
+        # 构建请求参数
+        timestamp = int(time.time())
+        payload = json.dumps({
+            "Action": "TextTranslate",
+            "Version": "2018-03-21",
+            "SourceText": text,
+            "Source": source,
+            "Target": target,
+            "ProjectId": 0
+        })
+
+        # 生成授权头
+        authorization = self._get_authorization(payload, timestamp)
+
+        headers = {
+            "Authorization": authorization,
+            "Content-Type": "application/json; charset=utf-8",
+            "Host": self.endpoint,
+            "X-TC-Action": "TextTranslate",
+            "X-TC-Timestamp": str(timestamp),
+            "X-TC-Version": "2018-03-21"
+        }
+
+        session = self._get_session()
+        async with session.post(
+            f"https://{self.endpoint}",
+            headers=headers,
+            data=payload
+        ) as response:
+            result = await response.json()
+            logger.info(f"🔍 腾讯翻译API响应: {result}")
+
+            if response.status != 200:
+                raise TranslationError(f"腾讯翻译API请求失败: {response.status}")
+
+            if "Error" in result:
+                error_msg = result["Error"].get("Message", "未知错误")
+                raise TranslationError(f"腾讯翻译API错误: {error_msg}")
+
+            # 检查响应结构
+            if "Response" not in result:
+                raise TranslationError(f"腾讯翻译API响应格式错误: 缺少Response字段")
+
+            # 云API的业务错误放在Response.Error中
+            if "Error" in result["Response"]:
+                error_msg = result["Response"]["Error"].get("Message", "未知错误")
+                raise TranslationError(f"腾讯翻译API错误: {error_msg}")
+
+            if "TargetText" not in result["Response"]:
+                raise TranslationError(f"腾讯翻译API响应格式错误: 缺少TargetText字段")
+
+            translated_text = result["Response"]["TargetText"]
+            logger.info(f"🌐 腾讯翻译成功: '{text[:50]}...' -> '{translated_text[:50]}...'")
+            return translated_text
 
 
 class BaiduTranslator(BaseTranslator):
     """百度翻译"""
-    
+
+    name = "baidu"
+    display_name = "百度"
+    # 接口建议单次请求不超过6000字节（UTF-8），留出余量
+    max_request_size = 5500
+
     def __init__(self, config: dict):
         super().__init__(config)
         self.app_id = config.get("baidu_app_id", "")
         self.secret_key = config.get("baidu_secret_key", "")
         self.endpoint = "https://fanyi-api.baidu.com/api/trans/vip/translate"
-        
+
         if not self.app_id or not self.secret_key:
             raise TranslationError("百度翻译API配置不完整：缺少APP ID或密钥")
-    
+
+    def request_size(self, text: str) -> int:
+        return len(text.encode('utf-8'))
+
     def _generate_sign(self, query: str, salt: str) -> str:
         """生成签名"""
         sign_str = f"{self.app_id}{query}{salt}{self.secret_key}"
         return hashlib.md5(sign_str.encode('utf-8')).hexdigest()
-    
-    async def translate(self, text: str, source_lang: str = "auto", target_lang: str = "zh") -> str:
+
+    async def request(self, text: str, source_lang: str = "auto", target_lang: str = "zh") -> str:
         """使用百度翻译API翻译文本"""
-        if not self._should_translate(text):
-            return text
-        
-        try:
-            # 语言代码映射
-            lang_map = {
-                "auto": "auto",
-                "zh": "zh",
-                "en": "en",
-                "ja": "jp",
-                "ko": "kor",
-                "fr": "fra",
-                "de": "de",
-                "es": "spa",
-                "ru": "ru"
-            }
-            
-            source = lang_map.get(source_lang, source_lang)
-            target = lang_map.get(target_lang, target_lang)
-            
-            # 生成随机数
-            salt = str(random.randint(32768, 65536))
-            
-            # 生成签名
-            sign = self._generate_sign(text, salt)
-            
-            # 构建请求参数
-            params = {
-                "q": text,
-                "from": source,
-                "to": target,
-                "appid": self.app_id,
-                "salt": salt,
-                "sign": sign
-            }
-            
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    self.endpoint,
-                    data=params,
-                    timeout=aiohttp.ClientTimeout(total=10)
-                ) as response:
-                    result = await response.json()
-                    
-                    if response.status != 200:
-                        raise TranslationError(f"百度翻译API请求失败: {response.status}")
-                    
-                    if "error_code" in result:
-                        error_msg = result.get("error_msg", "未知错误")
-                        raise TranslationError(f"百度翻译API错误: {error_msg}")
-                    
-                    if "trans_result" not in result or not result["trans_result"]:
-                        raise TranslationError("百度翻译API返回结果为空")
-                    
-                    translated_text = result["trans_result"][0]["dst"]
-                    logger.info(f"🌐 百度翻译成功: '{text[:50]}...' -> '{translated_text[:50]}...'")
-                    return translated_text
-                    
-        except Exception as e:
-            logger.error(f"❌ 百度翻译失败: {e}")
-            return text  # 翻译失败时返回原文
+        # 语言代码映射
+        lang_map = {
+            "auto": "auto",
+            "zh": "zh",
+            "en": "en",
+            "ja": "jp",
+            "ko": "kor",
+            "fr": "fra",
+            "de": "de",
+            "es": "spa",
+            "ru": "ru"
+        }
+
+        source = lang_map.get(source_lang, source_lang)
+        target = lang_map.get(target_lang, target_lang)
+
+        # 生成随机数
+        salt = str(random.randint(32768, 65536))
+
+        # 生成签名
+        sign = self._generate_sign(text, salt)
+
+        # 构建请求参数
+        params = {
+            "q": text,
+            "from": source,
+            "to": target,
+            "appid": self.app_id,
+            "salt": salt,
+            "sign": sign
+        }
+
+        session = self._get_session()
+        async with session.post(self.endpoint, data=params) as response:
+            result = await response.json()
+
+            if response.status != 200:
+                raise TranslationError(f"百度翻译API请求失败: {response.status}")
+
+            if "error_code" in result:
+                error_msg = result.get("error_msg", "未知错误")
+                raise TranslationError(f"百度翻译API错误: {error_msg}")
+
+            if "trans_result" not in result or not result["trans_result"]:
+                raise TranslationError("百度翻译API返回结果为空")
+
+            # 多行文本会按行返回多个结果
+            translated_text = "\n".join(item["dst"] for item in result["trans_result"])
+            logger.info(f"🌐 百度翻译成功: '{text[:50]}...' -> '{translated_text[:50]}...'")
+            return translated_text
 
 
 class GoogleTranslator(BaseTranslator):
     """谷歌翻译"""
-    
+
+    name = "google"
+    display_name = "谷歌"
+    # 官方建议单次请求不超过5000字符
+    max_request_size = 5000
+
     def __init__(self, config: dict):
         super().__init__(config)
         self.api_key = config.get("google_api_key", "")
         self.endpoint = "https://translation.googleapis.com/language/translate/v2"
-        
+
         if not self.api_key:
             raise TranslationError("谷歌翻译API配置不完整：缺少API密钥")
-    
-    async def translate(self, text: str, source_lang: str = "auto", target_lang: str = "zh") -> str:
+
+    async def request(self, text: str, source_lang: str = "auto", target_lang: str = "zh") -> str:
         """使用谷歌翻译API翻译文本"""
-        if not self._should_translate(text):
-            return text
-        
+        # 语言代码映射
+        lang_map = {
+            "auto": "",  # 谷歌翻译自动检测不需要指定源语言
+            "zh": "zh-cn",
+            "en": "en",
+            "ja": "ja",
+            "ko": "ko",
+            "fr": "fr",
+            "de": "de",
+            "es": "es",
+            "ru": "ru"
+        }
+
+        target = lang_map.get(target_lang, target_lang)
+
+        # 构建请求参数
+        params = {
+            "key": self.api_key,
+            "q": text,
+            "target": target,
+            "format": "text"
+        }
+
+        # 如果不是自动检测，添加源语言
+        if source_lang != "auto":
+            source = lang_map.get(source_lang, source_lang)
+            if source:
+                params["source"] = source
+
+        session = self._get_session()
+        async with session.post(self.endpoint, data=params) as response:
+            result = await response.json()
+
+            if response.status != 200:
+                raise TranslationError(f"谷歌翻译API请求失败: {response.status}")
+
+            if "error" in result:
+                error_msg = result["error"].get("message", "未知错误")
+                raise TranslationError(f"谷歌翻译API错误: {error_msg}")
+
+            if "data" not in result or "translations" not in result["data"]:
+                raise TranslationError("谷歌翻译API返回结果格式错误")
+
+            translations = result["data"]["translations"]
+            if not translations:
+                raise TranslationError("谷歌翻译API返回结果为空")
+
+            translated_text = translations[0]["translatedText"]
+            logger.info(f"🌐 谷歌翻译成功: '{text[:50]}...' -> '{translated_text[:50]}...'")
+            return translated_text
+
+
+TRANSLATOR_CLASSES = {
+    "tencent": TencentTranslator,
+    "baidu": BaiduTranslator,
+    "google": GoogleTranslator,
+}
+
+
+class RateShaper:
+    """单个翻译服务商的请求整形器
+
+    令牌桶限制每秒请求数，信号量限制并发数；请求在队列中等待超过截止时间时放弃，
+    由调用方降级为原文，而不是直接把请求打到服务商再被拒绝。
+    """
+
+    def __init__(self, qps: float, concurrency: int, max_wait: float):
+        self.qps = qps
+        self.capacity = max(1.0, qps)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.max_wait = max_wait
+        self._semaphore = asyncio.Semaphore(concurrency) if concurrency > 0 else None
+        self._lock = asyncio.Lock()
+        self.waiting = 0
+        self.rejected = 0
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.qps)
+        self.updated = now
+
+    async def _take_token(self, deadline: float):
+        """按到达顺序取令牌，不足时等待补充"""
+        async with self._lock:
+            self._refill()
+            if self.tokens < 1:
+                wait = (1 - self.tokens) / self.qps
+                if time.monotonic() + wait > deadline:
+                    raise QueueTimeoutError(f"限流队列等待超过 {self.max_wait:.1f} 秒")
+                await asyncio.sleep(wait)
+                self._refill()
+            self.tokens -= 1
+
+    @asynccontextmanager
+    async def slot(self):
+        """获取一次请求的发送许可"""
+        deadline = time.monotonic() + self.max_wait
+        self.waiting += 1
+        acquired = False
         try:
-            # 语言代码映射
-            lang_map = {
-                "auto": "",  # 谷歌翻译自动检测不需要指定源语言
-                "zh": "zh-cn",
-                "en": "en",
-                "ja": "ja",
-                "ko": "ko",
-                "fr": "fr",
-                "de": "de",
-                "es": "es",
-                "ru": "ru"
-            }
-            
-            target = lang_map.get(target_lang, target_lang)
-            
-            # 构建请求参数
-            params = {
-                "key": self.api_key,
-                "q": text,
-                "target": target,
-                "format": "text"
-            }
-            
-            # 如果不是自动检测，添加源语言
-            if source_lang != "auto":
-                source = lang_map.get(source_lang, source_lang)
-                if source:
-                    params["source"] = source
-            
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    self.endpoint,
-                    data=params,
-                    timeout=aiohttp.ClientTimeout(total=10)
-                ) as response:
-                    result = await response.json()
-                    
-                    if response.status != 200:
-                        raise TranslationError(f"谷歌翻译API请求失败: {response.status}")
-                    
-                    if "error" in result:
-                        error_msg = result["error"].get("message", "未知错误")
-                        raise TranslationError(f"谷歌翻译API错误: {error_msg}")
-                    
-                    if "data" not in result or "translations" not in result["data"]:
-                        raise TranslationError("谷歌翻译API返回结果格式错误")
-                    
-                    translations = result["data"]["translations"]
-                    if not translations:
-                        raise TranslationError("谷歌翻译API返回结果为空")
-                    
-                    translated_text = translations[0]["translatedText"]
-                    logger.info(f"🌐 谷歌翻译成功: '{text[:50]}...' -> '{translated_text[:50]}...'")
-                    return translated_text
-                    
-        except Exception as e:
-            logger.error(f"❌ 谷歌翻译失败: {e}")
-            return text  # 翻译失败时返回原文
+            if self._semaphore is not None:
+                try:
+                    await asyncio.wait_for(self._semaphore.acquire(), timeout=self.max_wait)
+                except asyncio.TimeoutError:
+                    raise QueueTimeoutError(f"并发队列等待超过 {self.max_wait:.1f} 秒")
+                acquired = True
+            if self.qps > 0:
+                await self._take_token(deadline)
+        except QueueTimeoutError:
+            self.rejected += 1
+            if acquired:
+                self._semaphore.release()
+            raise
+        except BaseException:
+            if acquired:
+                self._semaphore.release()
+            raise
+        finally:
+            self.waiting -= 1
+
+        try:
+            yield
+        finally:
+            if acquired:
+                self._semaphore.release()
+
+
+class CircuitBreaker:
+    """单个翻译服务商的熔断器
+
+    连续失败达到阈值后熔断，冷却期内直接跳过该服务商；冷却结束后放行一个试探请求，
+    成功则恢复，失败则重新熔断。
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+
+    def allow(self) -> bool:
+        """判断当前是否允许向该服务商发送请求"""
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = self.HALF_OPEN
+            self._probing = False
+        if self.state == self.HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def release(self):
+        """试探请求被取消时归还试探名额"""
+        self._probing = False
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+        self._probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._probing = False
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                logger.warning(f"⚠️ 翻译服务商连续失败 {self.failures} 次，熔断 {self.reset_timeout:.0f} 秒")
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+
+class ProviderSlot:
+    """翻译服务商池中的一个成员：翻译器、熔断器与延迟统计"""
+
+    # 计算p95所需的最少样本数，不足时使用默认对冲延迟
+    MIN_SAMPLES = 20
+
+    def __init__(self, translator: BaseTranslator, breaker: CircuitBreaker, shaper: RateShaper):
+        self.translator = translator
+        self.breaker = breaker
+        self.shaper = shaper
+        self.latencies = deque(maxlen=200)
+        self.calls = 0
+        self.failures = 0
+        self.hedged_wins = 0
+
+    @property
+    def name(self) -> str:
+        return self.translator.name
+
+    def p95(self):
+        """最近请求延迟的p95（秒），样本不足时返回None"""
+        if len(self.latencies) < self.MIN_SAMPLES:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+
+# 不需要翻译的片段：代码块、行内代码、链接、Discord提及/频道/自定义表情/时间戳/斜杠命令、@everyone
+PROTECTED_SPAN_PATTERN = re.compile(
+    r"""
+      ```.*?```                                 # 代码块
+    | `[^`\n]+`                                 # 行内代码
+    | <?https?://[^\s<>]+>?                      # 链接
+    | <a?:\w{2,32}:\d{15,25}>                    # 自定义表情 <:name:id> / <a:name:id>
+    | <(?:@[!&]?|\#)\d{15,25}>                   # 用户/角色/频道提及
+    | <t:-?\d+(?::[tTdDfFR])?>                   # 时间戳
+    | </[\w\- ]+:\d{15,25}>                      # 斜杠命令提及
+    | @(?:everyone|here)\b
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+
+
+# 正文中代替受保护片段的编号占位符 {{0}}；服务商可能在编号两侧加空格或改为全角括号
+PLACEHOLDER_PATTERN = re.compile(r"[{｛]{2}\s*(\d+)\s*[}｝]{2}")
+# 原文中本身形如占位符的文本也作为受保护片段，避免还原时混淆
+MASK_PATTERN = re.compile(
+    PROTECTED_SPAN_PATTERN.pattern + r"| [{｛]{2}\s*\d+\s*[}｝]{2}",
+    re.VERBOSE | re.DOTALL,
+)
+
+
+def mask_protected_spans(text: str) -> tuple:
+    """单次扫描将受保护片段替换为编号占位符，正文句子保持完整
+
+    Returns:
+        tuple: (替换后的文本, 按编号排列的受保护片段列表)
+    """
+    spans = []
+
+    def replace(match):
+        spans.append(match.group())
+        return f"{{{{{len(spans) - 1}}}}}"
+
+    return MASK_PATTERN.sub(replace, text), spans
+
+
+def restore_protected_spans(text: str, spans: list, expected: set) -> tuple:
+    """把译文中的占位符还原为受保护片段
+
+    Args:
+        expected: 原文这一行中应有的占位符编号
+
+    Returns:
+        tuple: (还原后的文本, 译文中丢失的占位符编号列表)，丢失的片段已按原顺序追加在末尾
+    """
+    found = set()
+
+    def replace(match):
+        index = int(match.group(1))
+        if index not in expected:
+            return match.group()
+        found.add(index)
+        return spans[index]
+
+    restored = PLACEHOLDER_PATTERN.sub(replace, text)
+    missing = sorted(expected - found)
+    if missing:
+        restored = " ".join([restored] + [spans[index] for index in missing])
+    return restored, missing
+
+
+def placeholder_indexes(text: str) -> set:
+    """文本中占位符的编号"""
+    return {int(index) for index in PLACEHOLDER_PATTERN.findall(text)}
+
+
+# 句末位置：中文句末标点后直接断开，英文句末标点后需有空白（避免拆开小数和缩写）
+SENTENCE_END_PATTERN = re.compile(r"[。！？…]+[\"'”’)）]*\s*|[.!?;]+[\"'”’)]*(?:\s+|$)|；\s*")
+# 单句超长时优先在这些字符之后断开
+SOFT_BREAK_CHARS = " ，,、：:"
+
+
+def split_long_line(line: str, measure, limit: float) -> list:
+    """把超过长度上限的一行按句子切分，句子仍超长时在空白或逗号处断开，最后才硬切
+
+    Args:
+        measure: 计算文本长度的函数
+        limit: 每段的长度上限
+
+    Returns:
+        list: [(片段, 片段之后的原有空白), ...]，按顺序拼接即为原行
+    """
+    sentences = []
+    position = 0
+    for match in SENTENCE_END_PATTERN.finditer(line):
+        if match.end() > position:
+            sentences.append(line[position:match.end()])
+            position = match.end()
+    if position < len(line):
+        sentences.append(line[position:])
+
+    pieces = []
+    current = ""
+    for sentence in sentences:
+        if measure(current + sentence) <= limit:
+            current += sentence
+            continue
+        if current:
+            pieces.append(current)
+            current = ""
+        while measure(sentence) > limit:
+            cut = _find_cut(sentence, measure, limit)
+            pieces.append(sentence[:cut])
+            sentence = sentence[cut:]
+        current = sentence
+    if current:
+        pieces.append(current)
+
+    result = []
+    for piece in pieces:
+        text = piece.rstrip()
+        if text:
+            result.append((text, piece[len(text):]))
+        elif result:
+            result[-1] = (result[-1][0], result[-1][1] + piece)
+    return result
+
+
+def _find_cut(text: str, measure, limit: float) -> int:
+    """不超过上限的最长前缀位置，尽量落在空白或逗号之后"""
+    low, high = 1, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if measure(text[:middle]) <= limit:
+            low = middle
+        else:
+            high = middle - 1
+    soft = max(text.rfind(ch, 0, low) for ch in SOFT_BREAK_CHARS)
+    return soft + 1 if soft + 1 > low // 2 else low
+
+
+def normalize_lang(lang: str) -> str:
+    """将各服务商的语言代码统一为两位小写代码（如 zh-CN -> zh，jp -> ja）"""
+    if not lang:
+        return ""
+    lang = lang.lower().replace("_", "-").split("-", 1)[0]
+    aliases = {"jp": "ja", "kor": "ko", "fra": "fr", "spa": "es"}
+    return aliases.get(lang, lang)
+
+
+class LanguageDetector:
+    """本地语言识别：先按字符脚本比例判断，拉丁字母文本再用紧凑的三元组模型区分语种"""
+
+    # 各拉丁语种最常见的字符三元组（空格表示词边界）
+    NGRAM_PROFILES = {
+        "en": frozenset([" th", "the", "he ", " an", "and", "nd ", "ing", "ng ", " to", "to ", " of", "of ",
+                         " is", "is ", " it", "it ", "you", " yo", "ou ", "hat", "tha", " wh", "ed ", " be",
+                         "er ", "re ", "thi", "his", " wa", "was", "ll ", " i ", "for", " fo", "are", " ar"]),
+        "fr": frozenset([" de", "de ", "es ", "les", " le", "le ", " la", "la ", " et", "et ", "ent", "nt ",
+                         " qu", "que", "ue ", " pa", "pas", "est", " es", "ous", "vou", " vo", " je", "je ",
+                         " un", "une", "ne ", "ait", "our", " po", "pou", " ce", " c ", "eux", " ne", "oi "]),
+        "de": frozenset(["en ", "er ", "der", " de", "ich", " ic", "ch ", "ie ", "die", " di", "ein", " ei",
+                         "sch", "und", " un", "nd ", "che", "cht", "ine", " ni", "nic", "ist", " is", " ge",
+                         "den", "das", " da", "st ", "ht ", "ber", " zu", "zu ", "auf", " au", "mit", " mi"]),
+        "es": frozenset([" de", "de ", "os ", "la ", " la", "que", " qu", "ue ", "el ", " el", " y ", "los",
+                         " lo", "as ", " co", "con", " en", "ado", "ar ", " es", "est", "por", " po", "una",
+                         " un", "ión", "ien", "par", " pa", "ara", "mos", " me", "no ", " no", "ero", "sta"]),
+    }
+    # 低于此置信度时不认为识别结果可靠
+    MIN_CONFIDENCE = 0.6
+
+    @staticmethod
+    def _char_script(ch: str):
+        """返回字符所属的脚本类别，非字母字符返回None"""
+        cp = ord(ch)
+        if 0x3040 <= cp <= 0x30FF or 0x31F0 <= cp <= 0x31FF:
+            return "kana"
+        if 0xAC00 <= cp <= 0xD7AF or 0x1100 <= cp <= 0x11FF or 0x3130 <= cp <= 0x318F:
+            return "hangul"
+        if 0x4E00 <= cp <= 0x9FFF or 0x3400 <= cp <= 0x4DBF or 0xF900 <= cp <= 0xFAFF:
+            return "han"
+        if 0x0400 <= cp <= 0x04FF:
+            return "cyrillic"
+        if ch.isalpha():
+            return "latin" if cp < 0x0250 else "other"
+        return None
+
+    def detect(self, text: str) -> tuple:
+        """识别文本语言
+
+        Returns:
+            tuple: (语言代码, 置信度)，无法识别时语言代码为None
+        """
+        counts = {}
+        for ch in text:
+            script = self._char_script(ch)
+            if script:
+                # 表意/音节文字一个字符的信息量约等于一个拉丁单词的若干字母
+                counts[script] = counts.get(script, 0) + (2 if script in ("han", "kana", "hangul") else 1)
+
+        total = sum(counts.values())
+        if not total:
+            return None, 0.0
+
+        han = counts.get("han", 0)
+        kana = counts.get("kana", 0)
+        if kana and kana / total >= 0.1:
+            return "ja", (han + kana) / total
+        if counts.get("hangul", 0) / total >= 0.3:
+            return "ko", counts["hangul"] / total
+        if han / total >= 0.3:
+            return "zh", han / total
+        if counts.get("cyrillic", 0) / total >= 0.5:
+            return "ru", counts["cyrillic"] / total
+
+        latin_ratio = counts.get("latin", 0) / total
+        if latin_ratio < 0.5:
+            return None, 0.0
+        return self._detect_latin(text, latin_ratio)
+
+    def _detect_latin(self, text: str, latin_ratio: float) -> tuple:
+        """用三元组模型区分拉丁字母语种"""
+        normalized = " " + " ".join("".join(ch if ch.isalpha() else " " for ch in text.lower()).split()) + " "
+        trigrams = [normalized[i:i + 3] for i in range(len(normalized) - 2)]
+        if not trigrams:
+            return None, 0.0
+
+        scores = sorted(
+            ((sum(1 for gram in trigrams if gram in profile), lang) for lang, profile in self.NGRAM_PROFILES.items()),
+            reverse=True,
+        )
+        best_score, best_lang = scores[0]
+        second_score = scores[1][0]
+        if best_score < 3:
+            # 命中过少时（短消息、缩写）结果不可靠
+            return None, 0.0
+        return best_lang, latin_ratio * best_score / (best_score + second_score)
+
+    def is_language(self, text: str, lang: str) -> bool:
+        """判断文本是否可以确定为指定语言"""
+        detected, confidence = self.detect(text)
+        return detected is not None and detected == normalize_lang(lang) and confidence >= self.MIN_CONFIDENCE
 
 
 class TranslatorManager:
-    """翻译管理器"""
-    
+    """翻译管理器
+
+    维护一个翻译服务商池：配置的服务商为主，其余已配置密钥的服务商作为备用。
+    每个服务商有独立的熔断器和延迟统计，主服务商超过其p95延迟仍未返回时，
+    会向备用服务商发出对冲请求，先成功的结果生效。
+    """
+
+    # 影响服务商实例的配置项，只有这些配置变化时才重建服务商池
+    PROVIDER_CONFIG_KEYS = (
+        "enable_translation", "translation_provider", "translation_failover", "translation_timeout",
+        "tencent_secret_id", "tencent_secret_key", "baidu_app_id", "baidu_secret_key", "google_api_key",
+        "tencent_qps", "baidu_qps", "google_qps", "translation_max_concurrency", "translation_queue_timeout",
+    )
+    # 各服务商默认QPS（百度免费版为1 QPS，腾讯默认5 QPS）
+    DEFAULT_QPS = {"tencent": 5, "baidu": 1, "google": 10}
+    # 延迟样本不足时使用的对冲等待时间（秒）
+    DEFAULT_HEDGE_DELAY = 1.5
+    MIN_HEDGE_DELAY = 0.2
+
     def __init__(self, config: dict):
         self.config = config
         self.translator = None
+        self.slots = []
+        self._provider_signature = None
+        self.language_detector = LanguageDetector()
+        self.stats = {"requested": 0, "skipped_same_language": 0, "skipped_protected": 0, "hedged": 0, "failed_over": 0,
+                      "chunked": 0, "chunks": 0}
         self._init_translator()
-    
+
     def _init_translator(self):
-        """初始化翻译器"""
+        """初始化翻译服务商池"""
+        signature = tuple(self.config.get(key) for key in self.PROVIDER_CONFIG_KEYS)
+        if signature == self._provider_signature:
+            return
+        self._provider_signature = signature
+
+        old_translators = [slot.translator for slot in self.slots]
+        self.translator = None
+        self.slots = []
+        self._close_translators(old_translators)
+
         if not self.config.get("enable_translation", False):
             logger.info("🌐 翻译功能已禁用")
             return
-        
+
         provider = self.config.get("translation_provider", "tencent")
-        
+        names = [provider]
+        if self.config.get("translation_failover", True):
+            names += [name for name in TRANSLATOR_CLASSES if name != provider]
+
+        for name in names:
+            translator_class = TRANSLATOR_CLASSES.get(name)
+            if translator_class is None:
+                logger.warning(f"⚠️ 不支持的翻译提供商: {name}")
+                continue
+            try:
+                translator = translator_class(self.config)
+            except TranslationError as e:
+                if name == provider:
+                    logger.error(f"❌ 翻译器初始化失败: {e}")
+                else:
+                    logger.debug(f"📋 备用翻译服务商未配置: {e}")
+                continue
+            except Exception as e:
+                logger.error(f"❌ 翻译器初始化异常: {e}")
+                continue
+
+            shaper = RateShaper(
+                qps=float(self.config.get(f"{name}_qps", self.DEFAULT_QPS.get(name, 0)) or 0),
+                concurrency=int(self.config.get("translation_max_concurrency", 4) or 0),
+                max_wait=float(self.config.get("translation_queue_timeout", 5)),
+            )
+            self.slots.append(ProviderSlot(translator, CircuitBreaker(), shaper))
+            role = "主" if name == provider else "备用"
+            logger.info(f"🌐 {translator.display_name}翻译器初始化成功（{role}）")
+
+        if self.slots:
+            self.translator = self.slots[0].translator
+
+    @staticmethod
+    def _close_translators(translators: list):
+        """在事件循环中异步关闭旧翻译器的HTTP会话"""
+        if not translators:
+            return
         try:
-            if provider == "tencent":
-                self.translator = TencentTranslator(self.config)
-                logger.info("🌐 腾讯翻译器初始化成功")
-            elif provider == "baidu":
-                self.translator = BaiduTranslator(self.config)
-                logger.info("🌐 百度翻译器初始化成功")
-            elif provider == "google":
-                self.translator = GoogleTranslator(self.config)
-                logger.info("🌐 谷歌翻译器初始化成功")
-            else:
-                logger.warning(f"⚠️ 不支持的翻译提供商: {provider}")
-                
-        except TranslationError as e:
-            logger.error(f"❌ 翻译器初始化失败: {e}")
-            self.translator = None
-        except Exception as e:
-            logger.error(f"❌ 翻译器初始化异常: {e}")
-            self.translator = None
-    
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        for translator in translators:
+            loop.create_task(translator.close())
+
     def update_config(self, config: dict):
-        """更新配置并重新初始化翻译器"""
+        """更新配置，相关配置变化时重新初始化翻译器"""
         self.config = config
         self._init_translator()
-    
-    async def translate(self, text: str) -> str:
-        """翻译文本"""
+
+    async def close(self):
+        """关闭所有服务商的HTTP会话"""
+        for slot in self.slots:
+            await slot.translator.close()
+
+    def _hedge_delay(self, slot: ProviderSlot) -> float:
+        """对冲等待时间：该服务商最近请求延迟的p95"""
+        p95 = slot.p95()
+        if p95 is None:
+            return self.DEFAULT_HEDGE_DELAY
+        return max(self.MIN_HEDGE_DELAY, p95)
+
+    async def _call_slot(self, slot: ProviderSlot, text: str, source_lang: str, target_lang: str) -> str:
+        """调用单个服务商，并记录延迟和熔断状态"""
+        try:
+            async with slot.shaper.slot():
+                slot.calls += 1
+                started = time.monotonic()
+                try:
+                    result = await slot.translator.request(text, source_lang, target_lang)
+                except Exception:
+                    slot.failures += 1
+                    slot.breaker.record_failure()
+                    raise
+        except asyncio.CancelledError:
+            # 对冲落败被取消，不计为失败
+            slot.breaker.release()
+            raise
+        except QueueTimeoutError:
+            # 本地排队超时不代表服务商故障，不影响熔断状态
+            slot.breaker.release()
+            raise
+        slot.latencies.append(time.monotonic() - started)
+        slot.breaker.record_success()
+        return result
+
+    async def _request(self, text: str, source_lang: str, target_lang: str) -> str:
+        """在服务商池中执行一次翻译，失败时抛出TranslationError"""
+        slot_iter = iter(self.slots)
+
+        def next_slot():
+            for candidate in slot_iter:
+                if candidate.breaker.allow():
+                    return candidate
+            return None
+
+        slot = next_slot()
+        if slot is None:
+            raise TranslationError("所有翻译服务商均处于熔断状态")
+
+        hedge = self.config.get("translation_hedge", True)
+        pending = {asyncio.ensure_future(self._call_slot(slot, text, source_lang, target_lang)): slot}
+        exhausted = False
+        errors = []
+        try:
+            while pending:
+                timeout = self._hedge_delay(slot) if hedge and not exhausted else None
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    # 当前服务商超过其p95仍未返回，向下一个服务商发出对冲请求
+                    backup = next_slot()
+                    if backup is None:
+                        exhausted = True
+                        continue
+                    logger.info(f"🌐 {slot.translator.display_name}翻译响应较慢，对冲请求{backup.translator.display_name}翻译")
+                    self.stats["hedged"] += 1
+                    slot = backup
+                    pending[asyncio.ensure_future(self._call_slot(slot, text, source_lang, target_lang))] = slot
+                    continue
+
+                for task in done:
+                    finished = pending.pop(task)
+                    if task.exception() is None:
+                        if finished is not self.slots[0]:
+                            finished.hedged_wins += 1
+                        return task.result()
+                    errors.append(f"{finished.translator.display_name}: {task.exception()}")
+
+                if not pending:
+                    # 全部失败，立即切换到下一个服务商
+                    backup = next_slot()
+                    if backup is not None:
+                        logger.warning(f"⚠️ {slot.translator.display_name}翻译失败，切换到{backup.translator.display_name}翻译")
+                        self.stats["failed_over"] += 1
+                        slot = backup
+                        pending[asyncio.ensure_future(self._call_slot(slot, text, source_lang, target_lang))] = slot
+        finally:
+            for task in pending:
+                task.cancel()
+
+        raise TranslationError("; ".join(errors) or "没有可用的翻译服务商")
+
+    def get_stats(self) -> dict:
+        """翻译统计信息及各服务商状态"""
+        providers = []
+        for slot in self.slots:
+            p95 = slot.p95()
+            providers.append({
+                "name": slot.name,
+                "state": slot.breaker.state,
+                "calls": slot.calls,
+                "failures": slot.failures,
+                "hedged_wins": slot.hedged_wins,
+                "p95_ms": round(p95 * 1000) if p95 is not None else None,
+                "queued": slot.shaper.waiting,
+                "queue_rejected": slot.shaper.rejected,
+            })
+        return {**self.stats, "providers": providers}
+
+    async def translate(self, text: str, target_lang: str = None) -> str:
+        """翻译文本
+
+        Args:
+            target_lang: 目标语言，为None时使用配置的目标语言（按路由指定语言时传入）
+        """
         if not self.translator:
             return text
         
@@ -454,13 +1049,168 @@ class TranslatorManager:
             return text
         
         source_lang = self.config.get("source_language", "auto")
-        target_lang = self.config.get("target_language", "zh")
-        
+        target_lang = target_lang or self.config.get("target_language", "zh")
+        self.stats["requested"] += 1
+
+        # 链接、代码、提及等受保护片段替换为占位符，正文行连同占位符整句发送给翻译服务
+        masked, spans = mask_protected_spans(text)
+        lines = masked.split("\n")
+        units = self._collect_prose_units(lines)
+        if not units:
+            self.stats["skipped_protected"] += 1
+            logger.info("🌐 消息只包含链接、代码或提及等内容，跳过翻译")
+            return text
+        # 语言识别和长度判断只看正文
+        prose = "\n".join(PLACEHOLDER_PATTERN.sub(" ", line) for _, line in units)
+
+        # 本地识别语言，已经是目标语言时不调用翻译API
+        if self.config.get("skip_same_language", True):
+            same_language = (
+                normalize_lang(source_lang) == normalize_lang(target_lang)
+                if source_lang != "auto"
+                else self.language_detector.is_language(prose, target_lang)
+            )
+            if same_language:
+                self.stats["skipped_same_language"] += 1
+                logger.info(f"🌐 文本已是目标语言({target_lang})，跳过翻译")
+                return text
+
+        if not self.translator._should_translate(prose):
+            return text
+
         try:
-            return await self.translator.translate(text, source_lang, target_lang)
+            # 超过服务商请求长度上限的文本分段，各段同时提交，由各服务商的限流器控制实际并发
+            pieces = self._split_prose_units(units)
+            chunks = self._group_chunks([piece for _, piece, _ in pieces])
+            if len(chunks) > 1:
+                self.stats["chunked"] += 1
+                self.stats["chunks"] += len(chunks)
+                logger.info(f"🌐 长文本（{len(prose)}字符）分为 {len(chunks)} 段并发翻译")
+            results = await asyncio.gather(
+                *(self._translate_chunk([pieces[i][1] for i in chunk], source_lang, target_lang) for chunk in chunks),
+                return_exceptions=True,
+            )
+
+            translated_pieces = []
+            failed = []
+            for chunk, result in zip(chunks, results):
+                if isinstance(result, BaseException):
+                    # 失败的分段保留原文，其余分段的译文照常使用
+                    failed.append(result)
+                    translated_pieces.extend(pieces[i][1] for i in chunk)
+                else:
+                    translated_pieces.extend(result)
+            if len(failed) == len(chunks):
+                raise failed[0]
+            if failed:
+                logger.warning(f"⚠️ {len(failed)}/{len(chunks)} 段翻译失败，保留原文: {failed[0]}")
+
+            translated_lines = [""] * len(units)
+            for (unit_index, _, separator), translated in zip(pieces, translated_pieces):
+                translated_lines[unit_index] += translated.strip() + separator
+            if translated_lines == [line for _, line in units]:
+                return text
+            return self._splice_prose_units(lines, units, translated_lines, spans)
         except Exception as e:
             logger.error(f"❌ 翻译过程中发生异常: {e}")
             return text
+
+    def _request_load(self, text: str) -> float:
+        """文本长度占请求上限的比例，取所有可用服务商中最大的，保证每段可以发给任一服务商"""
+        return max(slot.translator.request_size(text) / slot.translator.max_request_size for slot in self.slots)
+
+    def _split_prose_units(self, units: list) -> list:
+        """把正文行转换为翻译片段，超长的行按句子切分
+
+        Returns:
+            list: [(所属正文行下标, 片段文本, 片段之后的原有空白), ...]
+        """
+        pieces = []
+        for unit_index, (_, line) in enumerate(units):
+            if self._request_load(line) <= 1:
+                pieces.append((unit_index, line, ""))
+                continue
+            for piece, separator in split_long_line(line, self._request_load, 1):
+                pieces.append((unit_index, piece, separator))
+        return pieces
+
+    def _group_chunks(self, pieces: list) -> list:
+        """按顺序把片段装入请求，每个请求以换行连接且不超过长度上限
+
+        Returns:
+            list: 每个请求包含的片段下标列表
+        """
+        chunks = []
+        current = []
+        load = 0.0
+        for index, piece in enumerate(pieces):
+            piece_load = self._request_load(piece + "\n")
+            if current and load + piece_load > 1:
+                chunks.append(current)
+                current = []
+                load = 0.0
+            current.append(index)
+            load += piece_load
+        if current:
+            chunks.append(current)
+        return chunks
+
+    async def _translate_chunk(self, lines: list, source_lang: str, target_lang: str) -> list:
+        """翻译一个请求中的若干行，返回与原文行一一对应的译文"""
+        translated = await self._request("\n".join(lines), source_lang, target_lang)
+        if len(lines) == 1:
+            return [translated]
+        translated_lines = translated.split("\n")
+        if len(translated_lines) == len(lines):
+            return translated_lines
+
+        # 服务商合并或拆分了行，逐行翻译以保证能够按位置拼回
+        logger.debug(f"⚠️ 译文行数({len(translated_lines)})与原文({len(lines)})不一致，改为逐行翻译")
+        results = await asyncio.gather(
+            *(self._request(line, source_lang, target_lang) for line in lines),
+            return_exceptions=True,
+        )
+        return [
+            line if isinstance(result, BaseException) else result
+            for line, result in zip(lines, results)
+        ]
+
+    @staticmethod
+    def _collect_prose_units(lines: list) -> list:
+        """收集需要翻译的行（占位符之外含有文字的行）
+
+        Returns:
+            list: [(行下标, 去除首尾空白的行文本), ...]
+        """
+        units = []
+        for line_index, line in enumerate(lines):
+            stripped = line.strip()
+            if any(ch.isalpha() for ch in PLACEHOLDER_PATTERN.sub("", stripped)):
+                units.append((line_index, stripped))
+        return units
+
+    @staticmethod
+    def _splice_prose_units(lines: list, units: list, translated_lines: list, spans: list) -> str:
+        """将译文行按位置替换回原文行并还原占位符，保留原有空白
+
+        译文丢失了某个占位符时，把对应的受保护片段追加在该行末尾。
+        """
+        translated_by_line = {
+            line_index: (original, translated)
+            for (line_index, original), translated in zip(units, translated_lines)
+        }
+        result = []
+        for line_index, line in enumerate(lines):
+            if line_index not in translated_by_line:
+                result.append(restore_protected_spans(line, spans, placeholder_indexes(line))[0])
+                continue
+            original, translated = translated_by_line[line_index]
+            restored, missing = restore_protected_spans(translated.strip(), spans, placeholder_indexes(original))
+            if missing:
+                logger.debug(f"⚠️ 译文中丢失了 {len(missing)} 个占位符，对应内容已追加到行末: {translated.strip()}")
+            start = line.find(original)
+            result.append(line[:start] + restored + line[start + len(original):])
+        return "\n".join(result)
     
     def is_enabled(self) -> bool:
         """检查翻译功能是否启用"""
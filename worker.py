@@ -0,0 +1,619 @@
+"""
+转发工作进程模块 - 翻译、媒体传输和发送到Kook在独立的工作进程中执行，主进程只把转发任务发给工作进程
+
+主进程监听一个本地Unix套接字并启动 worker_processes 个工作进程，工作进程连接后按行交换JSON消息：
+    主进程 -> 工作进程: {"type": "state", ...}              运行配置、频道映射、Kook token
+                        {"type": "job", "id": 1, "job": {...}}  转发任务（ForwardJob.to_dict）
+                        {"type": "ping"}                        健康检查
+    工作进程 -> 主进程: {"type": "hello", "index": 0, "pid": 123}
+                        {"type": "done", "id": 1}
+                        {"type": "pong", "queued": 3, "stats": {...}}  排队数和各组件的统计
+
+同一Discord频道的任务总是发给同一个工作进程，频道内的顺序由工作进程中的转发通道保证。
+工作进程在主进程中运行的插件之外单独运行（在AstrBot根目录下，通常由插件自动启动）：
+    python -m data.plugins.<插件目录>.worker --socket <套接字路径> --index 0
+"""
+import asyncio
+import json
+import os
+import signal
+import sys
+import tempfile
+import time
+import zlib
+from collections import deque
+from pathlib import Path
+from types import SimpleNamespace
+import aiohttp
+from astrbot.api import logger
+from .jobs import ForwardJob
+
+# 单条消息的长度上限（包含全部频道映射的配置消息可能较大）
+MESSAGE_LIMIT = 64 * 1024 * 1024
+# 工作进程数上限
+MAX_WORKERS = 16
+# 健康检查间隔和无响应判定时间（秒）
+HEALTH_INTERVAL = 5.0
+HEALTH_TIMEOUT = 20.0
+# 重启等待时间（秒），连续异常退出时加倍，稳定运行一段时间后重置
+RESTART_MIN_DELAY = 1.0
+RESTART_MAX_DELAY = 30.0
+STABLE_AFTER = 60.0
+# 工作进程启动或重启期间暂存其频道任务的最长时间（秒）和条数，超过后改为在本进程转发
+HOLD_TIMEOUT = 30.0
+MAX_HELD = 1000
+# 不随状态消息发送的配置项（路由通过映射行同步）
+STATE_EXCLUDED_KEYS = ("forward_channels", "channel_mappings")
+# 全局预算和限流配置项（值为类型）：发给工作进程时按进程数平分，0表示不限制，保持不变
+SHARED_BUDGET_KEYS = {
+    "media_budget_mb": float,
+    "upload_max_inflight_mb": float,
+    "upload_max_concurrency": int,
+    "tencent_qps": float,
+    "baidu_qps": float,
+    "google_qps": float,
+    "translation_max_concurrency": int,
+}
+
+
+def _encode(message: dict) -> bytes:
+    return (json.dumps(message, ensure_ascii=False, default=str) + "\n").encode('utf-8')
+
+
+def _budget_value(config: dict, key: str):
+    try:
+        return SHARED_BUDGET_KEYS[key](config.get(key) or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def worker_limit(config: dict) -> int:
+    """工作进程数上限：不超过最小的整数预算（如上传并发数），保证每个进程至少分到1"""
+    caps = [_budget_value(config, key) for key, kind in SHARED_BUDGET_KEYS.items() if kind is int]
+    return min([MAX_WORKERS] + [cap for cap in caps if cap > 0])
+
+
+def split_budgets(config: dict, workers: int, index: int) -> dict:
+    """第index个工作进程分到的全局预算和限流配置，各进程合计等于配置值
+
+    整数项的余数分给编号较小的进程（进程数不超过 worker_limit，每个进程至少为1）。
+    """
+    result = dict(config)
+    if workers <= 1:
+        return result
+    for key, kind in SHARED_BUDGET_KEYS.items():
+        value = _budget_value(config, key)
+        if value > 0:
+            result[key] = value // workers + (index < value % workers) if kind is int else value / workers
+    return result
+
+
+class WorkerHandle:
+    """一个转发工作进程：进程、连接以及已发送但未完成的任务"""
+
+    MAX_SAMPLES = 500
+
+    def __init__(self, index: int):
+        self.index = index
+        self.process = None
+        self.writer = None
+        self.supervisor = None
+        self.pid = None
+        self.state = "starting"
+        self.pending = {}
+        self.queued = 0
+        self.completed = 0
+        self.restarts = 0
+        self.last_seen = 0.0
+        self.ping_sent = None
+        self.rtt = None
+        self.latencies = deque(maxlen=self.MAX_SAMPLES)
+        # 工作进程未就绪期间暂存的任务 [(暂存时间, 任务), ...]，连接后按顺序发送
+        self.held = deque()
+        # 暂存超时后到重新连接前不再暂存，直接在本进程转发（保持与已转交的任务的先后顺序）
+        self.holding = True
+        # 工作进程随pong上报的各组件统计
+        self.stats = {}
+
+    @property
+    def ready(self) -> bool:
+        return self.writer is not None and not self.writer.is_closing()
+
+
+class WorkerPool:
+    """转发工作进程池（主进程侧）
+
+    worker_processes 为0时不启动工作进程，转发在插件所在进程中执行。启用后每个工作进程由一个监督任务
+    启动并在退出后自动重启；健康检查任务定期发送ping，超过 HEALTH_TIMEOUT 没有任何消息的工作进程会被
+    强制结束并重启。对应的工作进程正在启动或重启时，任务按顺序暂存，连接后再发送，保持频道内的顺序；
+    暂存超过 HOLD_TIMEOUT 或 MAX_HELD 时交给 fallback 在本进程中转发，并记录可能的乱序。
+    工作进程断开时已发送但未完成的任务不会重新发送（可能已经部分发送到Kook），只计入丢失数。
+    """
+
+    def __init__(self, module: str, cwd: Path, fallback=None):
+        """
+        Args:
+            module: 工作进程的模块名（python -m 运行）
+            cwd: 工作进程的工作目录（能够导入插件包的目录）
+            fallback: 暂存超时的任务改为在本进程中转发的函数
+        """
+        self.module = module
+        self.cwd = Path(cwd)
+        self.fallback = fallback
+        self.desired = 0
+        self.workers = {}
+        self.socket_path = None
+        self._server = None
+        self._health_task = None
+        self._reconcile_task = None
+        self._state_key = None
+        self._state_config = None
+        # 工作进程编号 -> 状态消息（各进程分到的预算不同）
+        self._state_messages = {}
+        self._next_id = 0
+        self.stats = {"dispatched": 0, "completed": 0, "lost": 0, "fallback": 0, "held": 0, "reordered": 0, "restarts": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.desired > 0
+
+    def update_config(self, config: dict):
+        requested = max(0, min(MAX_WORKERS, int(config.get("worker_processes", 0) or 0)))
+        desired = min(requested, worker_limit(config))
+        if desired == self.desired:
+            return
+        if desired < requested:
+            logger.warning(f"⚠️ worker_processes={requested} 超过上传或翻译的并发上限，只启动 {desired} 个工作进程"
+                           f"（每个进程至少需要分到1个并发）")
+        self.desired = desired
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            # 没有运行中的事件循环时，在第一次提交任务时再启动
+            return
+        self._schedule_reconcile()
+
+    def _schedule_reconcile(self):
+        if self._reconcile_task is None or self._reconcile_task.done():
+            self._reconcile_task = asyncio.create_task(self._reconcile())
+
+    async def _reconcile(self):
+        """按配置的数量启动或停止工作进程"""
+        try:
+            while len(self.workers) != self.desired:
+                if self.desired and self._server is None:
+                    await self._start_server()
+                for index in sorted(self.workers):
+                    if index >= self.desired:
+                        await self._stop_worker(self.workers.pop(index))
+                for index in range(self.desired):
+                    if index not in self.workers:
+                        worker = self.workers[index] = WorkerHandle(index)
+                        worker.supervisor = asyncio.create_task(self._supervise(worker))
+            if not self.desired:
+                await self._stop_server()
+            elif self._health_task is None:
+                self._health_task = asyncio.create_task(self._health_loop())
+            logger.info(f"🧩 转发工作进程数: {self.desired}")
+        except Exception as e:
+            logger.error(f"❌ 调整转发工作进程失败: {e}")
+            import traceback
+            logger.error(traceback.format_exc())
+
+    async def _start_server(self):
+        self.socket_path = Path(tempfile.gettempdir()) / f"discord_kook_{os.getpid()}.sock"
+        if self.socket_path.exists():
+            self.socket_path.unlink()
+        self._server = await asyncio.start_unix_server(self._on_connect, path=str(self.socket_path), limit=MESSAGE_LIMIT)
+        logger.info(f"🧩 转发工作进程套接字: {self.socket_path}")
+
+    async def _stop_server(self):
+        if self._health_task:
+            self._health_task.cancel()
+            self._health_task = None
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        if self.socket_path and self.socket_path.exists():
+            self.socket_path.unlink()
+
+    async def _supervise(self, worker: WorkerHandle):
+        """启动工作进程，退出后按退避时间重启"""
+        delay = RESTART_MIN_DELAY
+        while True:
+            started = time.monotonic()
+            try:
+                worker.state = "starting"
+                worker.process = await asyncio.create_subprocess_exec(
+                    sys.executable, "-m", self.module, "--socket", str(self.socket_path), "--index", str(worker.index),
+                    cwd=str(self.cwd),
+                )
+                worker.pid = worker.process.pid
+                logger.info(f"🧩 已启动转发工作进程 #{worker.index}（pid {worker.pid}）")
+                code = await worker.process.wait()
+                logger.warning(f"⚠️ 转发工作进程 #{worker.index} 已退出（返回码 {code}）")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ 启动转发工作进程 #{worker.index} 失败: {e}")
+
+            self._detach(worker)
+            worker.state = "restarting"
+            if time.monotonic() - started > STABLE_AFTER:
+                delay = RESTART_MIN_DELAY
+            worker.restarts += 1
+            self.stats["restarts"] += 1
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, RESTART_MAX_DELAY)
+
+    async def _stop_worker(self, worker: WorkerHandle):
+        if worker.supervisor:
+            worker.supervisor.cancel()
+        process = worker.process
+        if process and process.returncode is None:
+            process.terminate()
+            try:
+                await asyncio.wait_for(process.wait(), 5)
+            except asyncio.TimeoutError:
+                process.kill()
+        self._detach(worker)
+        worker.state = "stopped"
+        self._release_held(worker, "已停止")
+
+    def _detach(self, worker: WorkerHandle):
+        """连接断开：关闭连接，未完成的任务计入丢失"""
+        if worker.writer is not None:
+            worker.writer.close()
+            worker.writer = None
+        if worker.pending:
+            logger.warning(f"⚠️ 转发工作进程 #{worker.index} 断开，{len(worker.pending)} 条已发送的转发任务结果未知")
+            self.stats["lost"] += len(worker.pending)
+            worker.pending.clear()
+        worker.queued = 0
+        worker.stats = {}
+        worker.ping_sent = None
+
+    async def _on_connect(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        worker = None
+        try:
+            hello = json.loads(await reader.readline() or b"{}")
+            worker = self.workers.get(hello.get("index"))
+            if hello.get("type") != "hello" or worker is None:
+                logger.warning(f"⚠️ 拒绝未知的工作进程连接: {hello}")
+                writer.close()
+                return
+            if worker.writer is not None:
+                worker.writer.close()
+            worker.writer = writer
+            worker.state = "ready"
+            worker.last_seen = time.monotonic()
+            if worker.index in self._state_messages:
+                writer.write(self._state_messages[worker.index])
+            logger.info(f"✅ 转发工作进程 #{worker.index} 已连接（pid {hello.get('pid')}）")
+            if worker.held:
+                logger.info(f"🧩 向转发工作进程 #{worker.index} 发送暂存的 {len(worker.held)} 条任务")
+            while worker.held:
+                self._send(worker, worker.held.popleft()[1])
+            worker.holding = True
+
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                message = json.loads(line)
+                now = time.monotonic()
+                worker.last_seen = now
+                kind = message.get("type")
+                if kind == "done":
+                    sent_at = worker.pending.pop(message.get("id"), None)
+                    if sent_at is not None:
+                        worker.completed += 1
+                        self.stats["completed"] += 1
+                        worker.latencies.append(now - sent_at)
+                elif kind == "pong":
+                    worker.queued = message.get("queued", 0)
+                    worker.stats = message.get("stats") or {}
+                    if worker.ping_sent is not None:
+                        worker.rtt = now - worker.ping_sent
+                        worker.ping_sent = None
+        except Exception as e:
+            logger.warning(f"⚠️ 转发工作进程连接异常: {e}")
+        finally:
+            if worker is not None and worker.writer is writer:
+                self._detach(worker)
+                worker.state = "disconnected"
+            elif not writer.is_closing():
+                writer.close()
+
+    async def _health_loop(self):
+        """定期ping工作进程，长时间没有响应的工作进程强制结束（由监督任务重启）"""
+        while True:
+            await asyncio.sleep(HEALTH_INTERVAL)
+            now = time.monotonic()
+            for worker in list(self.workers.values()):
+                if not worker.ready:
+                    if worker.held and now - worker.held[0][0] > HOLD_TIMEOUT:
+                        self._release_held(worker, f"{HOLD_TIMEOUT:.0f} 秒内未恢复")
+                    continue
+                if now - worker.last_seen > HEALTH_TIMEOUT:
+                    logger.warning(f"⚠️ 转发工作进程 #{worker.index} {now - worker.last_seen:.0f} 秒无响应，强制重启")
+                    worker.state = "unresponsive"
+                    if worker.process and worker.process.returncode is None:
+                        worker.process.kill()
+                    continue
+                if worker.ping_sent is None:
+                    worker.ping_sent = now
+                worker.writer.write(_encode({"type": "ping"}))
+
+    def sync_state(self, config: dict, route_table, token: str, api_base: str):
+        """配置、映射或token变化时把完整状态发送给所有工作进程（新连接的工作进程也会先收到状态）
+
+        全局预算和限流配置按工作进程数分给各进程后发送。
+        """
+        state_config = {key: value for key, value in config.items() if key not in STATE_EXCLUDED_KEYS}
+        key = (route_table.version, token, api_base, self.desired)
+        if key == self._state_key and state_config == self._state_config:
+            return
+        self._state_key = key
+        self._state_config = state_config
+        mappings = {source: route_table.source_text(source) for source in route_table.SOURCE_PRIORITY}
+        self._state_messages = {
+            index: _encode({
+                "type": "state",
+                "config": split_budgets(state_config, self.desired, index),
+                "mappings": mappings,
+                "token": token,
+                "api_base": api_base,
+            })
+            for index in range(self.desired)
+        }
+        for worker in self.workers.values():
+            if worker.ready and worker.index in self._state_messages:
+                worker.writer.write(self._state_messages[worker.index])
+
+    def submit(self, job: ForwardJob) -> bool:
+        """把转发任务发给负责该频道的工作进程
+
+        Returns:
+            bool: 是否已发送；工作进程未就绪时返回False
+        """
+        if len(self.workers) != self.desired:
+            self._schedule_reconcile()
+        worker = self.workers.get(zlib.crc32(job.discord_channel_id.encode('utf-8')) % self.desired)
+        if worker is not None and not worker.ready and worker.holding and worker.state != "stopped":
+            # 工作进程正在启动或重启，暂存任务，连接后按顺序发送
+            worker.held.append((time.monotonic(), job))
+            self.stats["held"] += 1
+            if len(worker.held) >= MAX_HELD:
+                self._release_held(worker, f"暂存任务达到 {MAX_HELD} 条")
+            return True
+        if worker is None or not worker.ready:
+            self.stats["fallback"] += 1
+            return False
+        self._send(worker, job)
+        return True
+
+    def _send(self, worker: WorkerHandle, job: ForwardJob):
+        self._next_id += 1
+        worker.writer.write(_encode({"type": "job", "id": self._next_id, "job": job.to_dict()}))
+        worker.pending[self._next_id] = time.monotonic()
+        self.stats["dispatched"] += 1
+
+    def _release_held(self, worker: WorkerHandle, reason: str):
+        """把暂存的任务交给本进程转发；到重新连接前该工作进程的新任务也在本进程转发"""
+        worker.holding = False
+        if not worker.held:
+            return
+        count = len(worker.held)
+        # 本进程与工作进程恢复后各自转发同一频道的消息，先后顺序无法保证
+        self.stats["reordered"] += count
+        self.stats["fallback"] += count
+        logger.warning(f"⚠️ 转发工作进程 #{worker.index} {reason}，{count} 条暂存任务改为在AstrBot进程中转发，"
+                       f"这些频道的消息顺序可能与工作进程恢复后的消息交错")
+        while worker.held:
+            job = worker.held.popleft()[1]
+            if self.fallback:
+                self.fallback(job)
+
+    def worker_stats(self) -> list:
+        """各工作进程最近上报的统计
+
+        Returns:
+            list: [(工作进程编号, {统计名称: 统计字典}), ...]，只包含已上报的工作进程
+        """
+        return [(index, self.workers[index].stats) for index in sorted(self.workers) if self.workers[index].stats]
+
+    def get_stats(self) -> dict:
+        now = time.monotonic()
+        workers = []
+        for index in sorted(self.workers):
+            worker = self.workers[index]
+            latencies = sorted(worker.latencies)
+            p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] if latencies else None
+            workers.append({
+                "index": index,
+                "pid": worker.pid,
+                "state": worker.state,
+                "pending": len(worker.pending),
+                "held": len(worker.held),
+                "queued": worker.queued,
+                "completed": worker.completed,
+                "restarts": worker.restarts,
+                "last_seen_s": round(now - worker.last_seen, 1) if worker.last_seen else None,
+                "rtt_ms": round(worker.rtt * 1000, 1) if worker.rtt is not None else None,
+                "p95_ms": round(p95 * 1000) if p95 is not None else None,
+                # 分给该工作进程的预算
+                "budgets": {
+                    key: value for key, value in split_budgets(self._state_config or {}, self.desired, index).items()
+                    if key in SHARED_BUDGET_KEYS
+                },
+            })
+        return {**self.stats, "desired": self.desired, "socket": str(self.socket_path) if self._server else None,
+                "workers": workers}
+
+    async def stop(self):
+        """停止所有工作进程（插件停止时调用）"""
+        self.desired = 0
+        if self._reconcile_task:
+            self._reconcile_task.cancel()
+        for worker in list(self.workers.values()):
+            await self._stop_worker(worker)
+        self.workers.clear()
+        await self._stop_server()
+
+
+class KookHttpClient:
+    """工作进程中替代Kook适配器客户端，直接调用Kook HTTP API发送文本、图片和视频
+
+    文件上传通过插件的上传执行池进行，受（按工作进程数平分后的）上传并发和在途大小限制。
+    """
+
+    def __init__(self, io, upload_pool):
+        self.io = io
+        self.upload_pool = upload_pool
+        self.token = None
+        self.api_base = None
+        self._session = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=300))
+        return self._session
+
+    async def _create_message(self, channel_id: str, content: str, message_type: int) -> bool:
+        headers = {"Authorization": f"Bot {self.token}"}
+        payload = {"target_id": channel_id, "content": content, "type": message_type}
+        async with self._get_session().post(f"{self.api_base}/message/create", headers=headers, json=payload) as resp:
+            if resp.status != 200:
+                logger.error(f"❌ 发送消息HTTP错误: {resp.status}")
+                return False
+            result = await resp.json()
+            if result.get('code') != 0:
+                logger.error(f"❌ 发送消息失败: {result.get('message', '未知错误')}")
+                return False
+            return True
+
+    async def send_text(self, channel_id: str, text: str) -> bool:
+        return await self._create_message(channel_id, text, 1)
+
+    async def send_image(self, channel_id: str, path: str) -> bool:
+        """上传本地图片或视频并发送（与Kook适配器客户端的同名方法一致）"""
+        from .main import VIDEO_EXTENSIONS
+
+        file_size = await self.io.file_size(path)
+        if file_size is None:
+            logger.error(f"❌ 文件不存在: {path}")
+            return False
+        headers = {"Authorization": f"Bot {self.token}"}
+        async with self.upload_pool.upload(file_size) as session:
+            async with self.io.open_read(path) as f:
+                data = aiohttp.FormData()
+                data.add_field('file', f, filename=Path(path).name)
+                async with session.post(f"{self.api_base}/asset/create", headers=headers, data=data) as resp:
+                    if resp.status != 200:
+                        logger.error(f"❌ 上传文件HTTP错误: {resp.status}")
+                        return False
+                    result = await resp.json()
+        asset_url = (result.get('data') or {}).get('url')
+        if result.get('code') != 0 or not asset_url:
+            logger.error(f"❌ 上传文件失败: {result.get('message', '未知错误')}")
+            return False
+        return await self._create_message(channel_id, asset_url, 3 if Path(path).suffix.lower() in VIDEO_EXTENSIONS else 2)
+
+    async def close(self):
+        if self._session and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+def apply_state(plugin, client: KookHttpClient, message: dict):
+    """在工作进程中应用主进程发来的配置、频道映射和Kook token"""
+    plugin.config.update(message.get("config") or {})
+    for source, text in (message.get("mappings") or {}).items():
+        plugin.route_table.apply_text(source, text)
+    client.token = message.get("token")
+    client.api_base = plugin.KOOK_API_BASE = message.get("api_base") or plugin.KOOK_API_BASE
+    plugin.translator_manager.update_config(plugin.config)
+    plugin.lane_scheduler.update_config(plugin.config)
+    plugin.member_names.update_config(plugin.config)
+    plugin.upload_pool.update_config(plugin.config)
+    plugin.media_admission.update_config(plugin.config)
+    plugin.segmented_downloader.update_config(plugin.config)
+    plugin.asset_cache.update_config(plugin.config)
+
+
+async def run_worker(socket_path: str, index: int):
+    """连接主进程并执行收到的转发任务，主进程关闭连接时退出"""
+    from .main import DiscordToKookForwarder
+    from .assets import KookAssetCache
+
+    # 主进程停止工作进程时（SIGTERM）先完成清理（写入资源缓存、关闭会话）再退出
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+    reader, writer = await asyncio.open_unix_connection(socket_path, limit=MESSAGE_LIMIT)
+    plugin = DiscordToKookForwarder(SimpleNamespace(get_all_stars=lambda: []))
+    # 资源缓存文件按工作进程区分，避免多个进程写同一个文件
+    plugin.asset_cache = KookAssetCache(Path(__file__).parent / f"kook_assets.worker{index}.json")
+    plugin.asset_cache.load()
+    client = KookHttpClient(plugin.io, plugin.upload_pool)
+    plugin.kook_platform = SimpleNamespace(client=client)
+
+    def send(message: dict):
+        if not writer.is_closing():
+            writer.write(_encode(message))
+
+    def report_done(job_id: int):
+        return lambda _: send({"type": "done", "id": job_id})
+
+    send({"type": "hello", "index": index, "pid": os.getpid()})
+    logger.info(f"🧩 转发工作进程 #{index} 已连接主进程（pid {os.getpid()}）")
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            message = json.loads(line)
+            kind = message.get("type")
+            if kind == "job":
+                job = ForwardJob.from_dict(message["job"])
+                # 主进程已解析的子区父频道和@提及名称，工作进程无法访问Discord适配器
+                plugin.thread_index.observe(job.discord_channel_id,
+                                            job.route_channel_id if job.route_channel_id != job.discord_channel_id else None)
+                for mention in job.mentions:
+                    plugin.member_names.observe(mention.user_id, mention.name)
+                plugin.lane_scheduler.submit(job).add_done_callback(report_done(message.get("id")))
+            elif kind == "state":
+                apply_state(plugin, client, message)
+            elif kind == "ping":
+                lanes = plugin.lane_scheduler.get_stats()
+                send({"type": "pong", "queued": lanes["fast"]["queued"] + lanes["bulk"]["queued"], "stats": {
+                    "lanes": lanes,
+                    "upload_pool": plugin.upload_pool.get_stats(),
+                    "media_admission": plugin.media_admission.get_stats(),
+                    "translation": plugin.translator_manager.get_stats(),
+                }})
+    finally:
+        logger.info(f"🧩 转发工作进程 #{index} 退出")
+        writer.close()
+        await plugin.terminate()
+        await client.close()
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Discord到Kook转发工作进程")
+    parser.add_argument("--socket", required=True, help="主进程的Unix套接字路径")
+    parser.add_argument("--index", type=int, default=0, help="工作进程编号")
+    args = parser.parse_args()
+    try:
+        asyncio.run(run_worker(args.socket, args.index))
+    except asyncio.CancelledError:
+        pass
+    except (ConnectionError, FileNotFoundError) as e:
+        logger.error(f"❌ 无法连接主进程: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()